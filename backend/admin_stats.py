@@ -0,0 +1,280 @@
+# backend/admin_stats.py
+"""
+Números agregados do painel do administrador (/api/admin/stats).
+
+Tudo sai de duas consultas agrupadas:
+- usuários por (role, e-mail confirmado) + concursos por banca, num UNION ALL;
+- resultados por (concurso, categoria, situação), com LEFT JOIN nos extras —
+  dá ao mesmo tempo o total por concurso/categoria e a contagem de situações.
+
+O resultado fica em memória, por seção, e os eventos de escrita o mantêm em
+dia sem refazer as consultas: upload soma na categoria, troca de situação
+move uma unidade de uma situação para outra, exclusão remove a categoria.
+Onde o evento não diz o bastante (substituição de lista, cadastro de usuário,
+edição de concurso), só a parte afetada é marcada como suja e recalculada na
+próxima leitura. Um recálculo completo a cada STATS_MAX_AGE segundos corrige
+qualquer desvio (ex.: escritas feitas por outro processo).
+"""
+import os
+import time
+from collections import Counter
+from threading import Lock
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import Integer, String, cast, func, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from backend import models, events
+
+MAX_AGE = float(os.getenv("STATS_MAX_AGE", "300"))
+# Mesma convenção do compare: sem extra (ou situação vazia) = aguardando
+SITUACAO_PADRAO = "Aguardando Convocação"
+
+Chave = Tuple[int, str]  # (contest_id, category)
+
+
+def _situacao(valor: Optional[str]) -> str:
+    return valor or SITUACAO_PADRAO
+
+
+# --- Consultas ---
+
+def _consultar_cadastros(db: Session, usuarios: bool, concursos: bool):
+    partes = []
+    if usuarios:
+        partes.append(
+            select(
+                literal("users").label("tipo"),
+                models.User.role.label("chave"),
+                cast(models.User.email_confirmed, Integer).label("confirmado"),
+                func.count().label("n"),
+            ).group_by(models.User.role, models.User.email_confirmed)
+        )
+    if concursos:
+        partes.append(
+            select(
+                literal("contests").label("tipo"),
+                models.Contest.banca.label("chave"),
+                cast(literal(None), Integer).label("confirmado"),
+                func.count().label("n"),
+            ).group_by(models.Contest.banca)
+        )
+    consulta = partes[0] if len(partes) == 1 else union_all(*partes)
+    papeis: Dict[Tuple[str, bool], int] = {}
+    bancas: Dict[str, int] = {}
+    for tipo, chave, confirmado, n in db.execute(consulta):
+        if tipo == "users":
+            papeis[(chave or "comum", bool(confirmado))] = n
+        else:
+            bancas[chave] = n
+    return (papeis if usuarios else None), (bancas if concursos else None)
+
+
+def _consultar_categorias(db: Session, chaves: Optional[Set[Chave]] = None) -> Dict[Chave, Counter]:
+    situacao = func.coalesce(func.nullif(models.ContestResultExtra.situacao, ""), SITUACAO_PADRAO)
+    consulta = (
+        select(
+            models.ContestResult.contest_id,
+            models.ContestResult.category,
+            cast(situacao, String),
+            func.count(),
+        )
+        .select_from(models.ContestResult)
+        .outerjoin(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+        .group_by(models.ContestResult.contest_id, models.ContestResult.category, situacao)
+    )
+    if chaves is not None:
+        consulta = consulta.where(tuple_(models.ContestResult.contest_id, models.ContestResult.category).in_(list(chaves)))
+    categorias: Dict[Chave, Counter] = {}
+    for contest_id, category, sit, n in db.execute(consulta):
+        categorias.setdefault((contest_id, category), Counter())[sit] += n
+    if chaves is not None:
+        for chave in chaves:
+            categorias.setdefault(chave, Counter())  # categoria que ficou vazia
+    return categorias
+
+
+# --- Estado em memória ---
+
+class _Painel:
+    def __init__(self):
+        self.lock = Lock()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self.papeis: Optional[Dict[Tuple[str, bool], int]] = None
+        self.bancas: Optional[Dict[str, int]] = None
+        self.categorias: Optional[Dict[Chave, Counter]] = None
+        self.sujas: Set[Chave] = set()
+        self.geracao = getattr(self, "geracao", 0) + 1
+        self.calculado_em = time.monotonic()
+
+    def snapshot(self, db: Session) -> dict:
+        with self.lock:
+            if time.monotonic() - self.calculado_em > MAX_AGE:
+                self.invalidate()
+            geracao = self.geracao
+            faltam_papeis = self.papeis is None
+            faltam_bancas = self.bancas is None
+            faltam_categorias = self.categorias is None
+            sujas = set(self.sujas)
+
+        # Consultas fora do lock: eventos de outras requisições não esperam o banco
+        papeis, bancas = (
+            _consultar_cadastros(db, faltam_papeis, faltam_bancas)
+            if faltam_papeis or faltam_bancas else (None, None)
+        )
+        if faltam_categorias:
+            categorias = _consultar_categorias(db)
+        elif sujas:
+            categorias = _consultar_categorias(db, sujas)
+        else:
+            categorias = None
+
+        with self.lock:
+            if self.geracao == geracao:
+                # Nenhuma escrita no meio: o que foi consultado vai para o estado
+                if papeis is not None:
+                    self.papeis = papeis
+                if bancas is not None:
+                    self.bancas = bancas
+                if faltam_categorias:
+                    self.categorias = categorias
+                elif categorias:
+                    for chave, contagem in categorias.items():
+                        self._por(chave, contagem)
+                    self.sujas.difference_update(categorias)
+            # Com escrita concorrente a consulta pode ou não ter visto a escrita:
+            # responde com ela, mas não guarda
+            papeis = papeis if papeis is not None else self.papeis
+            bancas = bancas if bancas is not None else self.bancas
+            if not faltam_categorias:
+                parciais = categorias or {}
+                categorias = {**(self.categorias or {}), **{k: v for k, v in parciais.items() if v}}
+                for chave in [k for k, v in parciais.items() if not v]:
+                    categorias.pop(chave, None)
+            return _montar(papeis or {}, bancas or {}, categorias)
+
+    def _por(self, chave: Chave, contagem: Counter) -> None:
+        if contagem:
+            self.categorias[chave] = contagem
+        else:
+            self.categorias.pop(chave, None)
+
+    # Atualizações incrementais (chamadas pelos eventos)
+
+    def somar(self, chave: Chave, situacao: str, n: int) -> None:
+        with self.lock:
+            self.geracao += 1
+            if self.categorias is None:
+                return
+            contagem = self.categorias.setdefault(chave, Counter())
+            contagem[situacao] += n
+            if contagem[situacao] <= 0:
+                del contagem[situacao]
+            if not contagem:
+                del self.categorias[chave]
+
+    def mover(self, chave: Chave, de: str, para: str) -> None:
+        if de == para:
+            return
+        self.somar(chave, de, -1)
+        self.somar(chave, para, 1)
+
+    def remover(self, contest_id: int, category: Optional[str]) -> None:
+        with self.lock:
+            self.geracao += 1
+            if self.categorias is None:
+                return
+            for chave in [k for k in self.categorias if k[0] == contest_id and (category is None or k[1] == category)]:
+                del self.categorias[chave]
+                self.sujas.discard(chave)
+
+    def sujar(self, chave: Chave) -> None:
+        with self.lock:
+            self.geracao += 1
+            if self.categorias is not None:
+                self.sujas.add(chave)
+
+    def sujar_cadastros(self, usuarios: bool = False, concursos: bool = False) -> None:
+        with self.lock:
+            self.geracao += 1
+            if usuarios:
+                self.papeis = None
+            if concursos:
+                self.bancas = None
+
+
+def _montar(papeis: Dict[Tuple[str, bool], int], bancas: Dict[str, int], categorias: Dict[Chave, Counter]) -> dict:
+    por_papel: Dict[str, Dict[str, int]] = {}
+    for (role, confirmado), n in papeis.items():
+        linha = por_papel.setdefault(role, {"role": role, "confirmed": 0, "unconfirmed": 0, "total": 0})
+        linha["confirmed" if confirmado else "unconfirmed"] += n
+        linha["total"] += n
+
+    situacoes: Counter = Counter()
+    resultados = []
+    for (contest_id, category), contagem in sorted(categorias.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+        situacoes.update(contagem)
+        resultados.append({"contest_id": contest_id, "category": category, "count": sum(contagem.values())})
+
+    return {
+        "users_total": sum(papeis.values()),
+        "users_by_role": sorted(por_papel.values(), key=lambda l: l["role"]),
+        "contests_total": sum(bancas.values()),
+        "contests_by_banca": [
+            {"banca": b, "count": n} for b, n in sorted(bancas.items(), key=lambda kv: (-kv[1], kv[0] or ""))
+        ],
+        "results_total": sum(r["count"] for r in resultados),
+        "results_by_category": resultados,
+        "situacoes": [{"situacao": s, "count": n} for s, n in situacoes.most_common()],
+    }
+
+
+_painel = _Painel()
+
+
+def get_stats(db: Session) -> dict:
+    return _painel.snapshot(db)
+
+
+def invalidate() -> None:
+    with _painel.lock:
+        _painel.invalidate()
+
+
+# --- Eventos ---
+
+@events.subscribe(events.RESULTS_CREATED)
+def _ao_criar_resultados(contest_id: int, category: str, results, restored: bool = False, **_):
+    if restored:
+        # Volta do arquivo já com situações: recontar a categoria
+        _painel.sujar((contest_id, category))
+        return
+    _painel.somar((contest_id, category), SITUACAO_PADRAO, len(results))
+
+
+@events.subscribe(events.RESULTS_DELETED)
+def _ao_apagar_resultados(contest_id: int, category: Optional[str] = None, **_):
+    _painel.remover(contest_id, category)
+
+
+@events.subscribe(events.RESULTS_REPLACED)
+def _ao_substituir_lista(contest_id: int, category: str, **_):
+    # Linhas removidas levam seus extras junto; o evento não diz quais situações saíram
+    _painel.sujar((contest_id, category))
+
+
+@events.subscribe(events.EXTRA_UPDATED)
+def _ao_atualizar_extra(contest_id: int, category: str, extra, previous_situacao: Optional[str] = None, **_):
+    _painel.mover((contest_id, category), _situacao(previous_situacao), _situacao(extra.situacao))
+
+
+@events.subscribe(events.CONTEST_UPDATED)
+def _ao_alterar_concurso(**_):
+    _painel.sujar_cadastros(concursos=True)
+
+
+@events.subscribe(events.USER_UPDATED)
+def _ao_alterar_usuario(**_):
+    _painel.sujar_cadastros(usuarios=True)
@@ -0,0 +1,401 @@
+# backend/archive.py
+"""
+Arquivo frio dos concursos encerrados.
+
+Arquivar um concurso move os resultados e os extras dele para uma linha só
+em contest_archives: o JSON de todas as colunas (ids originais inclusive),
+comprimido com zlib. As tabelas quentes ficam só com os concursos em
+andamento — índices menores, varreduras e motor colunar mais leves.
+
+A leitura continua pela mesma API (lista paginada, contagem, extras por
+concurso, snapshot, compare, estatísticas de nota, busca por nome): quando a
+consulta quente volta vazia e o concurso está arquivado, o blob é aberto sob
+demanda e fica num LRU pequeno (ARCHIVE_CACHE_SIZE), com o hash do conteúdo
+na chave. As linhas devolvidas são objetos simples, fora da sessão; o
+concurso é só leitura e as escritas respondem 409 até a restauração.
+
+A busca por nome não abre blobs à toa: archived_names guarda os nomes
+normalizados de cada concurso arquivado (e se o nome foi nomeado/empossado
+nele); só os concursos que casam são descomprimidos.
+
+Restaurar devolve as linhas às tabelas quentes, com os mesmos ids sempre que
+eles estiverem livres, e apaga o arquivo:
+    python -m backend.archive archive --contest ID [--contest ID ...]
+    python -m backend.archive restore --contest ID
+    python -m backend.archive list
+(ou os jobs "archive_contest" / "restore_contest").
+"""
+import argparse
+import hashlib
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, joinedload
+
+from backend import models, events
+from backend.cache import LRUCache
+from backend.normalization import normalizar_nomes
+
+ARCHIVE_CACHE_SIZE = int(os.getenv("ARCHIVE_CACHE_SIZE", "16"))
+FORMATO = 1
+LOTE = 500
+
+_COLUNAS = ("id", "category", "position", "name", "final_score", "person_id", "created_at", "extra")
+_CAMPOS_EXTRA = ("id", "situacao", "vai_assumir", "outras_listas", "contatos", "created_at", "updated_at")
+
+_abertos = LRUCache(ARCHIVE_CACHE_SIZE, name="archive")
+
+
+def _em_lotes(itens: List, tamanho: int = LOTE):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+def _iso(valor: Optional[datetime]) -> Optional[str]:
+    return valor.isoformat() if valor else None
+
+
+def _data(valor: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(valor) if valor else None
+
+
+def _nomeado(situacao: Optional[str]) -> bool:
+    s = (situacao or "").lower()
+    return "nomead" in s or "empossad" in s
+
+
+# --- Formato do blob ---
+
+def _codificar(contest_id: int, linhas: List[models.ContestResult]) -> bytes:
+    rows = []
+    for r in linhas:
+        extra = None
+        if r.extra is not None:
+            extra = {campo: getattr(r.extra, campo) for campo in _CAMPOS_EXTRA}
+            extra["created_at"] = _iso(extra["created_at"])
+            extra["updated_at"] = _iso(extra["updated_at"])
+        rows.append([r.id, r.category, r.position, r.name, r.final_score, r.person_id, _iso(r.created_at), extra])
+    return json.dumps(
+        {"format": FORMATO, "contest_id": contest_id, "columns": _COLUNAS, "rows": rows},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _decodificar(payload: bytes) -> List[dict]:
+    dados = json.loads(zlib.decompress(payload))
+    linhas = []
+    for row in dados["rows"]:
+        linha = dict(zip(dados["columns"], row))
+        linha["created_at"] = _data(linha["created_at"])
+        if linha["extra"]:
+            linha["extra"]["created_at"] = _data(linha["extra"]["created_at"])
+            linha["extra"]["updated_at"] = _data(linha["extra"]["updated_at"])
+        linhas.append(linha)
+    return linhas
+
+
+class _Arquivo:
+    """Blob aberto: linhas em ordem de posição, agrupadas por categoria e por nome normalizado."""
+
+    def __init__(self, contest_id: int, linhas: List[dict]):
+        self.contest_id = contest_id
+        self.linhas = sorted(linhas, key=lambda l: (l["position"], l["category"]))
+        self.por_categoria: Dict[str, List[dict]] = defaultdict(list)
+        self.por_nome: Dict[str, List[dict]] = defaultdict(list)
+        for linha, nome_norm in zip(self.linhas, normalizar_nomes(l["name"] for l in self.linhas)):
+            self.por_categoria[linha["category"]].append(linha)
+            self.por_nome[nome_norm].append(linha)
+
+
+def _abrir(db: Session, contest_id: int) -> Optional[_Arquivo]:
+    """Arquivo do concurso (None se não está arquivado); o blob só é lido na falta do LRU."""
+    linha = db.query(models.ContestArchive.content_hash).filter(
+        models.ContestArchive.contest_id == contest_id
+    ).first()
+    if not linha:
+        return None
+    chave = (contest_id, linha[0])
+    arquivo = _abertos.get(chave)
+    if arquivo is None:
+        payload = db.query(models.ContestArchive.payload).filter(
+            models.ContestArchive.contest_id == contest_id
+        ).scalar()
+        if payload is None:  # restaurado no meio da leitura
+            return None
+        arquivo = _Arquivo(contest_id, _decodificar(payload))
+        _abertos.set(chave, arquivo)
+    return arquivo
+
+
+def _resultado(linha: dict, contest_id: int, contest: Optional[models.Contest]) -> SimpleNamespace:
+    """Linha arquivada com a mesma forma de um ContestResult (serve aos mesmos schemas)."""
+    extra = None
+    if linha["extra"]:
+        extra = SimpleNamespace(contest_result_id=linha["id"], **linha["extra"])
+    return SimpleNamespace(
+        id=linha["id"], contest_id=contest_id, category=linha["category"], position=linha["position"],
+        name=linha["name"], final_score=linha["final_score"], person_id=linha["person_id"],
+        created_at=linha["created_at"], contest=contest, extra=extra,
+    )
+
+
+# --- Leitura ---
+
+def is_archived(db: Session, contest_id: int) -> bool:
+    return db.query(models.Contest.archived_at).filter(models.Contest.id == contest_id).scalar() is not None
+
+
+def ensure_writable(db: Session, contest_id: int) -> None:
+    if is_archived(db, contest_id):
+        raise HTTPException(status_code=409, detail="Concurso arquivado (somente leitura); restaure-o para alterar.")
+
+
+def get_results(db: Session, contest_id: int, skip: int = 0, limit: Optional[int] = None,
+                category: Optional[str] = None) -> List[SimpleNamespace]:
+    arquivo = _abrir(db, contest_id)
+    if arquivo is None:
+        return []
+    linhas = arquivo.por_categoria.get(category, []) if category else arquivo.linhas
+    fatia = linhas[skip:skip + limit] if limit is not None else linhas[skip:]
+    contest = db.get(models.Contest, contest_id)
+    return [_resultado(l, contest_id, contest) for l in fatia]
+
+
+def count(db: Session, contest_id: int, category: Optional[str] = None) -> int:
+    arquivo = _abrir(db, contest_id)
+    if arquivo is None:
+        return 0
+    if not category:
+        return len(arquivo.linhas)
+    cat = category.strip().lower()
+    return sum(len(linhas) for c, linhas in arquivo.por_categoria.items() if c.lower() == cat)
+
+
+def categories(db: Session, contest_id: int) -> List[str]:
+    arquivo = _abrir(db, contest_id)
+    return sorted(arquivo.por_categoria) if arquivo else []
+
+
+def get_extras(db: Session, contest_id: int) -> List[SimpleNamespace]:
+    return [r.extra for r in get_results(db, contest_id) if r.extra is not None]
+
+
+def scores(db: Session, contest_id: int, category: Optional[str] = None) -> List[float]:
+    arquivo = _abrir(db, contest_id)
+    if arquivo is None:
+        return []
+    linhas = arquivo.por_categoria.get(category, []) if category else arquivo.linhas
+    return [l["final_score"] for l in linhas if l["final_score"] is not None]
+
+
+def results_by_name(db: Session, nome_normalizado: str) -> List[SimpleNamespace]:
+    """Participações do nome nos concursos arquivados (o índice-resumo escolhe quais abrir)."""
+    contest_ids = [cid for (cid,) in db.query(models.ArchivedName.contest_id).filter(
+        models.ArchivedName.nome_normalizado == nome_normalizado
+    )]
+    if not contest_ids:
+        return []
+    concursos = {c.id: c for c in db.query(models.Contest).filter(models.Contest.id.in_(contest_ids))}
+    saida = []
+    for contest_id in sorted(contest_ids):
+        arquivo = _abrir(db, contest_id)
+        if arquivo is not None:
+            saida.extend(_resultado(l, contest_id, concursos.get(contest_id)) for l in arquivo.por_nome.get(nome_normalizado, ()))
+    return saida
+
+
+def nomeados(db: Session, nomes_norm: Iterable[str]) -> Set[str]:
+    """Nomes (normalizados) que estão nomeados/empossados em algum concurso arquivado."""
+    distintos = sorted(set(n for n in nomes_norm if n))
+    saida: Set[str] = set()
+    for lote in _em_lotes(distintos):
+        saida.update(nome for (nome,) in db.query(models.ArchivedName.nome_normalizado).filter(
+            models.ArchivedName.nome_normalizado.in_(lote), models.ArchivedName.nomeado.is_(True)
+        ))
+    return saida
+
+
+def list_archives(db: Session) -> List[dict]:
+    linhas = (
+        db.query(
+            models.ContestArchive.contest_id, models.Contest.name, models.ContestArchive.row_count,
+            models.ContestArchive.extra_count, models.ContestArchive.raw_bytes,
+            models.ContestArchive.archived_at, func.length(models.ContestArchive.payload),
+        )
+        .join(models.Contest, models.Contest.id == models.ContestArchive.contest_id)
+        .order_by(models.ContestArchive.contest_id)
+    )
+    return [
+        {
+            "contest_id": cid, "contest_name": nome, "rows": rows, "extras": extras,
+            "raw_bytes": raw, "compressed_bytes": comprimido, "archived_at": arquivado_em,
+        }
+        for cid, nome, rows, extras, raw, arquivado_em, comprimido in linhas
+    ]
+
+
+# --- Arquivar / restaurar ---
+
+def archive_contest(db: Session, contest_id: int) -> dict:
+    """Move resultados e extras do concurso para contest_archives, numa transação só."""
+    contest = db.query(models.Contest).filter(models.Contest.id == contest_id).with_for_update().first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Concurso não encontrado")
+    if contest.archived_at is not None:
+        raise HTTPException(status_code=409, detail="Concurso já arquivado")
+
+    linhas = (
+        db.query(models.ContestResult)
+        .options(joinedload(models.ContestResult.extra))
+        .filter(models.ContestResult.contest_id == contest_id)
+        .order_by(models.ContestResult.category, models.ContestResult.position)
+        .all()
+    )
+    corpo = _codificar(contest_id, linhas)
+    payload = zlib.compress(corpo, 9)
+    agora = datetime.utcnow()
+
+    nomes: Dict[str, bool] = {}
+    for r, nome_norm in zip(linhas, normalizar_nomes(r.name for r in linhas)):
+        nomes[nome_norm] = nomes.get(nome_norm, False) or _nomeado(r.extra.situacao if r.extra else None)
+
+    db.add(models.ContestArchive(
+        contest_id=contest_id,
+        payload=payload,
+        content_hash=hashlib.sha256(corpo).hexdigest(),
+        row_count=len(linhas),
+        extra_count=sum(1 for r in linhas if r.extra is not None),
+        raw_bytes=len(corpo),
+        archived_at=agora,
+    ))
+    if nomes:
+        db.execute(insert(models.ArchivedName), [
+            {"contest_id": contest_id, "nome_normalizado": n, "nomeado": v} for n, v in nomes.items() if n
+        ])
+    ids = db.query(models.ContestResult.id).filter(models.ContestResult.contest_id == contest_id)
+    db.query(models.ContestResultExtra).filter(
+        models.ContestResultExtra.contest_result_id.in_(ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    db.query(models.ContestResult).filter(
+        models.ContestResult.contest_id == contest_id
+    ).delete(synchronize_session=False)
+    contest.archived_at = agora
+    db.commit()
+
+    events.emit(events.RESULTS_DELETED, db=db, contest_id=contest_id, category=None)
+    events.emit(events.CONTEST_UPDATED, db=db, contest_id=contest_id)
+    return {"contest_id": contest_id, "rows": len(linhas), "names": len(nomes),
+            "raw_bytes": len(corpo), "compressed_bytes": len(payload)}
+
+
+def _ocupados(db: Session, coluna, ids: List[int]) -> Set[int]:
+    saida: Set[int] = set()
+    for lote in _em_lotes(ids):
+        saida.update(i for (i,) in db.query(coluna).filter(coluna.in_(lote)))
+    return saida
+
+
+def restore_contest(db: Session, contest_id: int) -> dict:
+    """Devolve as linhas do arquivo às tabelas quentes e apaga o arquivo."""
+    contest = db.query(models.Contest).filter(models.Contest.id == contest_id).with_for_update().first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Concurso não encontrado")
+    registro = db.get(models.ContestArchive, contest_id)
+    if contest.archived_at is None or registro is None:
+        raise HTTPException(status_code=409, detail="Concurso não está arquivado")
+    linhas = _decodificar(registro.payload)
+
+    # Ids reaproveitados desde o arquivamento (ex.: rowid do SQLite) ganham id novo
+    ocupados = _ocupados(db, models.ContestResult.id, [l["id"] for l in linhas])
+    extras_ocupados = _ocupados(db, models.ContestResultExtra.id, [l["extra"]["id"] for l in linhas if l["extra"]])
+    pessoas = _ocupados(db, models.Person.id, sorted({l["person_id"] for l in linhas if l["person_id"]}))
+
+    def _colunas(l: dict) -> dict:
+        return {
+            "contest_id": contest_id, "category": l["category"], "position": l["position"], "name": l["name"],
+            "final_score": l["final_score"], "created_at": l["created_at"],
+            # Pessoa apagada por um rebuild: identity refaz a ligação no evento
+            "person_id": l["person_id"] if l["person_id"] in pessoas else None,
+        }
+
+    livres = [l for l in linhas if l["id"] not in ocupados]
+    if livres:
+        db.execute(insert(models.ContestResult), [{"id": l["id"], **_colunas(l)} for l in livres])
+    novos_ids = {l["id"]: l["id"] for l in livres}
+    for l in linhas:
+        if l["id"] in ocupados:
+            novo = models.ContestResult(**_colunas(l))
+            db.add(novo)
+            db.flush()
+            novos_ids[l["id"]] = novo.id
+
+    extras = []
+    for l in linhas:
+        if l["extra"]:
+            extra = {**l["extra"], "contest_result_id": novos_ids[l["id"]]}
+            if extra["id"] in extras_ocupados:
+                del extra["id"]
+            extras.append(extra)
+    for grupo in ([e for e in extras if "id" in e], [e for e in extras if "id" not in e]):
+        if grupo:
+            db.execute(insert(models.ContestResultExtra), grupo)
+
+    db.query(models.ArchivedName).filter(models.ArchivedName.contest_id == contest_id).delete(synchronize_session=False)
+    db.delete(registro)
+    contest.archived_at = None
+    db.commit()
+
+    por_categoria: Dict[str, List[dict]] = defaultdict(list)
+    for l in sorted(linhas, key=lambda l: (l["category"], l["position"])):
+        por_categoria[l["category"]].append({
+            "id": novos_ids[l["id"]], "name": l["name"], "position": l["position"],
+            "final_score": l["final_score"], "situacao": l["extra"]["situacao"] if l["extra"] else None,
+        })
+    for category, resultados in por_categoria.items():
+        events.emit(events.RESULTS_CREATED, db=db, contest_id=contest_id, category=category,
+                    results=resultados, restored=True)
+    events.emit(events.CONTEST_UPDATED, db=db, contest_id=contest_id)
+    return {"contest_id": contest_id, "rows": len(linhas), "extras": len(extras),
+            "new_ids": sum(1 for antigo, novo in novos_ids.items() if antigo != novo)}
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Arquivo frio de concursos encerrados")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    a = sub.add_parser("archive", help="arquiva os concursos (resultados + extras) e os deixa só leitura")
+    a.add_argument("--contest", type=int, action="append", required=True)
+    r = sub.add_parser("restore", help="devolve um concurso arquivado às tabelas quentes")
+    r.add_argument("--contest", type=int, action="append", required=True)
+    sub.add_parser("list", help="concursos arquivados e tamanhos")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.cmd == "list":
+            for linha in list_archives(db):
+                print(linha)
+            return
+        operacao = archive_contest if args.cmd == "archive" else restore_contest
+        for contest_id in args.contest:
+            try:
+                print(operacao(db, contest_id))
+            except HTTPException as e:
+                db.rollback()
+                print(f"concurso {contest_id}: {e.detail}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
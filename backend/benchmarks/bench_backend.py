@@ -0,0 +1,158 @@
+# backend/benchmarks/bench_backend.py
+"""
+Benchmarks dos caminhos quentes do backend (crud e app ASGI em processo).
+
+As rotas com cache de resposta são medidas duas vezes: com o nome de sempre,
+esvaziando o cache antes de cada chamada (o caminho que consulta o banco), e
+com o sufixo "[cache]", servidas do cache já aquecido.
+
+Uso:
+    python -m backend.benchmarks.bench_backend --db /tmp/bench.db --results 1000000 \
+        --save-baseline baseline.json
+    python -m backend.benchmarks.bench_backend --db /tmp/bench.db --baseline baseline.json
+"""
+import argparse
+import os
+import random
+import sys
+
+from backend.benchmarks import datagen, runner
+
+
+def _cenario(db, seed: int):
+    from backend import models
+
+    rnd = random.Random(seed)
+    contest_ids = [cid for (cid,) in db.query(models.Contest.id).order_by(models.Contest.id)]
+    amostra = [n for (n,) in db.query(models.ContestResult.name).limit(5000)]
+    ids_resultados = [rid for (rid,) in db.query(models.ContestResult.id).limit(5000)]
+    return {
+        "rnd": rnd,
+        "contests": contest_ids,
+        "nomes": amostra,
+        "ids": ids_resultados,
+    }
+
+
+def bench_crud(db, cen: dict, repeticoes: int) -> dict:
+    from backend import crud, schemas, models
+
+    rnd = cen["rnd"]
+    contests = cen["contests"]
+    c1 = contests[0]
+    c2 = contests[1] if len(contests) > 1 else c1
+    resultados = {}
+
+    resultados["crud.get_contest_results[page0]"] = runner.medir(
+        lambda: crud.get_contest_results(db, rnd.choice(contests), skip=0, limit=100), repeticoes)
+    resultados["crud.get_contest_results[deep]"] = runner.medir(
+        lambda: crud.get_contest_results(db, c1, skip=1000, limit=100, category="Ampla"), repeticoes)
+    resultados["crud.get_results_count"] = runner.medir(
+        lambda: crud.get_results_count(db, rnd.choice(contests), "Ampla"), repeticoes)
+    resultados["crud.get_results_by_names_batch[50]"] = runner.medir(
+        lambda: crud.get_results_by_names_batch(db, rnd.sample(cen["nomes"], 50)), max(3, repeticoes // 10), 1)
+    resultados["crud.compare_contests"] = runner.medir(
+        lambda: crud.compare_contests(db, c1, c2), max(3, repeticoes // 5), 1)
+    resultados["crud.create_or_update_extra"] = runner.medir(
+        lambda: crud.create_or_update_extra(db, {
+            "contest_result_id": rnd.choice(cen["ids"]),
+            "situacao": rnd.choice(datagen.SITUACOES),
+        }), repeticoes)
+
+    # Upload de 500 nomes num concurso de rascunho, desfeito ao final
+    gen = datagen.DataGenerator(rnd.randrange(10**6))
+    rascunho = crud.create_contest(db, schemas.ContestCreate(**gen.contest(10**6)))
+
+    def upload():
+        nomes, notas = gen.lista(500)
+        crud.create_contest_results(db, schemas.ContestResultCreate(
+            contest_id=rascunho.id, category="Ampla", names=nomes, final_scores=notas), allow_overlap=True)
+
+    resultados["crud.create_contest_results[500]"] = runner.medir(upload, max(3, repeticoes // 5), 1)
+    crud.delete_results_by_category(db, rascunho.id, "Ampla")
+    db.query(models.Contest).filter(models.Contest.id == rascunho.id).delete()
+    db.commit()
+    return resultados
+
+
+def bench_asgi(cen: dict, repeticoes: int) -> dict:
+    import httpx
+    from backend import cache
+    from backend.main import app
+
+    rnd = cen["rnd"]
+    contests = cen["contests"]
+    c1 = contests[0]
+    c2 = contests[1] if len(contests) > 1 else c1
+    resultados = {}
+
+    nomes = rnd.sample(cen["nomes"], 50)
+
+    async def rodar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def com_e_sem_cache(nome, fn, n, aquecimento=3):
+                resultados[nome] = await runner.medir_async(fn, n, aquecimento, antes=cache.clear)
+                resultados[nome + " [cache]"] = await runner.medir_async(fn, n, aquecimento)
+
+            await com_e_sem_cache("asgi GET /api/contests/", lambda: client.get("/api/contests/"), repeticoes)
+            await com_e_sem_cache("asgi GET /api/contest-results/{id}",
+                                  lambda: client.get(f"/api/contest-results/{c1}", params={"limit": 100}), repeticoes)
+            resultados["asgi GET /api/contest-results-count/{id}"] = await runner.medir_async(
+                lambda: client.get(f"/api/contest-results-count/{rnd.choice(contests)}"), repeticoes)
+            await com_e_sem_cache("asgi POST /api/results-by-names-batch",
+                                  lambda: client.post("/api/results-by-names-batch", json={"names": nomes}),
+                                  max(3, repeticoes // 10), 1)
+            await com_e_sem_cache("asgi GET /api/contests/compare",
+                                  lambda: client.get(f"/api/contests/compare/{c1}/{c2}"), max(3, repeticoes // 5), 1)
+
+    import asyncio
+    asyncio.run(rodar())
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do backend")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--contests", type=int, default=500)
+    parser.add_argument("--results", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--only", choices=["crud", "asgi"])
+    parser.add_argument("--baseline", help="JSON para comparar")
+    parser.add_argument("--save-baseline", help="grava os resultados como baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+    info = datagen.preparar_banco(args.db, contests=args.contests, results=args.results, seed=args.seed)
+    print(info)
+
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        cen = _cenario(db, args.seed)
+        resultados = {}
+        if args.only in (None, "crud"):
+            resultados.update(bench_crud(db, cen, args.repeticoes))
+        if args.only in (None, "asgi"):
+            resultados.update(bench_asgi(cen, args.repeticoes))
+    finally:
+        db.close()
+
+    baseline = runner.carregar_baseline(args.baseline) if args.baseline else None
+    runner.imprimir(resultados, baseline)
+    if args.save_baseline:
+        runner.salvar_baseline(args.save_baseline, resultados, meta={
+            "db": args.db, "contests": args.contests, "results": args.results, "seed": args.seed,
+        })
+    if baseline:
+        piores = runner.regressoes(resultados, baseline, args.tolerancia)
+        if piores:
+            print("Regressões:", ", ".join(piores))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
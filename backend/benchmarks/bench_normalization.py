@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_normalization.py
+"""
+Micro-benchmark da normalização de nomes.
+
+Uso:
+    python -m backend.benchmarks.bench_normalization --n 1000000
+"""
+import argparse
+import random
+import time
+import unicodedata
+
+from backend import normalization
+
+PRENOMES = [
+    "João", "José", "Maria", "Ana", "Antônio", "Conceição", "Luís", "Márcia",
+    "Sérgio", "Inês", "Glória", "Vitória", "Cláudio", "Fábio", "Lúcia", "Ângela",
+    "Cecília", "Otávio", "Mônica", "Tânia", "Ítalo", "Renê", "Zoë", "Ægidio",
+]
+SOBRENOMES = [
+    "da Silva", "dos Santos", "Conceição", "Gonçalves", "Araújo", "Magalhães",
+    "Simões", "Brandão", "Falcão", "Sá", "Guimarães", "Assunção", "Patrício",
+    "Estêvão", "Peçanha", "Loureiro", "Müller", "Ribeiro", "Nóbrega", "Leão",
+]
+
+
+def _legado(nome: str) -> str:
+    """Implementação anterior (crud/routers), só para comparação."""
+    if not nome:
+        return ""
+    nome = nome.lower()
+    nome = unicodedata.normalize('NFD', nome)
+    nome = "".join(c for c in nome if unicodedata.category(c) != 'Mn')
+    return nome.strip()
+
+
+def gerar_nomes(n: int, distintos: int, seed: int = 42):
+    rnd = random.Random(seed)
+    base = [
+        f"{rnd.choice(PRENOMES)}  {rnd.choice(PRENOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        for _ in range(distintos)
+    ]
+    return [rnd.choice(base) for _ in range(n)]
+
+
+def _medir(rotulo: str, fn, nomes):
+    inicio = time.perf_counter()
+    fn(nomes)
+    duracao = time.perf_counter() - inicio
+    print(f"{rotulo:<28} {duracao:8.3f}s  {len(nomes) / duracao:>12,.0f} nomes/s  "
+          f"{duracao / len(nomes) * 1e9:8.0f} ns/nome")
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--distintos", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    nomes = gerar_nomes(args.n, args.distintos, args.seed)
+    print(f"{args.n:,} nomes ({args.distintos:,} distintos)")
+
+    _medir("legado (unicodedata/char)", lambda ns: [_legado(x) for x in ns], nomes)
+
+    normalization.limpar_cache()
+    _medir("normalizar_nome (frio)", lambda ns: [normalization.normalizar_nome(x) for x in ns], nomes)
+    _medir("normalizar_nome (quente)", lambda ns: [normalization.normalizar_nome(x) for x in ns], nomes)
+
+    normalization.limpar_cache()
+    _medir("normalizar_nomes (lote)", normalization.normalizar_nomes, nomes)
+    print(normalization.cache_info())
+
+
+if __name__ == "__main__":
+    main()
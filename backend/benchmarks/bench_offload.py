@@ -0,0 +1,127 @@
+# backend/benchmarks/bench_offload.py
+"""
+Latência de endpoints não relacionados enquanto compares grandes rodam.
+
+Algumas threads fazem crud.compare_contests_json (o que o endpoint chama) sem
+parar entre os dois maiores concursos (direto no crud, sem o singleflight,
+para que cada chamada faça o trabalho todo), enquanto uma sonda mede a contagem e a primeira página de
+listas pelo app ASGI. Mede-se três vezes: sem carga, com carga e o pool
+desligado (tudo inline, disputando o GIL) e com carga e o pool de
+backend.offload ligado. Com o pool, o p95/p99 da sonda deve ficar perto do
+"sem carga".
+
+Uso:
+    python -m backend.benchmarks.bench_offload --db /tmp/bench_offload.db --results 400000 --contests 4
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from backend.benchmarks import datagen, runner
+
+
+def _sondar(client, contests, duracao: float, seed: int) -> dict:
+    rnd = random.Random(seed)
+    duracoes = []
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        contest_id = rnd.choice(contests)
+        t0 = time.perf_counter()
+        if rnd.random() < 0.5:
+            client.get(f"/api/contest-results-count/{contest_id}", params={"category": "PCD"})
+        else:
+            client.get(f"/api/contest-results/{contest_id}", params={"limit": 20, "skip": rnd.randrange(200)})
+        duracoes.append(time.perf_counter() - t0)
+    return runner.resumir(duracoes)
+
+
+def _medir(client, contests, pares, threads: int, duracao: float, seed: int) -> dict:
+    from backend import crud
+    from backend.database import SessionLocal
+
+    parar = threading.Event()
+    compares = []
+
+    def carga():
+        db = SessionLocal()
+        try:
+            while not parar.is_set():
+                t0 = time.perf_counter()
+                crud.compare_contests_json(db, *pares)
+                compares.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+
+    trabalhadores = [threading.Thread(target=carga, daemon=True) for _ in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    try:
+        sonda = _sondar(client, contests, duracao, seed)
+    finally:
+        parar.set()
+        for t in trabalhadores:
+            t.join()
+    return {"sonda": sonda, "compare": runner.resumir(compares) if compares else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência da sonda com compares pesados em paralelo")
+    parser.add_argument("--db", default="bench_offload.db")
+    parser.add_argument("--contests", type=int, default=4)
+    parser.add_argument("--results", type=int, default=400_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=2, help="threads fazendo compare")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por medição")
+    parser.add_argument("--min-rows", type=int, help="OFFLOAD_MIN_ROWS para a medição com pool")
+    args = parser.parse_args()
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+    print(datagen.preparar_banco(args.db, contests=args.contests, results=args.results, seed=args.seed))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+
+    from backend import models, offload
+    from backend.database import SessionLocal
+    from backend.main import app
+
+    db = SessionLocal()
+    try:
+        por_tamanho = (
+            db.query(models.ContestResult.contest_id)
+            .group_by(models.ContestResult.contest_id)
+            .order_by(func.count().desc())
+            .all()
+        )
+    finally:
+        db.close()
+    contests = [cid for (cid,) in por_tamanho]
+    pares = tuple(contests[:2])
+    client = TestClient(app)
+
+    workers = offload.WORKERS or 2
+    if args.min_rows is not None:
+        offload.MIN_ROWS = args.min_rows
+
+    resultados = {}
+    resultados["sonda[sem carga]"] = _sondar(client, contests, args.duration, args.seed)
+
+    offload.WORKERS = 0
+    inline = _medir(client, contests, pares, args.threads, args.duration, args.seed)
+    resultados["sonda[compare inline]"] = inline["sonda"]
+    resultados["compare[inline]"] = inline["compare"]
+
+    offload.WORKERS = workers
+    offload.run(offload.comparar_do_banco, 0, 0, rows=offload.MIN_ROWS)  # sobe os processos antes de medir
+    pool = _medir(client, contests, pares, args.threads, args.duration, args.seed)
+    resultados["sonda[compare no pool]"] = pool["sonda"]
+    resultados["compare[pool]"] = pool["compare"]
+    offload.shutdown()
+
+    runner.imprimir({k: v for k, v in resultados.items() if v})
+
+
+if __name__ == "__main__":
+    main()
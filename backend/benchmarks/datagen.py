@@ -0,0 +1,175 @@
+# backend/benchmarks/datagen.py
+"""
+Gerador determinístico (seed) de dados sintéticos para benchmarks.
+
+Gera concursos, listas nas 4 categorias com nomes brasileiros acentuados
+(parte deles repetida entre concursos, como na vida real) e alguns extras.
+
+Uso:
+    python -m backend.benchmarks.datagen --db /tmp/bench.db --contests 500 --results 1000000
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+import time
+
+PRENOMES = [
+    "João", "José", "Maria", "Ana", "Antônio", "Francisco", "Luís", "Márcia", "Sérgio",
+    "Inês", "Glória", "Vitória", "Cláudio", "Fábio", "Lúcia", "Ângela", "Cecília",
+    "Otávio", "Mônica", "Tânia", "Ítalo", "Rogério", "Letícia", "Patrícia", "Débora",
+    "Vinícius", "Júlia", "Caio", "Estêvão", "Raí", "Bárbara", "Natália", "Flávio",
+    "Simone", "Gabriel", "Beatriz", "Heloísa", "Rafael", "Luíza", "Jéssica", "Araci",
+]
+SOBRENOMES = [
+    "da Silva", "dos Santos", "Oliveira", "Souza", "Conceição", "Gonçalves", "Araújo",
+    "Magalhães", "Simões", "Brandão", "Falcão", "Sá", "Guimarães", "Assunção", "Patrício",
+    "Peçanha", "Loureiro", "Ribeiro", "Nóbrega", "Leão", "Pereira", "Carvalho", "Gomes",
+    "Rodrigues", "Lima", "Fernandes", "Alves", "Barbosa", "Cardoso", "Damião", "Bezerra",
+]
+BANCAS = ["CEBRASPE", "FGV", "FCC", "VUNESP", "IBFC", "CESGRANRIO", "IDECAN", "AOCP", "QUADRIX"]
+CARGOS = ["Analista Judiciário", "Técnico Judiciário", "Auditor Fiscal", "Agente de Polícia",
+          "Professor", "Escrivão", "Delegado", "Procurador", "Enfermeiro", "Contador"]
+ORGAOS = ["TJ", "TRF", "TRT", "TRE", "MPU", "PF", "PRF", "INSS", "Receita Federal", "SEFAZ"]
+UFS = ["SP", "RJ", "MG", "BA", "PR", "RS", "PE", "CE", "DF", "GO", "SC", "PA"]
+# Proporção aproximada das listas por categoria
+CATEGORIAS = (("Ampla", 0.75), ("PPP", 0.20), ("PCD", 0.04), ("Indígenas", 0.01))
+SITUACOES = ["Aguardando Convocação", "Convocado", "Nomeado", "Empossado", "Termo de Desistência"]
+
+
+class DataGenerator:
+    def __init__(self, seed: int = 42, pessoas: int = 200_000):
+        self.rnd = random.Random(seed)
+        self.pessoas = pessoas
+
+    def nome(self, indice: int) -> str:
+        # Mesmo índice -> mesmo nome, para existir sobreposição entre concursos
+        r = random.Random(indice)
+        partes = [r.choice(PRENOMES)]
+        if r.random() < 0.5:
+            partes.append(r.choice(PRENOMES))
+        partes += [r.choice(SOBRENOMES), r.choice(SOBRENOMES)]
+        return " ".join(partes)
+
+    def nomes(self, quantidade: int):
+        return [self.nome(self.rnd.randrange(self.pessoas)) for _ in range(quantidade)]
+
+    def contest(self, indice: int) -> dict:
+        orgao = self.rnd.choice(ORGAOS)
+        uf = self.rnd.choice(UFS)
+        return {
+            "name": f"{orgao} {uf} {2015 + indice % 10} #{indice}",
+            "banca": self.rnd.choice(BANCAS),
+            "site": f"https://concursos.example/{indice}",
+            "edital_url": f"https://concursos.example/{indice}/edital.pdf",
+            "cargo": self.rnd.choice(CARGOS),
+        }
+
+    def lista(self, quantidade: int):
+        """(nomes, notas) em ordem de classificação."""
+        notas = sorted((round(self.rnd.uniform(40, 100), 2) for _ in range(quantidade)), reverse=True)
+        return self.nomes(quantidade), notas
+
+
+def popular(db, contests: int = 500, results: int = 100_000, seed: int = 42, extras: float = 0.05, lote: int = 20_000):
+    """Preenche o banco da sessão `db` usando inserts em lote (Core)."""
+    from sqlalchemy import func, insert
+    from backend import models
+
+    gen = DataGenerator(seed)
+    # Permite chamar de novo sobre um banco já populado (só acrescenta)
+    ultimo_contest = db.query(func.max(models.Contest.id)).scalar() or 0
+    ultimo_resultado = db.query(func.max(models.ContestResult.id)).scalar() or 0
+    db.execute(insert(models.Contest), [gen.contest(ultimo_contest + i) for i in range(contests)])
+    db.commit()
+    contest_ids = [
+        cid for (cid,) in db.query(models.Contest.id).filter(models.Contest.id > ultimo_contest).order_by(models.Contest.id)
+    ]
+
+    por_concurso = max(1, results // max(1, len(contest_ids)))
+    pendentes = []
+    for contest_id in contest_ids:
+        for categoria, fracao in CATEGORIAS:
+            quantidade = max(1, int(por_concurso * fracao))
+            nomes, notas = gen.lista(quantidade)
+            pendentes += [
+                {"contest_id": contest_id, "category": categoria, "position": pos,
+                 "name": nome, "final_score": nota}
+                for pos, (nome, nota) in enumerate(zip(nomes, notas), start=1)
+            ]
+            if len(pendentes) >= lote:
+                db.execute(insert(models.ContestResult), pendentes)
+                pendentes = []
+    if pendentes:
+        db.execute(insert(models.ContestResult), pendentes)
+    db.commit()
+
+    total = (db.query(func.max(models.ContestResult.id)).scalar() or 0) - ultimo_resultado
+    amostra = gen.rnd.sample(range(ultimo_resultado + 1, ultimo_resultado + total + 1), int(total * extras))
+    for i in range(0, len(amostra), lote):
+        db.execute(insert(models.ContestResultExtra), [
+            {"contest_result_id": rid, "situacao": gen.rnd.choice(SITUACOES),
+             "vai_assumir": gen.rnd.choice(["SIM", "TALVEZ", "NÃO"])}
+            for rid in amostra[i:i + lote]
+        ])
+    db.commit()
+    return {"contests": len(contest_ids), "results": total, "extras": len(amostra)}
+
+
+def preparar_banco(path: str, **kwargs) -> dict:
+    """Cria um SQLite local populado e aponta DATABASE_URL para ele.
+
+    O arquivo só é reaproveitado se foi gerado com os mesmos parâmetros
+    (gravados em <path>.params.json); senão é recriado, para que duas rodadas
+    com tamanhos diferentes não meçam o mesmo banco. Precisa ser chamado
+    antes de importar backend.database.
+    """
+    padroes = {k: p.default for k, p in inspect.signature(popular).parameters.items() if k != "db"}
+    parametros = {**padroes, **kwargs}
+    arquivo_parametros = f"{path}.params.json"
+    reaproveitar = False
+    if os.path.exists(path) and os.path.exists(arquivo_parametros):
+        with open(arquivo_parametros, encoding="utf-8") as f:
+            reaproveitar = json.load(f) == parametros
+    if not reaproveitar:
+        for arquivo in (path, f"{path}-wal", f"{path}-shm", arquivo_parametros):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from backend.database import SessionLocal, engine, sync_schema
+    from backend.models import Base  # importar os modelos registra as tabelas no metadata
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    if reaproveitar:
+        return {"reused": path, **parametros}
+    db = SessionLocal()
+    try:
+        info = popular(db, **kwargs)
+    finally:
+        db.close()
+    with open(arquivo_parametros, "w", encoding="utf-8") as f:
+        json.dump(parametros, f)
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite sintético")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--contests", type=int, default=500)
+    parser.add_argument("--results", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="recria o arquivo se já existir")
+    args = parser.parse_args()
+
+    if args.force and os.path.exists(args.db):
+        os.remove(args.db)
+    inicio = time.perf_counter()
+    info = preparar_banco(args.db, contests=args.contests, results=args.results, seed=args.seed)
+    print(info, f"{time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
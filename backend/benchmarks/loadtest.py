@@ -0,0 +1,271 @@
+# backend/benchmarks/loadtest.py
+"""
+Gerador de carga HTTP para medir latência ponta a ponta do app.
+
+Roda misturas realistas de tráfego (navegação de listas, busca por nome,
+comparação, batch de nomes, extras e uploads de admin) contra
+`backend.main.app`, em processo (httpx.ASGITransport) ou num uvicorn local.
+
+Por padrão cada etapa roda duas vezes: sem cache de respostas (backend
+SemCache, toda requisição consulta o banco) e com o cache normal; os números
+saem separados. Contra --url o cache do servidor não é controlado.
+
+Uso:
+    python -m backend.benchmarks.loadtest --db /tmp/bench.db --concurrency 16 --duration 30
+    python -m backend.benchmarks.loadtest --target uvicorn --ramp 1,2,4,8,16,32 --duration 15
+    python -m backend.benchmarks.loadtest --url http://localhost:8000 --mix browse=70,search=30
+    python -m backend.benchmarks.loadtest --cache sem --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend.benchmarks import datagen, runner
+
+MIX_PADRAO = {"browse": 55, "count": 10, "search": 10, "batch": 8, "compare": 7, "extra": 7, "upload": 3}
+SEM_CACHE_ENV = {"CACHE_BACKEND": "backend.benchmarks.runner:SemCache", "DERIVED_CACHE_SIZE": "0"}
+
+
+class Cenario:
+    def __init__(self, contests: List[int], nomes: List[str], ids: List[int], rascunho: int, seed: int):
+        self.contests = contests
+        self.nomes = nomes
+        self.ids = ids
+        self.rascunho = rascunho
+        self.rnd = random.Random(seed)
+
+    def requisicao(self, tipo: str):
+        """(rota para relatório, método, url, kwargs)."""
+        rnd = self.rnd
+        if tipo == "browse":
+            skip = rnd.choice([0, 0, 0, 100, 200, 1000])
+            return ("GET /api/contest-results/{id}", "GET",
+                    f"/api/contest-results/{rnd.choice(self.contests)}", {"params": {"skip": skip, "limit": 100}})
+        if tipo == "count":
+            return ("GET /api/contest-results-count/{id}", "GET",
+                    f"/api/contest-results-count/{rnd.choice(self.contests)}", {})
+        if tipo == "search":
+            return ("GET /api/results-by-name/", "GET", "/api/results-by-name/", {"params": {"name": rnd.choice(self.nomes)}})
+        if tipo == "batch":
+            return ("POST /api/results-by-names-batch", "POST", "/api/results-by-names-batch",
+                    {"json": {"names": rnd.sample(self.nomes, min(30, len(self.nomes)))}})
+        if tipo == "compare":
+            a, b = rnd.sample(self.contests, 2)
+            return ("GET /api/contests/compare/{a}/{b}", "GET", f"/api/contests/compare/{a}/{b}", {})
+        if tipo == "extra":
+            return ("POST /api/contest-results-extra/", "POST", "/api/contest-results-extra/",
+                    {"json": {"contest_result_id": rnd.choice(self.ids), "situacao": rnd.choice(datagen.SITUACOES)}})
+        if tipo == "upload":
+            nomes, notas = datagen.DataGenerator(rnd.randrange(10**9)).lista(50)
+            return ("POST /api/contest-results/", "POST", "/api/contest-results/",
+                    {"json": {"contest_id": self.rascunho, "category": "Ampla", "names": nomes, "final_scores": notas},
+                     "params": {"allow_overlap": "true"}})
+        raise ValueError(f"tipo de tráfego desconhecido: {tipo}")
+
+
+def preparar_cenario(seed: int) -> Cenario:
+    from backend import crud, models, schemas
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        contests = [cid for (cid,) in db.query(models.Contest.id).order_by(models.Contest.id)]
+        nomes = [n for (n,) in db.query(models.ContestResult.name).limit(5000)]
+        ids = [rid for (rid,) in db.query(models.ContestResult.id).limit(5000)]
+        gen = datagen.DataGenerator(seed)
+        rascunho = crud.create_contest(db, schemas.ContestCreate(**gen.contest(10**7))).id
+    finally:
+        db.close()
+    return Cenario(contests, nomes, ids, rascunho, seed)
+
+
+def limpar_cenario(cen: Cenario) -> None:
+    from backend import crud, models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        crud.delete_results_by_category(db, cen.rascunho, "Ampla")
+        db.query(models.Contest).filter(models.Contest.id == cen.rascunho).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def rodar_etapa(client: httpx.AsyncClient, cen: Cenario, mix: Dict[str, int], concorrencia: int, duracao: float) -> dict:
+    amostras: Dict[str, List[float]] = defaultdict(list)
+    erros: Dict[str, int] = defaultdict(int)
+    tipos, pesos = zip(*mix.items())
+    fim = time.perf_counter() + duracao
+
+    async def trabalhador():
+        while time.perf_counter() < fim:
+            rota, metodo, url, kwargs = cen.requisicao(cen.rnd.choices(tipos, pesos)[0])
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(metodo, url, **kwargs)
+                falhou = resp.status_code >= 500 or resp.status_code == 429
+            except httpx.HTTPError:
+                falhou = True
+            amostras[rota].append(time.perf_counter() - t0)
+            if falhou:
+                erros[rota] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+
+    rotas = {}
+    for rota, duracoes in sorted(amostras.items()):
+        r = runner.resumir(duracoes, decorrido)
+        r["errors"] = erros[rota]
+        r["error_rate"] = round(erros[rota] / len(duracoes), 4)
+        rotas[rota] = r
+    todas = [d for ds in amostras.values() for d in ds]
+    total = runner.resumir(todas, decorrido) if todas else {}
+    total["errors"] = sum(erros.values())
+    total["error_rate"] = round(total["errors"] / len(todas), 4) if todas else 0.0
+    return {"concurrency": concorrencia, "duration": round(decorrido, 2), "total": total, "routes": rotas}
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_uvicorn(workers: int = 1, env: Optional[Dict[str, str]] = None) -> (subprocess.Popen, str):
+    porta = _porta_livre()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(porta),
+         "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **(env or {})},
+    )
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(100):
+        try:
+            httpx.get(url + "/", timeout=0.5)
+            return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn não subiu a tempo")
+
+
+def imprimir_etapa(etapa: dict, modo: str) -> None:
+    print(f"\n== concorrência {etapa['concurrency']}, {modo} ({etapa['duration']}s) ==")
+    print(f"{'rota':<40} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>7}")
+    for rota, r in list(etapa["routes"].items()) + [("TOTAL", etapa["total"])]:
+        if not r.get("n"):
+            continue
+        print(f"{rota:<40} {r['n']:>7} {r['ops_per_sec']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['error_rate'] * 100:>6.1f}%")
+
+
+def _parse_mix(texto: Optional[str]) -> Dict[str, int]:
+    if not texto:
+        return dict(MIX_PADRAO)
+    mix = {}
+    for item in texto.split(","):
+        tipo, peso = item.split("=")
+        if tipo not in MIX_PADRAO:
+            raise SystemExit(f"tipo desconhecido em --mix: {tipo} (opções: {', '.join(MIX_PADRAO)})")
+        mix[tipo] = int(peso)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do app FastAPI")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--contests", type=int, default=500)
+    parser.add_argument("--results", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="servidor já em execução (ignora --target)")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn iniciado")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ramp", help="lista de concorrências, ex.: 1,2,4,8,16 (procura o ponto de saturação)")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos por etapa")
+    parser.add_argument("--mix", help="pesos por tipo, ex.: browse=60,search=20,compare=20")
+    parser.add_argument("--cache", choices=["sem", "com", "ambos"], default="ambos",
+                        help="mede sem o cache de respostas, com ele, ou os dois separados")
+    parser.add_argument("--json", help="grava o relatório em JSON")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="mantém o rate limit ligado (todo o tráfego sai de um cliente só)")
+    args = parser.parse_args()
+
+    if not args.rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+    mix = _parse_mix(args.mix)
+    niveis = [int(x) for x in args.ramp.split(",")] if args.ramp else [args.concurrency]
+
+    if args.url and args.cache != "ambos":
+        raise SystemExit("--cache não se aplica a --url: o cache do servidor externo não é controlado daqui")
+    modos = ["servidor"] if args.url else (["sem", "com"] if args.cache == "ambos" else [args.cache])
+
+    print(datagen.preparar_banco(args.db, contests=args.contests, results=args.results, seed=args.seed))
+    cen = preparar_cenario(args.seed)
+
+    async def rodar(transport, base_url, modo):
+        limites = httpx.Limits(max_connections=max(niveis), max_keepalive_connections=max(niveis))
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60, limits=limites) as client:
+            etapas = []
+            for nivel in niveis:
+                etapa = await rodar_etapa(client, cen, mix, nivel, args.duration)
+                imprimir_etapa(etapa, f"cache: {modo}")
+                etapas.append(etapa)
+            return etapas
+
+    def rodar_modo(modo):
+        if args.url:
+            return asyncio.run(rodar(None, args.url, modo))
+        if args.target == "uvicorn":
+            # Um servidor por modo: o backend de cache é escolhido na subida
+            proc, base_url = iniciar_uvicorn(args.workers, SEM_CACHE_ENV if modo == "sem" else None)
+            try:
+                return asyncio.run(rodar(None, base_url, modo))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+        from backend import cache
+        from backend.main import app
+
+        anterior, tamanho = cache.get_backend(), cache.derived_cache.maxsize
+        if modo == "sem":
+            cache.set_backend(runner.SemCache(anterior))
+            cache.derived_cache.maxsize = 0
+        try:
+            # Exceções do app viram 500 e entram na taxa de erro, como num servidor real
+            return asyncio.run(rodar(httpx.ASGITransport(app=app, raise_app_exceptions=False), "http://loadtest", modo))
+        finally:
+            cache.set_backend(anterior)
+            cache.derived_cache.maxsize = tamanho
+
+    try:
+        relatorio = {modo: rodar_modo(modo) for modo in modos}
+    finally:
+        limpar_cenario(cen)
+
+    if len(niveis) > 1 or len(modos) > 1:
+        print("\ncache     concorrência  req/s   p99 ms")
+        for modo, etapas in relatorio.items():
+            for e in etapas:
+                print(f"{modo:<9} {e['concurrency']:>12} {e['total'].get('ops_per_sec', 0):>7.1f} "
+                      f"{e['total'].get('p99_ms', 0):>8.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mix": mix, "cache": relatorio}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# backend/benchmarks/query_budget.py
+"""
+Checagem de regressão de queries (N+1) endpoint a endpoint.
+
+Popula um SQLite temporário, chama cada endpoint no app em processo com
+dados pequenos e depois com dados (e requisições) maiores, e falha se:
+- o número de statements SQL mudar entre os dois tamanhos (N+1);
+- o número de objetos ORM carregados passar do limite do endpoint;
+- o número de linhas lidas do banco (todas as do cursor, inclusive de
+  queries Core e SQL cru, que não viram objetos ORM) passar do limite, nos
+  endpoints que têm um;
+- o pré-filtro SQL da busca por nome deixar passar muito mais candidatos
+  do que os nomes que de fato casam.
+
+Uso (sai com código 1 se houver violação, para rodar no CI):
+    python -m backend.benchmarks.query_budget [-v]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+
+class Checagem:
+    def __init__(self, nome: str, requisicao: Callable[[dict], tuple], max_linhas: Callable[[dict], int],
+                 max_lidas: Optional[Callable[[dict], int]] = None):
+        self.nome = nome
+        self.requisicao = requisicao
+        self.max_linhas = max_linhas
+        self.max_lidas = max_lidas
+
+
+_uploads = itertools.count()
+
+
+def _upload(ctx):
+    n = 20 * ctx["escala"]
+    lote = next(_uploads)
+    return ("POST", "/api/contest-results/", {"json": {
+        "contest_id": ctx["rascunho"], "category": "Ampla",
+        "names": [f"Candidato Rascunho {lote} {i}" for i in range(n)],
+        "final_scores": [100 - i * 0.1 for i in range(n)],
+    }})
+
+
+CHECAGENS: List[Checagem] = [
+    Checagem("GET /api/contests/",
+             lambda c: ("GET", "/api/contests/", {}),
+             lambda c: c["total_contests"]),
+    Checagem("GET /api/contests/?q&sort&limit",
+             lambda c: ("GET", "/api/contests/", {"params": {"q": "a", "sort": "name", "limit": 3}}),
+             lambda c: 3 + 1),
+    Checagem("GET /api/contests/facets",
+             lambda c: ("GET", "/api/contests/facets", {}),
+             lambda c: 0),
+    Checagem("GET /api/contest-results/{id}",
+             lambda c: ("GET", f"/api/contest-results/{c['a']}", {"params": {"limit": 50}}),
+             lambda c: 50 * 2 + 1),
+    Checagem("GET /api/contest-results/{id}?category",
+             lambda c: ("GET", f"/api/contest-results/{c['a']}", {"params": {"limit": 50, "skip": 10, "category": "Ampla"}}),
+             lambda c: 50 * 2 + 1),
+    Checagem("GET /api/contests/{id}/snapshot (ao vivo)",
+             lambda c: ("GET", f"/api/contests/{c['a']}/snapshot", {"params": {"category": "Ampla"}}),
+             lambda c: 2 * c["tamanho_a"] + 1),
+    Checagem("GET /api/contest-results-count/{id}",
+             lambda c: ("GET", f"/api/contest-results-count/{c['a']}", {"params": {"category": "Ampla"}}),
+             lambda c: 0),
+    Checagem("GET /api/contest-results-extra/by-contest/{id}",
+             lambda c: ("GET", f"/api/contest-results-extra/by-contest/{c['a']}", {}),
+             lambda c: c["tamanho_a"]),
+    Checagem("GET /api/contests/compare/{a}/{b}",
+             lambda c: ("GET", f"/api/contests/compare/{c['a']}/{c['b']}", {}),
+             lambda c: 2 * (c["tamanho_a"] + c["tamanho_b"])),
+    Checagem("GET /api/contests/compare?ids (N concursos)",
+             lambda c: ("GET", "/api/contests/compare", {"params": [("ids", c["a"]), ("ids", c["b"]), ("ids", c["rascunho"])]}),
+             lambda c: 0),
+    Checagem("POST /api/results-by-names-batch",
+             lambda c: ("POST", "/api/results-by-names-batch", {"json": {"names": c["nomes"][: 10 * c["escala"]]}}),
+             lambda c: 0),
+    Checagem("GET /api/results-by-name/",
+             lambda c: ("GET", "/api/results-by-name/", {"params": {"name": c["nomes"][0]}}),
+             lambda c: 3 * c["repeticoes_nome"],
+             lambda c: 2 * c["repeticoes_nome"] + 5),
+    Checagem("GET /api/contests/{id}/stats",
+             lambda c: ("GET", f"/api/contests/{c['a']}/stats", {"params": {"category": "Ampla", "cutoff_position": 5}}),
+             lambda c: 0),
+    Checagem("GET /api/contests/{id}/projection",
+             lambda c: ("GET", f"/api/contests/{c['a']}/projection", {"params": {"vagas": 10}}),
+             lambda c: 0),
+    Checagem("GET /api/rank-lookup",
+             lambda c: ("GET", "/api/rank-lookup", {"params": {"score": 70, "top": 10}}),
+             lambda c: 0),
+    Checagem("GET /api/persons/{id}/results",
+             lambda c: ("GET", f"/api/persons/{c['person']}/results", {}),
+             lambda c: 3 * c["repeticoes_nome"]),
+    Checagem("GET /api/contest-results/{id}/outras-listas",
+             lambda c: ("GET", f"/api/contest-results/{c['resultado']}/outras-listas", {}),
+             lambda c: 1 + 3 * c["repeticoes_nome"]),
+    Checagem("POST /api/contest-results/",
+             _upload,
+             lambda c: 2 * 20 * c["escala"] + 1),
+    Checagem("POST /api/contest-results/ (lista vazia)",
+             lambda c: ("POST", "/api/contest-results/", {"json": {
+                 "contest_id": c["rascunho"], "category": "Ampla", "names": [], "final_scores": [],
+             }}),
+             lambda c: 0),
+    Checagem("POST /api/contest-results-extra/",
+             lambda c: ("POST", "/api/contest-results-extra/",
+                        {"json": {"contest_result_id": c["resultado"], "situacao": "Convocado"}}),
+             lambda c: 3),
+    Checagem("GET /api/admin/stats",
+             lambda c: ("GET", "/api/admin/stats", {"headers": c["admin"]}),
+             lambda c: 1),
+    Checagem("GET /api/notifications",
+             lambda c: ("GET", "/api/notifications", {"headers": c["admin"], "params": {"limit": 50}}),
+             lambda c: 50),
+    Checagem("DELETE /api/contest-results/{id}/{category}",
+             lambda c: ("DELETE", f"/api/contest-results/{c['rascunho']}/Ampla", {"headers": c["admin"]}),
+             lambda c: 1),
+]
+
+
+class Contador:
+    """Statements, objetos ORM carregados e linhas que cada SELECT devolve pelo cursor."""
+
+    def __init__(self, engine, base):
+        from sqlalchemy import event
+
+        self.queries = 0
+        self.linhas = 0
+        self.lidas = 0
+        self.sql: List[str] = []
+        event.listen(engine, "before_cursor_execute", self._query)
+        event.listen(engine, "after_cursor_execute", self._lidas)
+        event.listen(base, "load", self._linha, propagate=True)
+
+    def _query(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries += 1
+        self.sql.append(statement)
+
+    def _lidas(self, conn, cursor, statement, parameters, context, executemany):
+        # O sqlite3 não informa rowcount de SELECT e o cursor original ainda vai
+        # ser consumido por quem executou: conta o mesmo SELECT num cursor à parte
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        contagem = conn.connection.dbapi_connection.cursor()
+        try:
+            contagem.execute(f"SELECT count(*) FROM ({statement})", parameters)
+            self.lidas += contagem.fetchone()[0]
+        finally:
+            contagem.close()
+
+    def _linha(self, target, context):
+        self.linhas += 1
+
+    def zerar(self):
+        self.queries = 0
+        self.linhas = 0
+        self.lidas = 0
+        self.sql = []
+
+
+def _contexto(db, contest_ids: List[int], escala: int, admin: Dict[str, str], rascunho: int) -> dict:
+    from sqlalchemy import func
+    from backend import models
+
+    tamanhos = dict(
+        db.query(models.ContestResult.contest_id, func.count(models.ContestResult.id))
+        .filter(models.ContestResult.contest_id.in_(contest_ids))
+        .group_by(models.ContestResult.contest_id)
+        .all()
+    )
+    a, b = sorted(contest_ids, key=lambda cid: -tamanhos.get(cid, 0))[:2]
+    resultado = (
+        db.query(models.ContestResult)
+        .filter(models.ContestResult.contest_id == a, models.ContestResult.person_id.isnot(None))
+        .order_by(models.ContestResult.id)
+        .first()
+    )
+    repeticoes = db.query(models.ContestResult).filter(models.ContestResult.person_id == resultado.person_id).count()
+    nomes = [n for (n,) in db.query(models.ContestResult.name).filter(models.ContestResult.contest_id == b).limit(200)]
+    return {
+        "escala": escala,
+        "a": a,
+        "b": b,
+        "tamanho_a": tamanhos[a],
+        "tamanho_b": tamanhos[b],
+        "total_contests": db.query(models.Contest).count(),
+        "resultado": resultado.id,
+        "person": resultado.person_id,
+        "nomes": [resultado.name] + nomes,
+        "repeticoes_nome": repeticoes,
+        "rascunho": rascunho,
+        "admin": admin,
+    }
+
+
+def _checar_pre_filtro(db, ctx: dict) -> Optional[str]:
+    """Candidatos do pré-filtro de /api/results-by-name/ contra os nomes que casam de verdade."""
+    from sqlalchemy import func, select
+    from backend import crud, models
+    from backend.normalization import normalizar_nome
+
+    nome = normalizar_nome(ctx["nomes"][0])
+    candidatos = db.execute(
+        select(func.count()).where(crud._pre_filtro_nome(models.ContestResult.name, nome))
+    ).scalar()
+    limite = 2 * ctx["repeticoes_nome"] + 5
+    if candidatos > limite:
+        return f"pré-filtro de nome: {candidatos} candidatos para {ctx['repeticoes_nome']} nomes iguais (limite {limite})"
+    return None
+
+
+def rodar(verbose: bool = False) -> List[str]:
+    from fastapi.testclient import TestClient
+    from backend.benchmarks import datagen
+    from backend.database import Base, SessionLocal, engine
+    from backend import admin_stats, auth, cache, identity, models
+    from backend.main import app
+
+    db = SessionLocal()
+    admin = models.User(email="admin@bench.local", username="admin", hashed_password="x",
+                        role="admin", email_confirmed=True)
+    db.add(admin)
+    rascunho = models.Contest(name="Rascunho", banca="-", site="-", edital_url="-", cargo="-")
+    db.add(rascunho)
+    db.commit()
+    cabecalho = {"Authorization": f"Bearer {auth.create_access_token(subject={'sub': str(admin.id)})}"}
+
+    contador = Contador(engine, Base)
+    client = TestClient(app)
+    medidas: Dict[str, List[tuple]] = {}
+    violacoes = []
+
+    for escala, (contests, results) in enumerate([(6, 1_200), (6, 4_800)], start=1):
+        datagen.popular(db, contests=contests, results=results, seed=escala, extras=0.2)
+        novos = [cid for (cid,) in db.query(models.Contest.id).order_by(models.Contest.id.desc()).limit(contests)]
+        identity.link_results(db)
+        ctx = _contexto(db, novos, escala, cabecalho, rascunho.id)
+        violacao = _checar_pre_filtro(db, ctx)
+        if violacao:
+            violacoes.append(f"{violacao} (escala {escala})")
+        for checagem in CHECAGENS:
+            metodo, url, kwargs = checagem.requisicao(ctx)
+            client.request(metodo, url, **kwargs)  # aquece caches de processo (índices, normalização)
+            metodo, url, kwargs = checagem.requisicao(ctx)  # de novo: uploads não podem repetir (idempotência)
+            cache.clear()  # mede o caminho frio (stats/projeção e respostas guardadas)
+            admin_stats.invalidate()
+            contador.zerar()
+            resp = client.request(metodo, url, **kwargs)
+            if resp.status_code >= 400:
+                violacoes.append(f"{checagem.nome}: status {resp.status_code} ({resp.text[:200]})")
+            medidas.setdefault(checagem.nome, []).append(
+                (contador.queries, contador.linhas, list(contador.sql), contador.lidas))
+            limite = checagem.max_linhas(ctx)
+            if contador.linhas > limite:
+                violacoes.append(f"{checagem.nome}: {contador.linhas} objetos carregados (limite {limite}, escala {escala})")
+            if checagem.max_lidas and contador.lidas > checagem.max_lidas(ctx):
+                violacoes.append(f"{checagem.nome}: {contador.lidas} linhas lidas do banco "
+                                 f"(limite {checagem.max_lidas(ctx)}, escala {escala})")
+    db.close()
+
+    print(f"{'endpoint':<48} {'queries':>12} {'objetos ORM':>14} {'linhas lidas':>16}")
+    for nome, (pequeno, grande) in medidas.items():
+        print(f"{nome:<48} {pequeno[0]:>5} -> {grande[0]:<5} {pequeno[1]:>6} -> {grande[1]:<6} "
+              f"{pequeno[3]:>7} -> {grande[3]:<7}")
+        if pequeno[0] != grande[0]:
+            violacoes.append(f"{nome}: {pequeno[0]} queries com dados pequenos, {grande[0]} com dados maiores")
+            if verbose:
+                for sql in grande[2]:
+                    print("    ", " ".join(sql.split())[:160])
+    return violacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checagem de N+1 / orçamento de queries por endpoint")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostra o SQL dos endpoints que falharem")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'query_budget.db')}"
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        os.environ.setdefault("SNAPSHOTS_ENABLED", "0")  # a publicação em fundo também faria queries
+        violacoes = rodar(args.verbose)
+    if violacoes:
+        print("\nFALHOU:")
+        for v in violacoes:
+            print(" -", v)
+        sys.exit(1)
+    print("\nOK: número de queries constante em todos os endpoints.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# backend/benchmarks/runner.py
+"""
+Medição e comparação com baseline para os benchmarks.
+
+Cada medição vira {"ops_per_sec", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "n"};
+baselines são arquivos JSON {nome_do_benchmark: medição}.
+
+As respostas da API passam pelo backend.cache: depois do aquecimento quase
+tudo seria acerto de cache. Para medir o caminho que consulta o banco, use
+`antes=cache.clear` (em processo) ou o backend SemCache (servidor separado).
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.cache import CacheBackend, MemoryBackend
+
+
+class SemCache(MemoryBackend):
+    """Backend que só guarda as versões, nunca os valores: toda consulta é um miss.
+
+    Num servidor separado: CACHE_BACKEND=backend.benchmarks.runner:SemCache e
+    DERIVED_CACHE_SIZE=0 (o LRU de derivados do processo). Em processo, passe o
+    backend atual como `versoes` para que as versões não voltem a zero (o que
+    faria os índices em memória recarregarem no meio da medição).
+    """
+
+    name = "none"
+
+    def __init__(self, versoes: Optional[CacheBackend] = None):
+        super().__init__(max_bytes=0)
+        self._versoes = versoes
+
+    def incr(self, key: str) -> int:
+        return self._versoes.incr(key) if self._versoes else super().incr(key)
+
+    def counter(self, key: str) -> int:
+        return self._versoes.counter(key) if self._versoes else super().counter(key)
+
+
+def resumir(duracoes: List[float], total: Optional[float] = None) -> dict:
+    ms = np.asarray(duracoes) * 1000
+    total = total if total is not None else float(np.sum(duracoes))
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "n": len(duracoes),
+        "ops_per_sec": round(len(duracoes) / total, 2) if total else None,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def medir(fn: Callable[[], object], repeticoes: int = 50, aquecimento: int = 3,
+          antes: Optional[Callable[[], object]] = None) -> dict:
+    """`antes` roda antes de cada chamada, fora do tempo medido (ex.: cache.clear)."""
+    antes = antes or (lambda: None)
+    for _ in range(aquecimento):
+        antes()
+        fn()
+    duracoes = []
+    pausas = 0.0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        antes()
+        t0 = time.perf_counter()
+        pausas += t0 - t
+        fn()
+        duracoes.append(time.perf_counter() - t0)
+    return resumir(duracoes, time.perf_counter() - inicio - pausas)
+
+
+async def medir_async(fn: Callable[[], Awaitable[object]], repeticoes: int = 50, aquecimento: int = 3,
+                      antes: Optional[Callable[[], object]] = None) -> dict:
+    """`antes` roda antes de cada chamada, fora do tempo medido (ex.: cache.clear)."""
+    antes = antes or (lambda: None)
+    for _ in range(aquecimento):
+        antes()
+        await fn()
+    duracoes = []
+    pausas = 0.0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        antes()
+        t0 = time.perf_counter()
+        pausas += t0 - t
+        await fn()
+        duracoes.append(time.perf_counter() - t0)
+    return resumir(duracoes, time.perf_counter() - inicio - pausas)
+
+
+def medir_async_sync(fn: Callable[[], Awaitable[object]], repeticoes: int = 50, aquecimento: int = 3,
+                     antes: Optional[Callable[[], object]] = None) -> dict:
+    return asyncio.run(medir_async(fn, repeticoes, aquecimento, antes))
+
+
+def imprimir(resultados: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None) -> None:
+    print(f"{'benchmark':<52} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'vs base':>9}")
+    for nome, r in resultados.items():
+        delta = ""
+        base = (baseline or {}).get(nome)
+        if base and base.get("p50_ms"):
+            delta = f"{(r['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f}%"
+        print(f"{nome:<52} {r['ops_per_sec'] or 0:>10.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {delta:>9}")
+
+
+def regressoes(resultados: Dict[str, dict], baseline: Dict[str, dict], tolerancia: float = 0.2) -> List[str]:
+    """Benchmarks cujo p50 piorou mais que `tolerancia` (0.2 = 20%) em relação ao baseline."""
+    piores = []
+    for nome, r in resultados.items():
+        base = baseline.get(nome)
+        if base and base.get("p50_ms") and r["p50_ms"] > base["p50_ms"] * (1 + tolerancia):
+            piores.append(nome)
+    return piores
+
+
+def carregar_baseline(path: str) -> Dict[str, dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_baseline(path: str, resultados: Dict[str, dict], meta: Optional[dict] = None) -> None:
+    dados = dict(resultados)
+    if meta:
+        dados["_meta"] = meta
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
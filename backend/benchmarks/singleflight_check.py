@@ -0,0 +1,135 @@
+# backend/benchmarks/singleflight_check.py
+"""
+Checagem de regressão da coalescência (backend.singleflight), síncrona e async.
+
+Várias chamadas simultâneas da mesma chave, com uma função lenta de
+propósito, e falha se:
+- a função rodar mais de uma vez para chamadas que se sobrepõem;
+- quem esperou não receber o mesmo valor (ou o mesmo erro) do líder;
+- um 429 do líder for repassado a quem estava esperando;
+- o cancelamento de um seguidor cancelar a execução compartilhada.
+
+Uso (sai com código 1 se houver violação, para rodar no CI):
+    python -m backend.benchmarks.singleflight_check
+"""
+import asyncio
+import sys
+import threading
+import time
+from typing import List
+
+from fastapi import HTTPException
+
+from backend.singleflight import SingleFlight
+
+SEGUIDORES = 8
+
+
+async def _async_coalesce(violacoes: List[str]) -> None:
+    flight = SingleFlight("check")
+    execucoes = 0
+
+    async def lento():
+        nonlocal execucoes
+        execucoes += 1
+        await asyncio.sleep(0.05)
+        return b"corpo"
+
+    valores = await asyncio.gather(*(flight.do_async("k", lento) for _ in range(SEGUIDORES)))
+    if execucoes != 1 or set(valores) != {b"corpo"}:
+        violacoes.append(f"async: {execucoes} execuções, valores {set(valores)}")
+    if flight.coalesced != SEGUIDORES - 1 or flight.in_flight():
+        violacoes.append(f"async: coalesced={flight.coalesced}, in_flight={flight.in_flight()}")
+
+
+async def _async_erro_compartilhado(violacoes: List[str]) -> None:
+    flight = SingleFlight("check")
+    execucoes = 0
+
+    async def falha():
+        nonlocal execucoes
+        execucoes += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("quebrou")
+
+    saidas = await asyncio.gather(*(flight.do_async("k", falha) for _ in range(SEGUIDORES)), return_exceptions=True)
+    if execucoes != 1 or not all(isinstance(s, ValueError) for s in saidas):
+        violacoes.append(f"async erro: {execucoes} execuções, saídas {saidas}")
+
+
+async def _async_429_do_lider(violacoes: List[str]) -> None:
+    flight = SingleFlight("check")
+    execucoes = 0
+
+    async def recusa_a_primeira():
+        nonlocal execucoes
+        execucoes += 1
+        await asyncio.sleep(0.05)
+        if execucoes == 1:
+            raise HTTPException(status_code=429, detail="ocupado")
+        return b"corpo"
+
+    saidas = await asyncio.gather(
+        *(flight.do_async("k", recusa_a_primeira) for _ in range(SEGUIDORES)), return_exceptions=True
+    )
+    recusados = [s for s in saidas if isinstance(s, HTTPException)]
+    if len(recusados) != 1 or saidas.count(b"corpo") != SEGUIDORES - 1 or execucoes != 2:
+        violacoes.append(f"async 429: {len(recusados)} recusas repassadas, {execucoes} execuções")
+
+
+async def _async_seguidor_cancelado(violacoes: List[str]) -> None:
+    flight = SingleFlight("check")
+
+    async def lento():
+        await asyncio.sleep(0.1)
+        return b"corpo"
+
+    lider = asyncio.ensure_future(flight.do_async("k", lento))
+    await asyncio.sleep(0)
+    seguidor = asyncio.ensure_future(flight.do_async("k", lento))
+    await asyncio.sleep(0.01)
+    seguidor.cancel()
+    if await lider != b"corpo" or not seguidor.cancelled():
+        violacoes.append("async: cancelar um seguidor afetou o líder")
+
+
+def _sync_coalesce(violacoes: List[str]) -> None:
+    flight = SingleFlight("check")
+    execucoes = 0
+    valores = []
+
+    def lento():
+        nonlocal execucoes
+        execucoes += 1
+        time.sleep(0.05)
+        return b"corpo"
+
+    threads = [threading.Thread(target=lambda: valores.append(flight.do("k", lento))) for _ in range(SEGUIDORES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if execucoes != 1 or valores != [b"corpo"] * SEGUIDORES:
+        violacoes.append(f"sync: {execucoes} execuções, {len(valores)} valores")
+
+
+def rodar() -> List[str]:
+    violacoes: List[str] = []
+    _sync_coalesce(violacoes)
+    for checagem in (_async_coalesce, _async_erro_compartilhado, _async_429_do_lider, _async_seguidor_cancelado):
+        asyncio.run(checagem(violacoes))
+    return violacoes
+
+
+def main():
+    violacoes = rodar()
+    if violacoes:
+        print("FALHOU:")
+        for v in violacoes:
+            print(" -", v)
+        sys.exit(1)
+    print("OK: coalescência síncrona e async.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+# backend/bulk_import.py
+"""
+Importador offline de listas históricas (CSV/JSON) direto nas tabelas.
+
+Entrada: um diretório ou arquivo .zip/.tar(.gz) contendo
+- contests.json ou contests.csv: metadados dos concursos, com as colunas
+  key, name, banca, site, edital_url, cargo (key é como os arquivos de
+  resultado se referem ao concurso);
+- arquivos de resultado, um por concurso (ou por concurso + categoria):
+  * CSV com colunas name, final_score e opcionalmente category, position e
+    contest (sem contest, vale o nome do arquivo: <key>.csv ou
+    <key>__<categoria>.csv). Separador , ou ; e nota com vírgula são aceitos.
+  * JSON: lista de linhas com os mesmos campos, ou
+    {"contest": <key ou metadados>, "category": ..., "names": [...],
+    "final_scores": [...]} (o mesmo formato do upload da API), ou
+    {"contest": ..., "results": [...]}.
+
+Os arquivos são lidos da fonte um a um (os metadados antes, numa passada
+só por eles) e normalizados num pool de processos; concursos são
+deduplicados por (nome, banca, cargo) normalizados, inclusive contra o que
+já está no banco; as linhas entram por executemany em transações grandes
+(--batch linhas). Cada arquivo concluído vai para o checkpoint, então uma
+importação interrompida continua de onde parou. Uma lista (concurso +
+categoria) que já tem linhas no banco é pulada.
+
+Um arquivo com categoria desconhecida ou posição repetida numa lista não
+é importado: os erros saem linha a linha e ele fica fora do checkpoint,
+para ser corrigido e importado de novo. Depois de cada commit são emitidos
+os mesmos eventos do upload pela API (concursos criados, listas criadas),
+para que caches e demais derivados dos resultados acompanhem.
+
+Uso:
+    python -m backend.bulk_import historico.zip --workers 8 --checkpoint import.ckpt
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend import models, events
+from backend.normalization import normalizar_nome
+
+CATEGORIAS = {"ampla": "Ampla", "ppp": "PPP", "pcd": "PCD", "indigenas": "Indígenas"}
+ARQUIVOS_METADADOS = ("contests.json", "contests.csv")
+CAMPOS_CONCURSO = ("name", "banca", "site", "edital_url", "cargo")
+
+
+# --- Leitura da fonte ---
+
+def _listar(fonte: str, so_metadados: bool = False) -> Iterator[Tuple[str, bytes]]:
+    """(nome relativo, conteúdo) de cada arquivo .csv/.json da fonte, em ordem estável.
+
+    Lê um arquivo por vez: só o conteúdo do arquivo corrente fica em memória.
+    """
+    def interessa(nome: str) -> bool:
+        base = os.path.basename(nome)
+        if so_metadados and base.lower() not in ARQUIVOS_METADADOS:
+            return False
+        return nome.lower().endswith((".csv", ".json")) and not base.startswith(".")
+
+    if os.path.isdir(fonte):
+        for raiz, _, arquivos in sorted(os.walk(fonte)):
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                if interessa(nome):
+                    with open(caminho, "rb") as f:
+                        yield os.path.relpath(caminho, fonte), f.read()
+    elif zipfile.is_zipfile(fonte):
+        with zipfile.ZipFile(fonte) as z:
+            for nome in sorted(z.namelist()):
+                if interessa(nome) and not nome.endswith("/"):
+                    yield nome, z.read(nome)
+    elif tarfile.is_tarfile(fonte):
+        # Ordem do próprio arquivo: num .tar.gz, voltar atrás é descomprimir de novo desde o início
+        with tarfile.open(fonte) as t:
+            for membro in t:
+                if membro.isfile() and interessa(membro.name):
+                    yield membro.name, t.extractfile(membro).read()
+    else:
+        raise SystemExit(f"Fonte não reconhecida (diretório, .zip ou .tar): {fonte}")
+
+
+def _texto(conteudo: bytes) -> str:
+    try:
+        return conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return conteudo.decode("latin-1")
+
+
+def _linhas_csv(texto: str) -> List[dict]:
+    amostra = texto[:4096]
+    delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+    leitor = csv.DictReader(io.StringIO(texto), delimiter=delimitador)
+    return [{(k or "").strip().lower(): (v or "").strip() for k, v in linha.items()} for linha in leitor]
+
+
+# --- Parsing (roda nos processos do pool) ---
+
+def _categoria(valor: Optional[str]) -> Optional[str]:
+    if not valor:
+        return None
+    return CATEGORIAS.get(normalizar_nome(valor).replace(" ", ""))
+
+
+def _nota(valor) -> Optional[float]:
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    return float(str(valor).replace(",", "."))
+
+
+def _chave_do_arquivo(nome: str) -> Tuple[str, Optional[str]]:
+    base = os.path.splitext(os.path.basename(nome))[0]
+    if "__" in base:
+        key, cat = base.rsplit("__", 1)
+        if _categoria(cat):
+            return key, _categoria(cat)
+    # Sufixo que não é categoria: o nome inteiro é a key (sem metadados, o erro aparece na carga)
+    return base, None
+
+
+def parse_file(item: Tuple[str, bytes]) -> dict:
+    """Lê um arquivo de resultados e devolve linhas já normalizadas (tuplas simples, baratas de serializar)."""
+    nome, conteudo = item
+    key_arquivo, cat_arquivo = _chave_do_arquivo(nome)
+    saida = {"file": nome, "sha256": hashlib.sha256(conteudo).hexdigest(), "lists": {}, "contests": {}, "errors": []}
+    try:
+        texto = _texto(conteudo)
+        contest_doc = None
+        if nome.lower().endswith(".json"):
+            doc = json.loads(texto)
+            if isinstance(doc, dict):
+                contest_doc = doc.get("contest")
+                if doc.get("category"):
+                    cat_arquivo = _categoria(doc["category"])
+                    if cat_arquivo is None:
+                        raise ValueError(f"categoria desconhecida {doc['category']!r}")
+                if "names" in doc:
+                    linhas = [{"name": n, "final_score": s} for n, s in zip(doc["names"], doc.get("final_scores") or [])]
+                else:
+                    linhas = doc.get("results") or []
+            else:
+                linhas = doc
+        else:
+            linhas = _linhas_csv(texto)
+
+        key_padrao = key_arquivo
+        if isinstance(contest_doc, dict):
+            key_padrao = str(contest_doc.get("key") or key_arquivo)
+            saida["contests"][key_padrao] = {c: str(contest_doc.get(c) or "") for c in CAMPOS_CONCURSO}
+        elif contest_doc is not None:
+            key_padrao = str(contest_doc)
+
+        proxima_posicao: Dict[Tuple[str, str], int] = {}
+        ocupadas: Dict[Tuple[str, str], set] = {}
+        rejeitado = False
+        for i, linha in enumerate(linhas, start=1):
+            nome_candidato = " ".join(str(linha.get("name") or "").split())
+            if not nome_candidato:
+                continue
+            if linha.get("category"):
+                categoria = _categoria(linha["category"])
+                if categoria is None:
+                    saida["errors"].append(f"linha {i}: categoria desconhecida {linha['category']!r}")
+                    rejeitado = True
+                    continue
+            else:
+                categoria = cat_arquivo or "Ampla"
+            key = str(linha.get("contest") or key_padrao)
+            lista = (key, categoria)
+            posicao = linha.get("position")
+            posicao = int(posicao) if posicao not in (None, "") else proxima_posicao.get(lista, 1)
+            proxima_posicao[lista] = posicao + 1
+            if posicao in ocupadas.setdefault(lista, set()):
+                saida["errors"].append(f"linha {i}: posição {posicao} repetida em {key}/{categoria}")
+                rejeitado = True
+                continue
+            ocupadas[lista].add(posicao)
+            try:
+                nota = _nota(linha.get("final_score"))
+            except ValueError:
+                saida["errors"].append(f"linha {i}: nota inválida {linha.get('final_score')!r}")
+                nota = None
+            saida["lists"].setdefault(lista, []).append((posicao, nome_candidato, nota))
+        if rejeitado:
+            saida["lists"] = {}
+            saida["failed"] = True
+    except Exception as e:  # arquivo corrompido não derruba a importação inteira
+        saida["errors"].append(f"{type(e).__name__}: {e}")
+        saida["lists"] = {}
+        saida["failed"] = True
+    return saida
+
+
+def _ler_metadados(nome: str, conteudo: bytes) -> Dict[str, dict]:
+    texto = _texto(conteudo)
+    linhas = json.loads(texto) if nome.lower().endswith(".json") else _linhas_csv(texto)
+    return {
+        str(l.get("key") or l.get("name")): {c: str(l.get(c) or "") for c in CAMPOS_CONCURSO}
+        for l in linhas
+    }
+
+
+# --- Checkpoint ---
+
+class Checkpoint:
+    """Arquivo JSON-lines com os arquivos já importados (nome + hash)."""
+
+    def __init__(self, caminho: Optional[str]):
+        self.caminho = caminho
+        self.feitos: Dict[str, str] = {}
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                for linha in f:
+                    if linha.strip():
+                        registro = json.loads(linha)
+                        self.feitos[registro["file"]] = registro["sha256"]
+
+    def ja_importado(self, nome: str, conteudo: bytes) -> bool:
+        return nome in self.feitos and self.feitos[nome] == hashlib.sha256(conteudo).hexdigest()
+
+    def marcar(self, registros: List[dict]) -> None:
+        for r in registros:
+            self.feitos[r["file"]] = r["sha256"]
+        if not self.caminho:
+            return
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            for r in registros:
+                f.write(json.dumps({"file": r["file"], "sha256": r["sha256"], "rows": r["rows"]}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# --- Carga ---
+
+def _chave_concurso(meta: dict) -> Tuple[str, str, str]:
+    return normalizar_nome(meta["name"]), normalizar_nome(meta["banca"]), normalizar_nome(meta["cargo"])
+
+
+class Importer:
+    def __init__(self, db: Session, metadados: Dict[str, dict], checkpoint: Checkpoint, batch: int = 100_000):
+        self.db = db
+        self.metadados = metadados
+        self.checkpoint = checkpoint
+        self.batch = batch
+        self.stats = {"files": 0, "skipped_files": 0, "rows": 0, "lists": 0, "skipped_lists": 0,
+                      "contests_created": 0, "contests_reused": 0, "errors": 0}
+        self._concursos: Dict[Tuple[str, str, str], int] = {
+            _chave_concurso({"name": n, "banca": b, "cargo": c}): cid
+            for cid, n, b, c in db.query(models.Contest.id, models.Contest.name, models.Contest.banca, models.Contest.cargo)
+        }
+        self._por_key: Dict[str, int] = {}
+        self._listas_existentes = set(
+            db.query(models.ContestResult.contest_id, models.ContestResult.category).distinct()
+        )
+        self._pendentes: List[dict] = []
+        self._linhas: List[dict] = []
+        self._listas_no_lote: List[Tuple[int, str]] = []
+        self._concursos_no_lote: List[int] = []
+        self._sem_metadados = set()
+
+    def _contest_id(self, key: str, meta_arquivo: Dict[str, dict]) -> Optional[int]:
+        if key in self._por_key:
+            return self._por_key[key]
+        meta = meta_arquivo.get(key) or self.metadados.get(key)
+        if meta is None:
+            return None
+        chave = _chave_concurso(meta)
+        contest_id = self._concursos.get(chave)
+        if contest_id is None:
+            contest_id = self.db.execute(
+                insert(models.Contest).returning(models.Contest.id),
+                [{c: meta[c] or "-" for c in CAMPOS_CONCURSO}],
+            ).scalar_one()
+            self._concursos[chave] = contest_id
+            self._concursos_no_lote.append(contest_id)
+            self.stats["contests_created"] += 1
+        else:
+            self.stats["contests_reused"] += 1
+        self._por_key[key] = contest_id
+        return contest_id
+
+    def add(self, parsed: dict) -> None:
+        linhas = 0
+        for erro in parsed["errors"]:
+            print(f"  ! {parsed['file']}: {erro}")
+        self.stats["errors"] += len(parsed["errors"])
+        for (key, categoria), itens in parsed["lists"].items():
+            contest_id = self._contest_id(key, parsed["contests"])
+            if contest_id is None:
+                if key not in self._sem_metadados:
+                    self._sem_metadados.add(key)
+                    print(f"  ! {parsed['file']}: concurso '{key}' sem metadados, listas ignoradas")
+                    self.stats["errors"] += 1
+                continue
+            if (contest_id, categoria) in self._listas_existentes:
+                self.stats["skipped_lists"] += 1
+                continue
+            self._listas_existentes.add((contest_id, categoria))
+            self._listas_no_lote.append((contest_id, categoria))
+            self.stats["lists"] += 1
+            for posicao, nome, nota in itens:
+                self._linhas.append({"contest_id": contest_id, "category": categoria, "position": posicao,
+                                     "name": nome, "final_score": nota})
+            linhas += len(itens)
+        if not parsed.get("failed"):
+            # Arquivo ilegível fica fora do checkpoint para ser tentado de novo depois de corrigido
+            self._pendentes.append({"file": parsed["file"], "sha256": parsed["sha256"], "rows": linhas})
+        if len(self._linhas) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._linhas:
+            for i in range(0, len(self._linhas), 10_000):
+                self.db.execute(insert(models.ContestResult), self._linhas[i:i + 10_000])
+        self.db.commit()
+        # Checkpoint só depois do commit: no pior caso o arquivo é relido e a lista, já existente, é pulada
+        self.checkpoint.marcar(self._pendentes)
+        self.stats["rows"] += len(self._linhas)
+        self.stats["files"] += len(self._pendentes)
+        self._linhas, self._pendentes = [], []
+        self._emitir()
+
+    def _emitir(self) -> None:
+        """Mesmos eventos do upload pela API, depois do commit do lote."""
+        for contest_id in self._concursos_no_lote:
+            events.emit(events.CONTEST_UPDATED, db=self.db, contest_id=contest_id)
+        for contest_id, categoria in self._listas_no_lote:
+            criados = [
+                {"id": rid, "name": nome, "position": pos, "final_score": nota}
+                for rid, nome, pos, nota in self.db.query(
+                    models.ContestResult.id, models.ContestResult.name,
+                    models.ContestResult.position, models.ContestResult.final_score,
+                ).filter(
+                    models.ContestResult.contest_id == contest_id,
+                    models.ContestResult.category == categoria,
+                ).order_by(models.ContestResult.position)
+            ]
+            events.emit(events.RESULTS_CREATED, db=self.db, contest_id=contest_id, category=categoria, results=criados)
+        self._concursos_no_lote, self._listas_no_lote = [], []
+
+
+def _em_janelas(itens: Iterator, tamanho: int) -> Iterator[List]:
+    janela = []
+    for item in itens:
+        janela.append(item)
+        if len(janela) >= tamanho:
+            yield janela
+            janela = []
+    if janela:
+        yield janela
+
+
+def run_import(
+    db: Session,
+    fonte: str,
+    workers: Optional[int] = None,
+    batch: int = 100_000,
+    checkpoint_path: Optional[str] = None,
+    link_persons: bool = True,
+) -> dict:
+    inicio = time.perf_counter()
+    checkpoint = Checkpoint(checkpoint_path)
+    # Primeira passada só pelos metadados: os arquivos de resultado podem vir antes deles na fonte
+    metadados: Dict[str, dict] = {}
+    for nome, conteudo in _listar(fonte, so_metadados=True):
+        metadados.update(_ler_metadados(nome, conteudo))
+
+    importer = Importer(db, metadados, checkpoint, batch=batch)
+    workers = workers or os.cpu_count() or 1
+    print(f"{len(metadados)} concursos nos metadados")
+
+    def a_importar() -> Iterator[Tuple[str, bytes]]:
+        for nome, conteudo in _listar(fonte):
+            if os.path.basename(nome).lower() in ARQUIVOS_METADADOS:
+                continue
+            if checkpoint.ja_importado(nome, conteudo):
+                importer.stats["skipped_files"] += 1
+                continue
+            yield nome, conteudo
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Janelas limitam quanto conteúdo fica em memória/em trânsito para o pool ao mesmo tempo
+            for janela in _em_janelas(a_importar(), workers * 8):
+                for parsed in pool.map(parse_file, janela, chunksize=4):
+                    importer.add(parsed)
+    else:
+        for item in a_importar():
+            importer.add(parse_file(item))
+    importer.flush()
+
+    if link_persons and importer.stats["rows"]:
+        from backend import identity
+        importer.stats["persons"] = identity.link_results(db)
+
+    segundos = time.perf_counter() - inicio
+    importer.stats["seconds"] = round(segundos, 2)
+    importer.stats["rows_per_second"] = int(importer.stats["rows"] / segundos) if segundos else 0
+    return importer.stats
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+    # Ouvintes que gravam fora deste processo (versões do cache, manifests dos
+    # snapshots, notificações) precisam estar inscritos para os eventos da carga.
+    # As versões só chegam à API se ela também usar um backend de cache
+    # compartilhado (o padrão com WEB_CONCURRENCY > 1 ou JOB_WORKERS=0).
+    from backend import cache, snapshots, watchlist  # noqa: F401
+
+    cache.usar_backend_compartilhado("bulk_import")
+
+    parser = argparse.ArgumentParser(description="Importa listas históricas (CSV/JSON) em lote")
+    parser.add_argument("fonte", help="diretório, .zip ou .tar(.gz)")
+    parser.add_argument("--workers", type=int, help="processos de parsing (padrão: nº de CPUs)")
+    parser.add_argument("--batch", type=int, default=100_000, help="linhas por transação")
+    parser.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: <fonte>.checkpoint)")
+    parser.add_argument("--no-link-persons", action="store_true", help="não ligar os candidatos a persons no fim")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    db = SessionLocal()
+    try:
+        stats = run_import(
+            db, args.fonte, workers=args.workers, batch=args.batch,
+            checkpoint_path=args.checkpoint or f"{args.fonte.rstrip('/')}.checkpoint",
+            link_persons=not args.no_link_persons,
+        )
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+# backend/cache.py
+"""
+Cache de dados derivados (estatísticas, projeções...) e de respostas já
+serializadas (listas, compare, batch de nomes, catálogo de concursos).
+
+Cada concurso tem um número de versão que sobe a cada escrita em seus
+resultados ou extras (e o catálogo tem o seu, que sobe a cada concurso
+criado/editado); as chaves incluem essas versões, então uma escrita
+invalida tudo que foi calculado antes sem precisar varrer o cache.
+
+As versões e os valores ficam num CacheBackend:
+- "memory" (padrão com um worker só): por processo, LRU por bytes;
+- "sqlite": um arquivo SQLite local (WAL) usado por todos os processos da
+  máquina — vários workers do uvicorn e os processos da fila de jobs veem
+  as mesmas versões (a escrita feita em um invalida os outros) e
+  reaproveitam o que outro worker já calculou, em vez de cada um guardar
+  a sua cópia. LRU por bytes (CACHE_MAX_BYTES), sem serviço externo.
+- "pacote.modulo:Classe": qualquer outra implementação de CacheBackend
+  (ex.: um servidor de cache externo), ou set_backend() em código.
+
+CACHE_BACKEND escolhe; sem ele, vale "sqlite" quando a API divide o banco
+com outros processos (WEB_CONCURRENCY > 1, ou JOB_WORKERS=0 com a fila em
+processos dedicados) e nos próprios processos fora da API (worker da fila,
+bulk_import), que chamam usar_backend_compartilhado(). Com o "memory" as
+versões subidas num processo não chegam aos outros, e o que a API guardou
+nunca expira.
+Os derivados continuam também num LRU de objetos por processo
+(derived_cache), consultado antes do backend.
+
+O backend guarda só bytes: respostas já serializadas vão como estão e os
+derivados (dicts) como JSON — nada lido dele é desserializado com pickle.
+O arquivo do "sqlite" fica numa pasta do usuário do app (CACHE_PATH ou
+$XDG_CACHE_HOME/classificacao), nunca no temp compartilhado; pasta ou arquivo
+de outro usuário, ou pasta com escrita para outros, fazem a criação falhar.
+"""
+from collections import Counter, OrderedDict
+from threading import Lock, local
+from typing import Any, Callable, Dict, Hashable, Optional
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from backend import events
+
+logger = logging.getLogger(__name__)
+
+_MISS = object()
+
+MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, name: str = "cache"):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._dados: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            valor = self._dados.get(key, _MISS)
+            if valor is _MISS:
+                self.misses += 1
+                return default
+            self._dados.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._dados[key] = value
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        valor = self.get(key, _MISS)
+        if valor is _MISS:
+            valor = compute()
+            self.set(key, valor)
+        return valor
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._dados), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# --- Backends ---
+
+class CacheBackend:
+    """Interface do armazenamento: valores em bytes (LRU) e contadores de versão."""
+
+    name = "backend"
+    shared = False  # visível para os outros processos da máquina?
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Soma 1 ao contador (criando-o) e devolve o novo valor."""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Apaga os valores; os contadores ficam (uma versão nunca pode voltar)."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._valores: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._contadores: Dict[str, int] = {}
+        self._stats: Counter = Counter()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            valor = self._valores.get(key)
+            if valor is None:
+                self._stats["misses"] += 1
+                return None
+            self._valores.move_to_end(key)
+            self._stats["hits"] += 1
+            return valor
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes // 8:
+            self._stats["too_large"] += 1
+            return
+        with self._lock:
+            anterior = self._valores.pop(key, None)
+            self._bytes += len(value) - (len(anterior) if anterior is not None else 0)
+            self._valores[key] = value
+            while self._bytes > self.max_bytes:
+                _, removido = self._valores.popitem(last=False)
+                self._bytes -= len(removido)
+                self._stats["evictions"] += 1
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._contadores[key] = self._contadores.get(key, 0) + 1
+            return self._contadores[key]
+
+    def counter(self, key: str) -> int:
+        return self._contadores.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valores.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._valores), "bytes": self._bytes, "max_bytes": self.max_bytes, **self._stats}
+
+
+class SQLiteBackend(CacheBackend):
+    """Arquivo SQLite local (WAL) compartilhado pelos processos da máquina.
+
+    Uma conexão por thread (e por processo). Leitura é um SELECT pela PK; o
+    instante de acesso, que ordena o despejo, só é regravado se tiver mais
+    de TOQUE segundos. A gravação e o despejo dos menos usados acontecem
+    numa transação só; o total de bytes fica num contador, sem SUM na tabela.
+    Falha ao ler/gravar um valor conta como falta (o cache nunca derruba a
+    requisição). Falha nos contadores de versão sobe, mas o aumento de versão
+    roda num ouvinte de evento e events.emit só registra o erro no log: a
+    escrita no banco vale e as respostas em cache daquele concurso continuam
+    sendo servidas até o próximo aumento que der certo (ou um clear()).
+    """
+
+    name = "sqlite"
+    shared = True
+    TOQUE = 1.0
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = local()
+        self._stats: Counter = Counter()
+        _preparar_arquivo(path)
+        conn = self._conexao()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO counters (key, value) VALUES ('_bytes', 0);
+        """)
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            conn = self._conexao()
+            linha = conn.execute("SELECT value, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+            if linha is None:
+                self._stats["misses"] += 1
+                return None
+            agora = time.time()
+            if agora - linha[1] > self.TOQUE:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (agora, key))
+            self._stats["hits"] += 1
+            return linha[0]
+        except sqlite3.Error:
+            self._stats["errors"] += 1
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes // 8:
+            self._stats["too_large"] += 1
+            return
+        try:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                anterior = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                total = conn.execute(
+                    "UPDATE counters SET value = value + ? WHERE key = '_bytes' RETURNING value",
+                    (len(value) - (anterior[0] if anterior else 0),),
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    self._despejar(conn, total)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self._stats["errors"] += 1
+
+    def _despejar(self, conn: sqlite3.Connection, total: int) -> None:
+        # Desce a 90% do limite, para não despejar a cada gravação
+        alvo = int(self.max_bytes * 0.9)
+        while total > alvo:
+            lote = conn.execute("SELECT key, size FROM entries ORDER BY accessed LIMIT 64").fetchall()
+            if not lote:
+                break
+            apagar = []
+            for chave, tamanho in lote:
+                apagar.append((chave,))
+                total -= tamanho
+                if total <= alvo:
+                    break
+            conn.executemany("DELETE FROM entries WHERE key = ?", apagar)
+            self._stats["evictions"] += len(apagar)
+        conn.execute("UPDATE counters SET value = ? WHERE key = '_bytes'", (max(total, 0),))
+
+    def incr(self, key: str) -> int:
+        return self._conexao().execute(
+            "INSERT INTO counters (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value",
+            (key,),
+        ).fetchone()[0]
+
+    def counter(self, key: str) -> int:
+        linha = self._conexao().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return linha[0] if linha else 0
+
+    def clear(self) -> None:
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entries")
+        conn.execute("UPDATE counters SET value = 0 WHERE key = '_bytes'")
+        conn.execute("COMMIT")
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._conexao()
+        return {
+            "entries": conn.execute("SELECT count(*) FROM entries").fetchone()[0],
+            "bytes": self.counter("_bytes"),
+            "max_bytes": self.max_bytes,
+            **self._stats,
+        }
+
+
+def _preparar_arquivo(path: str) -> None:
+    """Cria pasta (0700) e arquivo (0600) e recusa os que outro usuário controla.
+
+    Quem consegue gravar no arquivo (ou trocá-lo, com escrita na pasta) decide o
+    que o app lê do cache.
+    """
+    pasta = os.path.dirname(os.path.abspath(path))
+    os.makedirs(pasta, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    info = os.stat(pasta)
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise RuntimeError(f"Cache: a pasta {pasta} precisa ser do usuário do app e sem escrita para outros")
+    fd = os.open(path, os.O_CREAT | os.O_RDWR | os.O_NOFOLLOW, 0o600)
+    try:
+        info = os.fstat(fd)
+        if info.st_uid != os.getuid():
+            raise RuntimeError(f"Cache: {path} pertence a outro usuário")
+        if info.st_mode & 0o077:
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+def _caminho_padrao() -> str:
+    # Um arquivo por banco: dois apps (ou testes) na mesma máquina não misturam versões
+    url = os.getenv("DATABASE_URL", "sqlite:///./meubanco.db")
+    if url.startswith("sqlite:///"):
+        url = "sqlite:///" + os.path.abspath(url[len("sqlite:///"):])
+    sufixo = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "classificacao", f"cache-{sufixo}.sqlite3")
+
+
+def varios_processos() -> bool:
+    """A API divide o banco com outros processos (workers do uvicorn ou a fila de jobs dedicada)?"""
+    return int(os.getenv("WEB_CONCURRENCY", "1")) > 1 or os.getenv("JOB_WORKERS", "1") == "0"
+
+
+def _criar_backend(compartilhado: bool = False) -> CacheBackend:
+    tipo = os.getenv("CACHE_BACKEND") or ("sqlite" if compartilhado or varios_processos() else "memory")
+    if tipo == "memory":
+        return MemoryBackend()
+    if tipo == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_PATH") or _caminho_padrao())
+    modulo, _, classe = tipo.partition(":")
+    return getattr(importlib.import_module(modulo), classe)()
+
+
+_backend: CacheBackend = _criar_backend()
+
+
+def set_backend(backend: CacheBackend) -> None:
+    global _backend
+    _backend = backend
+    derived_cache.clear()  # as versões do backend novo não têm relação com as do anterior
+
+
+def get_backend() -> CacheBackend:
+    return _backend
+
+
+def usar_backend_compartilhado(processo: str) -> None:
+    """Para processos que escrevem no banco fora da API (worker da fila, bulk_import).
+
+    Sem CACHE_BACKEND, passa ao "sqlite" (o mesmo arquivo da API, derivado do
+    DATABASE_URL). Com um backend explícito que não é compartilhado, avisa: a
+    API não vai ver as versões subidas aqui e seguirá servindo respostas velhas.
+    """
+    if _backend.shared:
+        return
+    if os.getenv("CACHE_BACKEND"):
+        logger.warning(
+            "%s: CACHE_BACKEND=%s não é compartilhado; as escritas deste processo não invalidam o cache da API",
+            processo, os.getenv("CACHE_BACKEND"),
+        )
+        return
+    set_backend(_criar_backend(compartilhado=True))
+
+
+# --- Versões ---
+
+derived_cache = LRUCache(int(os.getenv("DERIVED_CACHE_SIZE", "2048")), name="derived")
+
+
+def contest_version(contest_id: int) -> int:
+    return _backend.counter(f"v:contest:{contest_id}")
+
+
+def data_version() -> int:
+    """Sobe a cada escrita em qualquer concurso (para derivados que cruzam concursos)."""
+    return _backend.counter("v:data")
+
+
+def catalog_version() -> int:
+    """Sobe a cada concurso criado ou editado (listagem e facets do catálogo)."""
+    return _backend.counter("v:catalog")
+
+
+def bump_contest_version(contest_id: int) -> int:
+    _backend.incr("v:data")
+    return _backend.incr(f"v:contest:{contest_id}")
+
+
+# --- Valores ---
+
+def _chave(namespace: str, key: Hashable) -> str:
+    return f"{namespace}:{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()}"
+
+
+def _codificar(valor: Any) -> Optional[bytes]:
+    # Um byte de tipo na frente: "b" bytes como estão, "j" JSON
+    if isinstance(valor, bytes):
+        return b"b" + valor
+    try:
+        return b"j" + json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        return None
+
+
+def _decodificar(bruto: bytes) -> Any:
+    tipo, corpo = bruto[:1], bruto[1:]
+    if tipo == b"b":
+        return corpo
+    if tipo == b"j":
+        return json.loads(corpo)
+    return _MISS  # formato desconhecido (ex.: entrada de uma versão antiga): recalcula
+
+
+def get_or_compute(namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """Valor no backend (compartilhado, se for o caso); a chave precisa conter as versões dos dados.
+
+    O valor precisa ser bytes ou serializável em JSON (tuplas voltam como listas).
+    """
+    chave = _chave(namespace, key)
+    bruto = _backend.get(chave)
+    if bruto is not None:
+        valor = _decodificar(bruto)
+        if valor is not _MISS:
+            return valor
+    valor = compute()
+    codificado = _codificar(valor)
+    if codificado is None:
+        logger.warning("Cache: valor de %s não é bytes nem JSON; não guardado", namespace)
+    else:
+        _backend.set(chave, codificado)
+    return valor
+
+
+def cached_for_contest(namespace: str, contest_id: int, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """Busca/calcula um derivado do concurso, amarrado à versão atual dele."""
+    chave = (namespace, contest_id, contest_version(contest_id), key)
+    if not _backend.shared:
+        return derived_cache.get_or_compute(chave, compute)
+    return derived_cache.get_or_compute(chave, lambda: get_or_compute("derived", chave, compute))
+
+
+def clear() -> None:
+    """Esvazia o cache de derivados do processo e os valores do backend (as versões ficam)."""
+    derived_cache.clear()
+    _backend.clear()
+
+
+def _invalidar_concurso(contest_id: int, **_):
+    bump_contest_version(contest_id)
+
+
+def _invalidar_catalogo(**_):
+    _backend.incr("v:catalog")
+
+
+for _evento in (events.RESULTS_CREATED, events.RESULTS_DELETED, events.EXTRA_UPDATED, events.CONTEST_UPDATED,
+               events.RESULTS_REPLACED):
+    events.subscribe(_evento, _invalidar_concurso)
+events.subscribe(events.CONTEST_UPDATED, _invalidar_catalogo)
@@ -0,0 +1,582 @@
+# backend/columnar.py
+"""
+Motor de leitura colunar (opcional) sobre todos os resultados.
+
+As leituras quentes — batch de nomes, "nomeado em outra lista", busca por
+nome, compare — só olham algumas colunas de contest_results e a situação do
+extra. Aqui elas ficam em arrays NumPy, uma posição por resultado:
+
+    id        int64    (ordem crescente)
+    nome      int32    código do nome normalizado (dicionário)
+    original  int32    código da grafia original
+    contest   int32
+    categoria int8     código da categoria
+    posicao   int32
+    nota      float64  (NaN = sem nota)
+    situacao  int16    código da situação (0 = sem extra / vazia)
+    vivo      bool     (linhas removidas viram lápide até a compactação)
+
+Para nome e concurso há um índice ordenado (argsort + valores ordenados):
+a busca de um lote de nomes é um searchsorted e uma coleta vetorizada, sem
+percorrer a tabela. Uploads entram por merge nos índices (np.insert); troca
+de situação e linhas que continuam numa substituição de lista são escritas
+no lugar; exclusões marcam lápides.
+Tudo chega pelos eventos do crud, como no rank_index; a carga (query longa)
+monta o estado fora de _lock e só o instala se nenhum evento chegou no meio
+(_geracao), senão refaz.
+
+Escritas de outros processos (outro worker do uvicorn, python -m backend.jobs
+worker, bulk_import) não geram evento aqui: o motor guarda a
+cache.data_version() que reflete e, se ela andou sem um evento deste processo,
+recarrega antes da próxima leitura. Isso só enxerga os outros processos com um
+backend de cache compartilhado; com o "memory" e a API em vários processos
+(WEB_CONCURRENCY > 1 ou JOB_WORKERS=0) o motor não é ativado.
+
+Ativado com COLUMNAR_ENGINE=1 (carrega na primeira leitura). Desativado, o
+compare de N concursos monta um motor temporário só com os concursos pedidos.
+"""
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+# cache antes daqui: os ouvintes dele (que sobem a data_version) rodam antes dos deste módulo
+from backend import cache, models, events, metrics
+from backend.normalization import normalizar_nome, normalizar_nomes
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("COLUMNAR_ENGINE", "0") == "1"
+SITUACAO_PADRAO = "Aguardando Convocação"
+COMPACTAR_ACIMA = 0.25   # fração de lápides que dispara a compactação
+LOTE_CARGA = 50_000
+
+_TIPOS = {
+    "id": np.int64,
+    "nome": np.int32,
+    "original": np.int32,
+    "contest": np.int32,
+    "categoria": np.int8,
+    "posicao": np.int32,
+    "nota": np.float64,
+    "situacao": np.int16,
+    "vivo": np.bool_,
+}
+
+
+class _Dicionario:
+    """Valor <-> código inteiro; os códigos nunca mudam (só crescem)."""
+
+    def __init__(self, iniciais: Iterable = ()):
+        self.valores: List = []
+        self.codigos: Dict = {}
+        for v in iniciais:
+            self.codigo(v)
+
+    def codigo(self, valor) -> int:
+        c = self.codigos.get(valor)
+        if c is None:
+            c = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return c
+
+    def codificar(self, valores: Iterable, dtype) -> np.ndarray:
+        return np.fromiter((self.codigo(v) for v in valores), dtype=dtype)
+
+    def procurar(self, valores: Iterable) -> np.ndarray:
+        """Códigos existentes; -1 para valor desconhecido (sem criar)."""
+        return np.fromiter((self.codigos.get(v, -1) for v in valores), dtype=np.int64)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.valores) + sys.getsizeof(self.codigos) + sum(
+            sys.getsizeof(v) for v in self.valores
+        )
+
+
+class _Indice:
+    """Índice ordenado de uma coluna: linhas em ordem de valor (estável)."""
+
+    def __init__(self, coluna: np.ndarray):
+        self.ordem = np.argsort(coluna, kind="stable").astype(np.int64)
+        self.valores = coluna[self.ordem]
+
+    def inserir(self, novos: np.ndarray, primeira_linha: int) -> None:
+        ordem_novos = np.argsort(novos, kind="stable")
+        valores_novos = novos[ordem_novos]
+        # side="right": entre iguais, as linhas novas (ids maiores) ficam depois
+        onde = np.searchsorted(self.valores, valores_novos, side="right")
+        self.ordem = np.insert(self.ordem, onde, ordem_novos + primeira_linha)
+        self.valores = np.insert(self.valores, onde, valores_novos)
+
+    def faixas(self, chaves: np.ndarray):
+        return (np.searchsorted(self.valores, chaves, side="left"),
+                np.searchsorted(self.valores, chaves, side="right"))
+
+    def linhas(self, chave: int) -> np.ndarray:
+        lo = np.searchsorted(self.valores, chave, side="left")
+        hi = np.searchsorted(self.valores, chave, side="right")
+        return self.ordem[lo:hi]
+
+    def nbytes(self) -> int:
+        return self.ordem.nbytes + self.valores.nbytes
+
+
+def _coletar(indice: _Indice, lo: np.ndarray, hi: np.ndarray):
+    """Linhas de várias faixas do índice de uma vez + a qual chave cada uma pertence."""
+    tamanhos = hi - lo
+    total = int(tamanhos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    inicio = np.repeat(lo - (np.cumsum(tamanhos) - tamanhos), tamanhos)
+    linhas = indice.ordem[inicio + np.arange(total)]
+    return linhas, np.repeat(np.arange(len(lo)), tamanhos)
+
+
+_ESTADO = ("c", "nomes", "originais", "categorias", "situacoes", "_nomeado", "por_nome", "por_contest",
+           "lapides", "carga_segundos")
+
+
+class ColumnarEngine:
+    def __init__(self):
+        self._lock = Lock()
+        self._carga_lock = Lock()
+        self._carregado = False
+        self._geracao = 0
+        self._versao: Optional[int] = None  # cache.data_version() refletida no estado
+        self._limpar()
+
+    def _limpar(self) -> None:
+        self.c: Dict[str, np.ndarray] = {k: np.empty(0, dtype=t) for k, t in _TIPOS.items()}
+        self.nomes = _Dicionario()
+        self.originais = _Dicionario()
+        self.categorias = _Dicionario()
+        self.situacoes = _Dicionario([None])
+        self._nomeado = np.zeros(1, dtype=bool)
+        self.por_nome = _Indice(self.c["nome"])
+        self.por_contest = _Indice(self.c["contest"])
+        self.lapides = 0
+        self.carga_segundos = 0.0
+
+    # --- Carga ---
+
+    def load(self, db: Session, contest_ids: Optional[Sequence[int]] = None) -> "ColumnarEngine":
+        while True:
+            with self._lock:
+                geracao = self._geracao
+            # Lida antes da query: uma escrita que caia depois dela aparece como versão nova
+            versao = cache.data_version()
+            novo = ColumnarEngine()._preencher(db, contest_ids)
+            with self._lock:
+                if self._geracao == geracao:
+                    for atributo in _ESTADO:
+                        setattr(self, atributo, getattr(novo, atributo))
+                    self._carregado = True
+                    self._versao = versao
+                    return self
+
+    def _preencher(self, db: Session, contest_ids: Optional[Sequence[int]]) -> "ColumnarEngine":
+        inicio = time.perf_counter()
+        query = (
+            db.query(
+                models.ContestResult.id,
+                models.ContestResult.name,
+                models.ContestResult.contest_id,
+                models.ContestResult.category,
+                models.ContestResult.position,
+                models.ContestResult.final_score,
+                models.ContestResultExtra.situacao,
+            )
+            .outerjoin(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+            .order_by(models.ContestResult.id)
+        )
+        if contest_ids is not None:
+            query = query.filter(models.ContestResult.contest_id.in_(list(contest_ids)))
+        partes = []
+        linhas = iter(query.yield_per(LOTE_CARGA))
+        while True:
+            lote = list(islice(linhas, LOTE_CARGA))
+            if not lote:
+                break
+            partes.append(self._codificar(lote))
+        if partes:
+            self.c = {k: np.concatenate([p[k] for p in partes]) for k in _TIPOS}
+        self._reindexar()
+        self.carga_segundos = time.perf_counter() - inicio
+        return self
+
+    def _codificar(self, linhas: List[tuple]) -> Dict[str, np.ndarray]:
+        n = len(linhas)
+        return {
+            "id": np.fromiter((l[0] for l in linhas), dtype=np.int64, count=n),
+            "nome": self.nomes.codificar(normalizar_nomes(l[1] for l in linhas), np.int32),
+            "original": self.originais.codificar((l[1] for l in linhas), np.int32),
+            "contest": np.fromiter((l[2] for l in linhas), dtype=np.int32, count=n),
+            "categoria": self.categorias.codificar((l[3] for l in linhas), np.int8),
+            "posicao": np.fromiter((l[4] for l in linhas), dtype=np.int32, count=n),
+            "nota": np.fromiter((np.nan if l[5] is None else l[5] for l in linhas), dtype=np.float64, count=n),
+            "situacao": self.situacoes.codificar((l[6] or None for l in linhas), np.int16),
+            "vivo": np.ones(n, dtype=bool),
+        }
+
+    def _reindexar(self) -> None:
+        self.por_nome = _Indice(self.c["nome"])
+        self.por_contest = _Indice(self.c["contest"])
+        self._atualizar_nomeados()
+
+    def _atualizar_nomeados(self) -> None:
+        if len(self._nomeado) == len(self.situacoes.valores):
+            return
+        self._nomeado = np.array(
+            [bool(s) and ("nomead" in s.lower() or "empossad" in s.lower()) for s in self.situacoes.valores],
+            dtype=bool,
+        )
+
+    def _em_dia(self) -> bool:
+        return self._carregado and self._versao == cache.data_version()
+
+    def ensure_loaded(self, db: Session) -> "ColumnarEngine":
+        if not self._em_dia():
+            with self._carga_lock:
+                if not self._em_dia():
+                    self.load(db)
+        return self
+
+    def acompanhar_versao(self) -> None:
+        """Depois de aplicar um evento deste processo: a versão andou só por ele?
+
+        Se andou mais (escrita de outro processo no meio), _versao fica para
+        trás e a próxima leitura recarrega.
+        """
+        versao = cache.data_version()
+        with self._lock:
+            if self._versao is not None and versao == self._versao + 1:
+                self._versao = versao
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limpar()
+            self._carregado = False
+            self._geracao += 1
+
+    # --- Atualização incremental (eventos) ---
+
+    def _linhas_por_id(self, ids: np.ndarray) -> np.ndarray:
+        """Linha viva de cada id (-1 se não existe)."""
+        pos = np.searchsorted(self.c["id"], ids)
+        pos = np.minimum(pos, max(len(self.c["id"]) - 1, 0))
+        if len(self.c["id"]) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        achou = (self.c["id"][pos] == ids) & self.c["vivo"][pos]
+        return np.where(achou, pos, -1)
+
+    def append(self, contest_id: int, category: str, results: List[dict],
+               situacoes: Optional[Dict[int, Optional[str]]] = None) -> None:
+        if not results:
+            return
+        with self._lock:
+            self._geracao += 1
+            if self._carregado:
+                self._anexar(contest_id, category, results, situacoes)
+
+    def _anexar(self, contest_id: int, category: str, results: List[dict],
+                situacoes: Optional[Dict[int, Optional[str]]] = None) -> None:
+        if not results:
+            return
+        ids = np.fromiter((r["id"] for r in results), dtype=np.int64, count=len(results))
+        # O evento pode chegar depois de uma carga que já viu estas linhas
+        novos = self._linhas_por_id(ids) < 0
+        if not novos.all():
+            results = [r for r, n in zip(results, novos) if n]
+            if not results:
+                return
+        situacoes = situacoes or {}
+        linhas = [
+            (r["id"], r["name"], contest_id, category, r["position"], r["final_score"], situacoes.get(r["id"]))
+            for r in results
+        ]
+        novas = self._codificar(linhas)
+        if len(self.c["id"]) and novas["id"].min() <= self.c["id"][-1]:
+            # id reaproveitado (o SQLite reusa o maior id apagado): compacta e reordena por id
+            vivos = self.c["vivo"]
+            self.c = {k: np.concatenate([self.c[k][vivos], novas[k]]) for k in _TIPOS}
+            ordem = np.argsort(self.c["id"], kind="stable")
+            self.c = {k: v[ordem] for k, v in self.c.items()}
+            self.lapides = 0
+            self._reindexar()
+            return
+        primeira = len(self.c["id"])
+        self.c = {k: np.concatenate([self.c[k], novas[k]]) for k in _TIPOS}
+        self.por_nome.inserir(novas["nome"], primeira)
+        self.por_contest.inserir(novas["contest"], primeira)
+        self._atualizar_nomeados()
+
+    def _linhas_da_lista(self, contest_id: int, category: Optional[str]) -> np.ndarray:
+        linhas = self.por_contest.linhas(contest_id)
+        linhas = linhas[self.c["vivo"][linhas]]
+        if category is not None:
+            codigo = self.categorias.codigos.get(category, -1)
+            linhas = linhas[self.c["categoria"][linhas] == codigo]
+        return linhas
+
+    def drop(self, contest_id: int, category: Optional[str] = None) -> None:
+        with self._lock:
+            self._geracao += 1
+            if not self._carregado:
+                return
+            linhas = self._linhas_da_lista(contest_id, category)
+            self.c["vivo"][linhas] = False
+            self.lapides += len(linhas)
+            self._compactar_se_preciso()
+
+    def replace(self, contest_id: int, category: str, results: List[dict], added_ids: Iterable[int]) -> None:
+        """Lista substituída: linhas que continuam são atualizadas no lugar (mantêm a situação)."""
+        novos = set(added_ids)
+        por_id = {r["id"]: r for r in results if r["id"] not in novos}
+        with self._lock:
+            self._geracao += 1
+            if not self._carregado:
+                return
+            linhas = self._linhas_da_lista(contest_id, category)
+            ficam = np.isin(self.c["id"][linhas], np.fromiter(por_id, dtype=np.int64, count=len(por_id)))
+            saem = linhas[~ficam]
+            self.c["vivo"][saem] = False
+            self.lapides += len(saem)
+            renomeou = False
+            for linha in linhas[ficam].tolist():
+                r = por_id[int(self.c["id"][linha])]
+                self.c["posicao"][linha] = r["position"]
+                self.c["nota"][linha] = np.nan if r["final_score"] is None else r["final_score"]
+                original = self.originais.codigo(r["name"])
+                if original != self.c["original"][linha]:
+                    self.c["original"][linha] = original
+                    nome = self.nomes.codigo(normalizar_nome(r["name"]))
+                    if nome != self.c["nome"][linha]:
+                        self.c["nome"][linha] = nome
+                        renomeou = True
+            if renomeou:
+                self.por_nome = _Indice(self.c["nome"])
+            self._anexar(contest_id, category, [r for r in results if r["id"] in novos])
+            self._compactar_se_preciso()
+
+    def set_situacao(self, contest_result_id: int, situacao: Optional[str]) -> None:
+        with self._lock:
+            self._geracao += 1
+            if not self._carregado:
+                return
+            linha = int(self._linhas_por_id(np.array([contest_result_id], dtype=np.int64))[0])
+            if linha >= 0:
+                self.c["situacao"][linha] = self.situacoes.codigo(situacao or None)
+                self._atualizar_nomeados()
+
+    def _compactar_se_preciso(self) -> None:
+        total = len(self.c["id"])
+        if total and self.lapides / total > COMPACTAR_ACIMA:
+            vivos = self.c["vivo"]
+            self.c = {k: v[vivos] for k, v in self.c.items()}
+            self.lapides = 0
+            self._reindexar()
+
+    # --- Leituras ---
+
+    def _linhas_dos_nomes(self, nomes_norm: List[str]):
+        codigos = self.nomes.procurar(nomes_norm)
+        lo, hi = self.por_nome.faixas(codigos)
+        linhas, grupo = _coletar(self.por_nome, lo, hi)
+        vivos = self.c["vivo"][linhas]
+        return linhas[vivos], grupo[vivos]
+
+    def names_status(self, names: List[str], exclude_contest: Optional[int] = None) -> Dict[str, bool]:
+        """Para cada nome: está nomeado/empossado em alguma lista (fora exclude_contest)?"""
+        with self._lock:
+            linhas, grupo = self._linhas_dos_nomes(normalizar_nomes(names))
+            ok = self._nomeado[self.c["situacao"][linhas]]
+            if exclude_contest is not None:
+                ok &= self.c["contest"][linhas] != exclude_contest
+        marcados = np.bincount(grupo[ok], minlength=len(names)) > 0
+        return dict(zip(names, marcados.tolist()))
+
+    def result_ids_by_name(self, name: str) -> List[int]:
+        with self._lock:
+            linhas, _ = self._linhas_dos_nomes([normalizar_nome(name)])
+            return self.c["id"][linhas].tolist()
+
+    def compare(self, contest_ids: Sequence[int]) -> List[dict]:
+        """Nomes presentes em todos os concursos, com as entradas de cada um."""
+        with self._lock:
+            listas = [np.sort(self._linhas_da_lista(cid, None)) for cid in contest_ids]
+            if not listas or any(l.size == 0 for l in listas):
+                return []
+            comuns = np.unique(self.c["nome"][listas[0]])
+            for linhas in listas[1:]:
+                comuns = np.intersect1d(comuns, self.c["nome"][linhas], assume_unique=False)
+            if comuns.size == 0:
+                return []
+            por_contest = []
+            for linhas in listas:
+                sel = linhas[np.isin(self.c["nome"][linhas], comuns)]
+                # agrupa por nome mantendo a ordem de id dentro do grupo
+                ordem = sel[np.argsort(self.c["nome"][sel], kind="stable")]
+                codigos = self.c["nome"][ordem]
+                cortes = np.flatnonzero(np.diff(codigos)) + 1
+                grupos = np.split(ordem, cortes)
+                por_contest.append({int(self.c["nome"][g[0]]): g for g in grupos})
+            nomes = self.nomes.valores
+            originais = self.originais.valores
+            categorias = self.categorias.valores
+            situacoes = self.situacoes.valores
+            col = self.c
+
+            def entrada(linha: int) -> dict:
+                return {
+                    "name": originais[col["original"][linha]],
+                    "category": categorias[col["categoria"][linha]],
+                    "position": int(col["posicao"][linha]),
+                    "contest_result_id": int(col["id"][linha]),
+                    "situacao": situacoes[col["situacao"][linha]] or SITUACAO_PADRAO,
+                }
+
+            saida = []
+            for codigo in sorted(comuns.tolist(), key=lambda c: nomes[c]):
+                entradas = [[entrada(int(l)) for l in grupos[codigo]] for grupos in por_contest]
+                contagem = Counter(e["name"] for lista in entradas for e in lista)
+                saida.append({
+                    "name": contagem.most_common(1)[0][0],
+                    "norm": nomes[codigo],
+                    "contests": [{"contest_id": cid, "results": lista} for cid, lista in zip(contest_ids, entradas)],
+                })
+            return saida
+
+    def compare_pair(self, contest_id_1: int, contest_id_2: int) -> List[dict]:
+        """Mesmo formato de crud.compare_contests."""
+        return [
+            {"name": m["name"], "norm": m["norm"],
+             "contest_1": m["contests"][0]["results"], "contest_2": m["contests"][1]["results"]}
+            for m in self.compare([contest_id_1, contest_id_2])
+        ]
+
+    # --- Relatório ---
+
+    def memory(self) -> Dict[str, int]:
+        with self._lock:
+            uso = {f"column_{k}": int(v.nbytes) for k, v in self.c.items()}
+            uso["index_nome"] = self.por_nome.nbytes()
+            uso["index_contest"] = self.por_contest.nbytes()
+            uso["dict_nomes"] = self.nomes.nbytes()
+            uso["dict_originais"] = self.originais.nbytes()
+            uso["dict_outros"] = self.categorias.nbytes() + self.situacoes.nbytes()
+        uso["total"] = sum(uso.values())
+        return uso
+
+    def stats(self) -> dict:
+        with self._lock:
+            linhas = len(self.c["id"])
+            info = {
+                "enabled": enabled(),
+                "loaded": self._carregado,
+                "rows": linhas,
+                "live_rows": linhas - self.lapides,
+                "tombstones": self.lapides,
+                "distinct_names": len(self.nomes.valores),
+                "load_seconds": round(self.carga_segundos, 3),
+            }
+        info["memory_bytes"] = self.memory()
+        return info
+
+
+engine = ColumnarEngine()
+
+
+_recusado = False
+
+
+def enabled() -> bool:
+    global _recusado
+    if ENABLED and not cache.get_backend().shared and cache.varios_processos():
+        # Escritas feitas nos outros processos nunca chegariam aqui: melhor ler do banco
+        if not _recusado:
+            _recusado = True
+            logger.warning("COLUMNAR_ENGINE ignorado: vários processos e um backend de cache não compartilhado")
+        return False
+    return ENABLED
+
+
+def get_engine(db: Session) -> ColumnarEngine:
+    return engine.ensure_loaded(db)
+
+
+def compare_many(db: Session, contest_ids: Sequence[int]) -> List[dict]:
+    """Compare de N concursos: usa o motor global se ativo, senão um temporário só com eles.
+
+    Concursos arquivados (backend.archive) não ficam no motor; se algum foi
+    pedido, o temporário recebe as linhas dele lidas do arquivo.
+    """
+    from backend import archive
+
+    arquivados = [cid for (cid,) in db.query(models.Contest.id).filter(
+        models.Contest.id.in_(list(contest_ids)), models.Contest.archived_at.isnot(None)
+    )]
+    if enabled() and not arquivados:
+        return get_engine(db).compare(contest_ids)
+    temporario = ColumnarEngine().load(db, contest_ids=[c for c in contest_ids if c not in arquivados])
+    for contest_id in arquivados:
+        linhas = archive.get_results(db, contest_id)
+        por_categoria: Dict[str, List[dict]] = {}
+        for r in linhas:
+            por_categoria.setdefault(r.category, []).append(
+                {"id": r.id, "name": r.name, "position": r.position, "final_score": r.final_score}
+            )
+        situacoes = {r.id: r.extra.situacao for r in linhas if r.extra}
+        for category, resultados in por_categoria.items():
+            temporario.append(contest_id, category, resultados, situacoes)
+    return temporario.compare(contest_ids)
+
+
+@events.subscribe(events.RESULTS_CREATED)
+def _ao_criar_resultados(contest_id: int, category: str, results, **_):
+    # Restauração do arquivo traz a situação junto de cada linha
+    engine.append(contest_id, category, results, {r["id"]: r["situacao"] for r in results if r.get("situacao")})
+    engine.acompanhar_versao()
+
+
+@events.subscribe(events.RESULTS_DELETED)
+def _ao_remover_resultados(contest_id: int, category: Optional[str] = None, **_):
+    engine.drop(contest_id, category)
+    engine.acompanhar_versao()
+
+
+@events.subscribe(events.RESULTS_REPLACED)
+def _ao_substituir_lista(contest_id: int, category: str, results, added_ids, **_):
+    engine.replace(contest_id, category, results, added_ids)
+    engine.acompanhar_versao()
+
+
+@events.subscribe(events.EXTRA_UPDATED)
+def _ao_atualizar_extra(extra, **_):
+    engine.set_situacao(extra.contest_result_id, extra.situacao)
+    engine.acompanhar_versao()
+
+
+@events.subscribe(events.CONTEST_UPDATED)
+def _ao_atualizar_concurso(**_):
+    # Não muda resultados, mas sobe a data_version
+    engine.acompanhar_versao()
+
+
+def _coletor():
+    if not engine._carregado:
+        return
+    info = engine.stats()
+    yield ("columnar_rows", {"kind": "live"}, info["live_rows"])
+    yield ("columnar_rows", {"kind": "tombstones"}, info["tombstones"])
+    for parte, n in info["memory_bytes"].items():
+        yield ("columnar_memory_bytes", {"part": parte}, n)
+
+
+metrics.register_collector(_coletor)
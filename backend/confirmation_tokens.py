@@ -0,0 +1,175 @@
+# backend/confirmation_tokens.py
+"""
+Ciclo de vida dos tokens de confirmação de e-mail.
+
+- O token vai só no link do e-mail; no banco fica o sha256 dele
+  (confirmation_tokens.token_hash, único/indexado), com a validade em
+  expires_at. A busca é uma igualdade no índice que já descarta os vencidos.
+- Reenviar troca o token (o anterior deixa de valer); confirmar apaga.
+- Tokens antigos, gravados em texto em users.confirmation_token antes desta
+  tabela, continuam aceitos até vencer (busca indexada + is_token_expired).
+
+A varredura apaga tokens vencidos, limpa os tokens legados vencidos e remove
+contas locais nunca confirmadas depois de UNCONFIRMED_MAX_DAYS, sempre em
+lotes pequenos, cada um na sua transação, para não segurar locks em users:
+    python -m backend.confirmation_tokens sweep [--batch 500] [--max-batches N]
+(ou o job "token_sweep"; com {"every": segundos} ele se reagenda).
+"""
+import argparse
+import hashlib
+import os
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.orm import Session
+
+from backend import models, events
+from backend.email_service import email_service
+
+TTL_HOURS = int(os.getenv("CONFIRMATION_TOKEN_TTL_HOURS", "24"))
+UNCONFIRMED_MAX_DAYS = int(os.getenv("UNCONFIRMED_MAX_DAYS", "30"))
+SWEEP_BATCH = int(os.getenv("TOKEN_SWEEP_BATCH", "500"))
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue(db: Session, user: models.User) -> str:
+    """Gera um token novo para o usuário (invalida os anteriores); o commit fica com quem chama."""
+    if user.id is None:
+        db.flush()
+    token = secrets.token_urlsafe(32)
+    agora = datetime.utcnow()
+    db.execute(delete(models.ConfirmationToken).where(models.ConfirmationToken.user_id == user.id))
+    db.add(models.ConfirmationToken(
+        user_id=user.id,
+        token_hash=hash_token(token),
+        expires_at=agora + timedelta(hours=TTL_HOURS),
+        created_at=agora,
+    ))
+    user.confirmation_token = None
+    user.confirmation_sent_at = datetime.now(timezone.utc)
+    return token
+
+
+def find_user(db: Session, token: str) -> Optional[models.User]:
+    """Dono do token, se o token existe e não venceu."""
+    if not token:
+        return None
+    user = (
+        db.query(models.User)
+        .join(models.ConfirmationToken, models.ConfirmationToken.user_id == models.User.id)
+        .filter(
+            models.ConfirmationToken.token_hash == hash_token(token),
+            models.ConfirmationToken.expires_at > datetime.utcnow(),
+        )
+        .first()
+    )
+    if user:
+        return user
+    legado = db.query(models.User).filter(models.User.confirmation_token == token).first()
+    if legado and not email_service.is_token_expired(legado.confirmation_sent_at, hours=TTL_HOURS):
+        return legado
+    return None
+
+
+def consume(db: Session, user: models.User) -> None:
+    """Remove os tokens do usuário (após a confirmação); o commit fica com quem chama."""
+    db.execute(delete(models.ConfirmationToken).where(models.ConfirmationToken.user_id == user.id))
+    user.confirmation_token = None
+
+
+# --- Varredura ---
+
+def _em_lotes(db: Session, proximos_ids: Callable[[int], List[int]], aplicar: Callable[[List[int]], None],
+              batch: int, max_batches: Optional[int], pausa: float) -> int:
+    total = 0
+    lotes = 0
+    while max_batches is None or lotes < max_batches:
+        ids = proximos_ids(batch)
+        if not ids:
+            break
+        aplicar(ids)
+        db.commit()  # uma transação curta por lote
+        total += len(ids)
+        lotes += 1
+        if pausa:
+            time.sleep(pausa)
+    return total
+
+
+def sweep(db: Session, batch: int = SWEEP_BATCH, max_batches: Optional[int] = None, pausa: float = 0.0) -> Dict[str, int]:
+    agora = datetime.utcnow()
+    agora_tz = datetime.now(timezone.utc)
+    limite_token = agora_tz - timedelta(hours=TTL_HOURS)
+    limite_conta = agora_tz - timedelta(days=UNCONFIRMED_MAX_DAYS)
+    Token, User = models.ConfirmationToken, models.User
+
+    tokens = _em_lotes(
+        db,
+        lambda n: [i for (i,) in db.query(Token.id).filter(Token.expires_at <= agora).order_by(Token.id).limit(n)],
+        lambda ids: db.execute(delete(Token).where(Token.id.in_(ids))),
+        batch, max_batches, pausa,
+    )
+
+    legados = _em_lotes(
+        db,
+        lambda n: [i for (i,) in db.query(User.id).filter(
+            User.confirmation_token.isnot(None),
+            or_(User.confirmation_sent_at.is_(None), User.confirmation_sent_at < limite_token),
+        ).order_by(User.id).limit(n)],
+        lambda ids: db.execute(update(User).where(User.id.in_(ids)).values(confirmation_token=None)),
+        batch, max_batches, pausa,
+    )
+
+    def _apagar_contas(ids: List[int]) -> None:
+        # Filhos apagados aqui mesmo: sem PRAGMA foreign_keys o SQLite ignora o ON DELETE CASCADE,
+        # e um id de usuário reaproveitado herdaria os nomes seguidos e notificações
+        for filho in (Token, models.FollowedName, models.Notification):
+            db.execute(delete(filho).where(filho.user_id.in_(ids)))
+        db.execute(delete(User).where(User.id.in_(ids)))
+
+    # Só contas locais, nunca confirmadas, antigas e sem um reenvio recente
+    contas = _em_lotes(
+        db,
+        lambda n: [i for (i,) in db.query(User.id).filter(
+            User.email_confirmed.is_(False),
+            User.created_at < limite_conta,
+            User.provider == "local",
+            User.role != "admin",
+            or_(User.confirmation_sent_at.is_(None), User.confirmation_sent_at < limite_token),
+        ).order_by(User.id).limit(n)],
+        _apagar_contas,
+        batch, max_batches, pausa,
+    )
+    if contas:
+        events.emit(events.USER_UPDATED, db=db, user_id=None)
+    return {"expired_tokens": tokens, "legacy_tokens": legados, "unconfirmed_users": contas}
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Tokens de confirmação de e-mail")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sweep", help="apaga tokens vencidos e contas não confirmadas abandonadas")
+    s.add_argument("--batch", type=int, default=SWEEP_BATCH)
+    s.add_argument("--max-batches", type=int)
+    s.add_argument("--pause", type=float, default=0.0, help="segundos entre lotes")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    db = SessionLocal()
+    try:
+        print(sweep(db, batch=args.batch, max_batches=args.max_batches, pausa=args.pause))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 # backend/crud.py
-from sqlalchemy.orm import Session, joinedload
-from backend import models, schemas
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from backend import models, schemas, events, confirmation_tokens, columnar, archive, offload, singleflight
 from backend.email_service import email_service
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime, timedelta, timezone
+import base64
+import hashlib
 import secrets
-from sqlalchemy import func
+from sqlalchemy import and_, func, insert, or_, select, true
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from collections import Counter, defaultdict
-import unicodedata
+from backend.normalization import LETRAS_ESPECIAIS, normalizar_nome, normalizar_nomes
 import json
 import logging
 logger = logging.getLogger(__name__)
@@ -23,7 +26,7 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 def get_user_by_confirmation_token(db: Session, token: str):
-    return db.query(models.User).filter(models.User.confirmation_token == token).first()
+    return confirmation_tokens.find_user(db, token)
 
 # -------------------------
 # CREATE USER (gera token)
@@ -48,21 +51,15 @@ def create_user(db: Session, user_data: dict):
         email_confirmed=False,
     )
 
-    confirmation_token = secrets.token_urlsafe(32)
-    user.confirmation_token = confirmation_token
-    user.confirmation_sent_at = datetime.now(timezone.utc)
-
     try:
         db.add(user)
+        db.flush()
+        confirmation_token = confirmation_tokens.issue(db, user)
         db.commit()
         db.refresh(user)
+        events.emit(events.USER_UPDATED, db=db, user_id=user.id)
 
-        logger.info(
-            f"[DEBUG] Usuário {user.email} criado com token {user.confirmation_token}"
-        )
-        logger.info(
-            f"[DEBUG] Link de confirmação: http://localhost:5173/confirmar-email?token={confirmation_token}"
-         )
+        logger.info(f"Usuário {user.email} criado; token de confirmação emitido")
 
         try:
             email_service.send_confirmation_email(
@@ -99,11 +96,12 @@ def confirm_user_email(db: Session, token: str):
 
     try:
         user.email_confirmed = True
-        user.confirmation_token = None
+        confirmation_tokens.consume(db, user)
         
         db.add(user)
         db.commit()
         db.refresh(user)
+        events.emit(events.USER_UPDATED, db=db, user_id=user.id)
         
         logger.info(f"E-mail confirmado com sucesso para o usuário id={user.id}, email={user.email}")
         return user
@@ -127,15 +125,17 @@ def resend_confirmation_email(db: Session, email: str) -> bool:
         return False
 
     try:
-        new_token = secrets.token_urlsafe(32)
-        user.confirmation_token = new_token
-        user.confirmation_sent_at = datetime.now(timezone.utc)
+        new_token = confirmation_tokens.issue(db, user)
         db.add(user)
         db.commit()
         db.refresh(user)
 
         logger.info(f"Reenviando e-mail de confirmação para: {user.email} (token gerado)")
-        return True
+        return email_service.send_confirmation_email(
+            to_email=user.email,
+            user_name=user.username or "Usuário",
+            confirmation_token=new_token,
+        )
     except Exception:
         logger.exception("Erro ao gerar/re-enviar token de confirmação.")
         db.rollback()
@@ -156,6 +156,7 @@ def create_user_google(db: Session, user_data: dict):
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        events.emit(events.USER_UPDATED, db=db, user_id=db_user.id)
         return db_user
     except Exception as e:
         db.rollback()
@@ -167,39 +168,269 @@ def create_contest(db: Session, contest: schemas.ContestCreate):
     db.add(db_contest)
     db.commit()
     db.refresh(db_contest)
+    events.emit(events.CONTEST_UPDATED, db=db, contest_id=db_contest.id)
     return db_contest
 
 def get_contests(db: Session):
     return db.query(models.Contest).all()
 
-def create_contest_results(db: Session, data: schemas.ContestResultCreate):
+CONTEST_SORTS = {
+    "id": models.Contest.id,
+    "name": models.Contest.name,
+    "banca": models.Contest.banca,
+    "cargo": models.Contest.cargo,
+    "created_at": models.Contest.created_at,
+}
+
+
+def _filtrar_contests(query, banca: Optional[str] = None, cargo: Optional[str] = None, q: Optional[str] = None):
+    if banca:
+        query = query.filter(models.Contest.banca == banca)
+    if cargo:
+        query = query.filter(models.Contest.cargo == cargo)
+    if q:
+        termo = normalizar_nome(q).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(func.lower(func.unaccent(models.Contest.name)).like(f"%{termo}%", escape="\\"))
+    return query
+
+
+def _cursor_encode(valor, contest_id: int) -> str:
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([valor, contest_id]).encode()).decode().rstrip("=")
+
+
+def _cursor_decode(cursor: str, sort: str):
+    try:
+        valor, contest_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if sort == "created_at" and valor is not None:
+            valor = datetime.fromisoformat(valor)
+        return valor, int(contest_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def search_contests(
+    db: Session,
+    banca: Optional[str] = None,
+    cargo: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: str = "id",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """Catálogo filtrado e ordenado, paginado por chave (sort, id). Devolve (itens, próximo cursor)."""
+    coluna = CONTEST_SORTS[sort]
+    desc = order == "desc"
+    query = _filtrar_contests(db.query(models.Contest), banca, cargo, q)
+
+    if cursor:
+        valor, ultimo_id = _cursor_decode(cursor, sort)
+        if sort == "id":
+            query = query.filter(models.Contest.id < ultimo_id if desc else models.Contest.id > ultimo_id)
+        elif desc:
+            query = query.filter(or_(coluna < valor, and_(coluna == valor, models.Contest.id < ultimo_id)))
+        else:
+            query = query.filter(or_(coluna > valor, and_(coluna == valor, models.Contest.id > ultimo_id)))
+
+    ordem = [coluna.desc(), models.Contest.id.desc()] if desc else [coluna.asc(), models.Contest.id.asc()]
+    if sort == "id":
+        ordem = ordem[1:]
+    query = query.order_by(*ordem)
+    if limit is None:
+        return query.all(), None
+
+    itens = query.limit(limit + 1).all()
+    proximo = None
+    if len(itens) > limit:
+        itens = itens[:limit]
+        ultimo = itens[-1]
+        proximo = _cursor_encode(getattr(ultimo, sort), ultimo.id)
+    return itens, proximo
+
+
+def contest_facets(db: Session, banca: Optional[str] = None, cargo: Optional[str] = None, q: Optional[str] = None) -> Dict[str, Any]:
+    """Concursos por banca e por cargo numa única query agrupada (banca, cargo)."""
+    linhas = _filtrar_contests(
+        db.query(models.Contest.banca, models.Contest.cargo, func.count(models.Contest.id)), banca, cargo, q
+    ).group_by(models.Contest.banca, models.Contest.cargo).all()
+    por_banca, por_cargo = Counter(), Counter()
+    for b, c, total in linhas:
+        por_banca[b] += total
+        por_cargo[c] += total
+    return {
+        "total": sum(por_banca.values()),
+        "banca": dict(sorted(por_banca.items(), key=lambda kv: (-kv[1], kv[0]))),
+        "cargo": dict(sorted(por_cargo.items(), key=lambda kv: (-kv[1], kv[0]))),
+    }
+
+def validar_categoria(category: str) -> None:
+    """400 antes de tocar no banco (senão o CHECK ck_results_category vira um 500)."""
+    if category not in models.CATEGORIAS:
+        raise HTTPException(
+            status_code=400, detail=f"Categoria inválida: {category!r}. Use uma de: {', '.join(models.CATEGORIAS)}."
+        )
+
+def upload_fingerprint(names: List[str], final_scores: List[float]) -> str:
+    """sha256 da sequência (nome normalizado, nota): mesma lista com outra grafia/espaços dá o mesmo hash."""
+    h = hashlib.sha256()
+    for nome, nota in zip(normalizar_nomes(names), final_scores):
+        h.update(f"{nome}\t{float(nota)!r}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _resultados_da_faixa(db: Session, contest_id: int, category: str, primeira: int, ultima: Optional[int] = None):
+    query = (
+        db.query(models.ContestResult)
+        .options(joinedload(models.ContestResult.extra), joinedload(models.ContestResult.contest))
+        .filter(
+            models.ContestResult.contest_id == contest_id,
+            models.ContestResult.category == category,
+            models.ContestResult.position >= primeira,
+        )
+    )
+    if ultima is not None:
+        query = query.filter(models.ContestResult.position <= ultima)
+    return query.order_by(models.ContestResult.position).all()
+
+
+def _replay_upload(db: Session, upload: models.ResultUpload):
+    """Linhas do upload original, se ainda estão lá como foram gravadas (senão apaga o registro velho)."""
+    linhas = _resultados_da_faixa(db, upload.contest_id, upload.category, upload.first_position, upload.last_position)
+    if len(linhas) == upload.row_count and upload_fingerprint(
+        [r.name for r in linhas], [r.final_score for r in linhas]
+    ) == upload.content_hash:
+        return linhas
+    # A lista foi apagada/substituída depois: o registro não vale mais
+    db.delete(upload)
+    db.commit()
+    return None
+
+
+def create_contest_results(
+    db: Session,
+    data: schemas.ContestResultCreate,
+    idempotency_key: Optional[str] = None,
+    allow_overlap: bool = False,
+):
+    """
+    Acrescenta a lista ao fim da categoria. Reenvios são idempotentes: a mesma
+    Idempotency-Key, ou o mesmo conteúdo (hash) já gravado no concurso/categoria,
+    devolvem as linhas do upload original sem escrever nada
+    (db.info["upload_replayed"] fica True). Nomes que já estão na categoria
+    dão 409, a menos que allow_overlap.
+    """
     if len(data.names) != len(data.final_scores):
         raise HTTPException(status_code=400, detail="Quantidade de nomes e notas não coincidem.")
-
-    max_position = db.query(models.ContestResult.position).filter(
+    validar_categoria(data.category)
+    db.info["upload_replayed"] = False
+    if not data.names:
+        # Lista vazia não escreve nada (um INSERT sem linhas viraria uma linha só de defaults)
+        return []
+    content_hash = upload_fingerprint(data.names, data.final_scores)
+
+    if idempotency_key:
+        anterior = db.query(models.ResultUpload).filter(models.ResultUpload.idempotency_key == idempotency_key).first()
+        if anterior and (anterior.contest_id, anterior.category, anterior.content_hash) != (
+            data.contest_id, data.category, content_hash
+        ):
+            raise HTTPException(status_code=422, detail="Idempotency-Key já usada com outro conteúdo.")
+    else:
+        anterior = None
+    anterior = anterior or db.query(models.ResultUpload).filter(
+        models.ResultUpload.contest_id == data.contest_id,
+        models.ResultUpload.category == data.category,
+        models.ResultUpload.content_hash == content_hash,
+    ).first()
+    if anterior:
+        linhas = _replay_upload(db, anterior)
+        if linhas is not None:
+            db.info["upload_replayed"] = True
+            return linhas
+
+    archive.ensure_writable(db, data.contest_id)
+
+    if not allow_overlap:
+        ja_na_lista = set(normalizar_nomes(
+            nome for (nome,) in db.query(models.ContestResult.name).filter(
+                models.ContestResult.contest_id == data.contest_id,
+                models.ContestResult.category == data.category,
+            )
+        ))
+        repetidos = [n for n, norm in zip(data.names, normalizar_nomes(data.names)) if norm in ja_na_lista]
+        if repetidos:
+            raise HTTPException(status_code=409, detail={
+                "message": "Parte dos nomes já está nesta categoria. Para corrigir a lista publicada use "
+                           "PUT /api/contest-results/{contest_id}/{category}; para acrescentar assim mesmo, allow_overlap=true.",
+                "overlap": len(repetidos),
+                "total": len(data.names),
+                "sample": repetidos[:10],
+            })
+
+    max_position = db.query(func.max(models.ContestResult.position)).filter(
         models.ContestResult.contest_id == data.contest_id,
         models.ContestResult.category == data.category
-    ).order_by(models.ContestResult.position.desc()).first()
-
-    start_position = (max_position[0] if max_position else 0) + 1
+    ).scalar()
+    start_position = (max_position or 0) + 1
 
-    results = []
-    for idx, (name, score) in enumerate(zip(data.names, data.final_scores)):
-        result = models.ContestResult(
+    try:
+        # Um único executemany (o flush do ORM faz um INSERT ... RETURNING por linha no SQLite).
+        # Dentro do try: a colisão de posição com outro upload acontece já no INSERT
+        db.execute(insert(models.ContestResult), [
+            {
+                "contest_id": data.contest_id,
+                "category": data.category,
+                "position": start_position + idx,
+                "name": name.strip(),
+                "final_score": score,
+            }
+            for idx, (name, score) in enumerate(zip(data.names, data.final_scores))
+        ])
+        db.add(models.ResultUpload(
             contest_id=data.contest_id,
             category=data.category,
-            position=start_position + idx,
-            name=name.strip(),
-            final_score=score
-        )
-        db.add(result)
-        results.append(result)
+            content_hash=content_hash,
+            idempotency_key=idempotency_key or None,
+            row_count=len(data.names),
+            first_position=start_position,
+            last_position=start_position + len(data.names) - 1,
+        ))
+        db.commit()
+    except IntegrityError:
+        # Corrida com um reenvio simultâneo (mesmo hash/chave) ou outro upload na mesma categoria
+        db.rollback()
+        condicoes = [and_(
+            models.ResultUpload.contest_id == data.contest_id,
+            models.ResultUpload.category == data.category,
+            models.ResultUpload.content_hash == content_hash,
+        )]
+        if idempotency_key:
+            condicoes.append(models.ResultUpload.idempotency_key == idempotency_key)
+        anterior = db.query(models.ResultUpload).filter(or_(*condicoes)).first()
+        linhas = _replay_upload(db, anterior) if anterior else None
+        if linhas is None:
+            raise HTTPException(status_code=409, detail="Outro upload nesta categoria está em andamento; tente novamente.")
+        db.info["upload_replayed"] = True
+        return linhas
+
+    faixa = (
+        models.ContestResult.contest_id == data.contest_id,
+        models.ContestResult.category == data.category,
+        models.ContestResult.position >= start_position,
+    )
+    criados = [
+        {"id": rid, "name": nome, "position": pos, "final_score": nota}
+        for rid, nome, pos, nota in db.query(
+            models.ContestResult.id, models.ContestResult.name,
+            models.ContestResult.position, models.ContestResult.final_score,
+        ).filter(*faixa).order_by(models.ContestResult.position)
+    ]
 
-    db.commit()
-    for r in results:
-        db.refresh(r)
+    events.emit(events.RESULTS_CREATED, db=db, contest_id=data.contest_id, category=data.category, results=criados)
 
-    return results
+    # Recarrega tudo numa query só (em vez de um refresh + lazy load de extra por linha)
+    return _resultados_da_faixa(db, data.contest_id, data.category, start_position)
 
 # ✅ SUBSTITUÍDA: Função otimizada para buscar resultados com extras
 def get_contest_results(db: Session, contest_id: int, skip: int = 0, limit: int = 100, category: Optional[str] = None):
@@ -210,20 +441,27 @@ def get_contest_results(db: Session, contest_id: int, skip: int = 0, limit: int
     if category:
         query = query.filter(models.ContestResult.category == category)
 
-    return (
+    resultados = (
         query
         .order_by(models.ContestResult.position)
         .offset(skip)
         .limit(limit)
         .all()
     )
+    # Concurso arquivado não tem linhas quentes: a leitura vai para o arquivo
+    if not resultados and archive.is_archived(db, contest_id):
+        return archive.get_results(db, contest_id, skip=skip, limit=limit, category=category)
+    return resultados
 
 def get_results_count(db: Session, contest_id: int, category: Optional[str] = None) -> int:
     query = db.query(models.ContestResult).filter(models.ContestResult.contest_id == contest_id)
     if category:
         cat = category.strip().lower()
         query = query.filter(func.lower(models.ContestResult.category) == cat)
-    return query.count()
+    total = query.count()
+    if not total and archive.is_archived(db, contest_id):
+        return archive.count(db, contest_id, category)
+    return total
 
 def get_extra_by_result_id(db: Session, contest_result_id: int):
     return db.query(models.ContestResultExtra).filter(
@@ -236,6 +474,7 @@ def create_or_update_extra(db: Session, extra_data: Dict):
         raise HTTPException(status_code=400, detail="contest_result_id é obrigatório")
 
     db_extra = None
+    situacao_anterior = None
 
     # --- ETAPA 1: ENCONTRAR OU CRIAR EM UMA TRANSAÇÃO SEGURA ---
     with db.begin_nested():
@@ -252,6 +491,7 @@ def create_or_update_extra(db: Session, extra_data: Dict):
             db.add(db_extra)
         else:
             print(f"✅ ATUALIZANDO extra para contest_result_id: {contest_result_id}")
+            situacao_anterior = db_extra.situacao
 
     # --- ETAPA 2: APLICAR ATUALIZAÇÕES E FAZER O COMMIT FINAL ---
     try:
@@ -279,56 +519,123 @@ def create_or_update_extra(db: Session, extra_data: Dict):
         db_extra.updated_at = datetime.now(timezone.utc)
         db.commit()
         db.refresh(db_extra)
+        contest_id, category = db.query(
+            models.ContestResult.contest_id, models.ContestResult.category
+        ).filter_by(id=contest_result_id).one()
 
     except Exception as e:
         db.rollback()
         print(f"❌ Erro no commit do banco de dados: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor ao salvar: {e}")
 
+    events.emit(events.EXTRA_UPDATED, db=db, contest_id=contest_id, category=category,
+                extra=db_extra, previous_situacao=situacao_anterior)
     return db_extra
     
 def get_extras_by_contest(db: Session, contest_id: int):
-    return (
+    extras = (
         db.query(models.ContestResultExtra)
         .join(models.ContestResult, models.ContestResult.id == models.ContestResultExtra.contest_result_id)
         .filter(models.ContestResult.contest_id == contest_id)
         .all()
     )
+    if not extras and archive.is_archived(db, contest_id):
+        return archive.get_extras(db, contest_id)
+    return extras
 
 def delete_results_by_category(db: Session, contest_id: int, category: str):
+    archive.ensure_writable(db, contest_id)
+    # contest_results_extra não tem cascade: remove os extras antes para não deixar órfãos
+    ids = db.query(models.ContestResult.id).filter(
+        models.ContestResult.contest_id == contest_id,
+        models.ContestResult.category == category
+    )
+    db.query(models.ContestResultExtra).filter(
+        models.ContestResultExtra.contest_result_id.in_(ids.scalar_subquery())
+    ).delete(synchronize_session=False)
     num_deleted = db.query(models.ContestResult).filter(
         models.ContestResult.contest_id == contest_id,
         models.ContestResult.category == category
     ).delete(synchronize_session=False)
     
     db.commit()
+    events.emit(events.RESULTS_DELETED, db=db, contest_id=contest_id, category=category)
     return num_deleted
 
 def get_all_results_by_name(db: Session, name: str):
     """
-    Busca participações de um candidato em concursos,
-    já filtrando no banco (muito mais rápido) e usando a extensão unaccent.
+    Busca participações de um candidato em concursos: o banco pré-filtra
+    (unaccent) e o nome é casado com normalizar_nome, como nos demais endpoints.
     """
+    resultados = _resultados_quentes_por_nome(db, name)
+    # Concursos arquivados: o índice-resumo diz quais arquivos abrir
+    arquivados = archive.results_by_name(db, normalizar_nome(name))
+    if arquivados:
+        resultados = sorted(resultados + arquivados, key=lambda r: (r.contest_id, r.position))
+    return resultados
+
+def _resultados_quentes_por_nome(db: Session, name: str):
+    if columnar.enabled():
+        # O motor colunar resolve o nome em ids; o banco só busca pela PK
+        ids = columnar.get_engine(db).result_ids_by_name(name)
+        if not ids:
+            return []
+        return (
+            db.query(models.ContestResult)
+            .join(models.ContestResult.contest)
+            .outerjoin(models.ContestResult.extra)
+            .options(contains_eager(models.ContestResult.contest), contains_eager(models.ContestResult.extra))
+            .filter(models.ContestResult.id.in_(ids))
+            .order_by(models.ContestResult.contest_id, models.ContestResult.position)
+            .all()
+        )
+
     # 1. Normaliza o nome de entrada para a busca
     name_normalizado = normalizar_nome(name)
+    if not name_normalizado:
+        return []
+
+    # 2. O banco só pré-filtra (id, nome) candidatos; quem decide é normalizar_nome,
+    #    o mesmo critério do compare e do batch de nomes (espaços, ligaduras...)
+    candidatos = db.execute(
+        select(models.ContestResult.id, models.ContestResult.name)
+        .where(_pre_filtro_nome(models.ContestResult.name, name_normalizado))
+    ).all()
+    ids = [rid for (rid, _), n in zip(candidatos, normalizar_nomes(c[1] for c in candidatos)) if n == name_normalizado]
+    if not ids:
+        return []
 
-    # 2. Executa a query no banco de dados
+    # 3. Linhas completas pela PK
     #    - outerjoin: Garante que resultados sem 'extra' também apareçam.
-    #    - func.unaccent: Remove acentos dos nomes no banco antes de comparar.
-    #    - func.lower: Converte para minúsculas para uma busca case-insensitive.
     resultados = (
         db.query(models.ContestResult)
         .join(models.ContestResult.contest)
         .outerjoin(models.ContestResult.extra)
-        .filter(
-            func.lower(func.unaccent(models.ContestResult.name)) == name_normalizado
-        )
+        .options(contains_eager(models.ContestResult.contest), contains_eager(models.ContestResult.extra))
+        .filter(models.ContestResult.id.in_(ids))
         .order_by(models.ContestResult.contest_id, models.ContestResult.position)
         .all()
     )
 
     return resultados
 
+def _pre_filtro_nome(coluna, nome_normalizado: str):
+    """
+    Condição SQL que nunca descarta um nome cujo normalizar_nome seja
+    nome_normalizado: cada palavra (ASCII) precisa aparecer em
+    lower(unaccent(nome)), o que tolera espaços extras; nomes com letras que o
+    banco não reduz igual (LETRAS_ESPECIAIS) passam sempre.
+    """
+    base = func.lower(func.unaccent(coluna))
+    palavras = [
+        base.like("%" + p.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%", escape="\\")
+        for p in nome_normalizado.split() if p.isascii()
+    ]
+    if not palavras:
+        return true()
+    especiais = [coluna.like(f"%{c}%") for c in sorted(LETRAS_ESPECIAIS)]
+    return or_(and_(*palavras), *especiais)
+
 def update_contest(db: Session, contest_id: int, contest_update: schemas.ContestCreate):
     db_contest = db.query(models.Contest).filter(models.Contest.id == contest_id).first()
 
@@ -341,91 +648,45 @@ def update_contest(db: Session, contest_id: int, contest_update: schemas.Contest
         db.add(db_contest)
         db.commit()
         db.refresh(db_contest)
+        events.emit(events.CONTEST_UPDATED, db=db, contest_id=contest_id)
     
     return db_contest
 
 def get_results_by_name_and_category(db: Session, name: str, category: str):
-    name_normalizado = normalizar_nome(name)
-
-    resultados = db.query(models.ContestResult).filter(
-        models.ContestResult.category == category
-    ).order_by(models.ContestResult.position).all()
-
-    resultados_filtrados = [
-        r for r in resultados if normalizar_nome(r.name) == name_normalizado
+    # Só (id, nome) sai do banco, em lotes; o casamento roda no pool se a categoria for grande
+    linhas = [
+        tuple(r) for r in db.execute(
+            select(models.ContestResult.id, models.ContestResult.name).where(models.ContestResult.category == category)
+        ).yield_per(offload.LOTE)
     ]
+    ids = offload.run(offload.ids_com_nome, normalizar_nome(name), linhas, rows=len(linhas))
+    if not ids:
+        return []
+    return (
+        db.query(models.ContestResult)
+        .filter(models.ContestResult.id.in_(ids))
+        .order_by(models.ContestResult.position)
+        .all()
+    )
 
-    return resultados_filtrados
+def _linhas_compare(db: Session, contest_id: int) -> List[tuple]:
+    """(id, name, category, position, situacao) do concurso, lidos em lotes (ou do arquivo)."""
+    linhas = [tuple(r) for r in db.execute(offload.consulta_compare(contest_id)).yield_per(offload.LOTE)]
+    return linhas or [
+        (r.id, r.name, r.category, r.position, r.extra.situacao if r.extra else None)
+        for r in archive.get_results(db, contest_id)
+    ]
 
 def compare_contests(db: Session, contest_id_1: int, contest_id_2: int):
-    from backend.models import ContestResult
-    from sqlalchemy.orm import joinedload
-    import unicodedata
-
-    results_1 = db.query(ContestResult).options(joinedload(ContestResult.extra)).filter(
-        ContestResult.contest_id == contest_id_1
-    ).all()
-
-    results_2 = db.query(ContestResult).options(joinedload(ContestResult.extra)).filter(
-        ContestResult.contest_id == contest_id_2
-    ).all()
+    if columnar.enabled():
+        # Concursos arquivados não estão no motor: só nesse caso cai para o caminho abaixo
+        matches = columnar.get_engine(db).compare_pair(contest_id_1, contest_id_2)
+        if matches or not (archive.is_archived(db, contest_id_1) or archive.is_archived(db, contest_id_2)):
+            return matches
 
-    def normalizar(nome: str) -> str:
-        if not nome:
-            return ""
-        return (
-            unicodedata.normalize("NFD", nome)
-            .encode("ascii", "ignore")
-            .decode("utf-8")
-            .lower()
-            .strip()
-        )
-
-    map_1 = defaultdict(list)
-    map_2 = defaultdict(list)
-    name_counters = defaultdict(Counter)
-
-    for r in results_1:
-        nome_norm = normalizar(r.name)
-        entry = {
-            "name": r.name,
-            "category": r.category,
-            "position": r.position,
-            "contest_result_id": getattr(r, "id", None),
-            "situacao": (r.extra.situacao if (r.extra and r.extra.situacao) else "Aguardando Convocação")
-        }
-        map_1[nome_norm].append(entry)
-        name_counters[nome_norm][r.name] += 1
-
-    for r in results_2:
-        nome_norm = normalizar(r.name)
-        entry = {
-            "name": r.name,
-            "category": r.category,
-            "position": r.position,
-            "contest_result_id": getattr(r, "id", None),
-            "situacao": (r.extra.situacao if (r.extra and r.extra.situacao) else "Aguardando Convocação")
-        }
-        map_2[nome_norm].append(entry)
-        name_counters[nome_norm][r.name] += 1
-
-    common_names = set(map_1.keys()) & set(map_2.keys())
-
-    response = []
-    for nome_norm in sorted(common_names):
-        counter = name_counters[nome_norm]
-        if counter:
-            canonical_name = counter.most_common(1)[0][0]
-        else:
-            canonical_name = (map_1[nome_norm][0]["name"] if map_1[nome_norm] else
-                              (map_2[nome_norm][0]["name"] if map_2[nome_norm] else ""))
-
-        response.append({
-            "name": canonical_name,
-            "norm": nome_norm,
-            "contest_1": map_1[nome_norm],
-            "contest_2": map_2[nome_norm],
-        })
+    linhas_1 = _linhas_compare(db, contest_id_1)
+    linhas_2 = _linhas_compare(db, contest_id_2)
+    response = offload.run(offload.comparar, linhas_1, linhas_2, rows=len(linhas_1) + len(linhas_2))
 
     try:
         logger.info("compare_contests: contest1=%s contest2=%s matches=%d sample=%s",
@@ -435,27 +696,54 @@ def compare_contests(db: Session, contest_id_1: int, contest_id_2: int):
 
     return response
 
-def normalizar_nome(nome: str) -> str:
-    if not nome:
-        return ""
-    nome = nome.lower()
-    nome = unicodedata.normalize('NFD', nome)
-    nome = "".join(c for c in nome if unicodedata.category(c) != 'Mn')
-    return nome.strip()
+def compare_contests_json(db: Session, contest_id_1: int, contest_id_2: int) -> bytes:
+    """Corpo JSON do endpoint de compare ({"matches", "count"}).
+
+    Concursos grandes são lidos e comparados inteiros no pool de offload; a
+    thread da requisição só conta as linhas e recebe os bytes.
+    """
+    if offload.enabled() and not columnar.enabled():
+        total = db.query(func.count(models.ContestResult.id)).filter(
+            models.ContestResult.contest_id.in_((contest_id_1, contest_id_2))
+        ).scalar()
+        if total >= offload.MIN_ROWS:
+            corpo = offload.run(offload.comparar_do_banco, contest_id_1, contest_id_2, rows=total)
+            if corpo is not None:
+                return corpo
+    results = compare_contests(db, contest_id_1, contest_id_2)
+    return singleflight.dumps({"matches": results, "count": len(results)})
 
 def get_results_by_names_batch(db: Session, names: List[str]) -> Dict[str, bool]:
-    nomes_normalizados = {name: normalizar_nome(name) for name in names}
-    resultados = {name: False for name in names}
+    originais_por_norm = defaultdict(list)
+    for name, normalizado in zip(names, normalizar_nomes(names)):
+        originais_por_norm[normalizado].append(name)
 
-    todos_resultados = db.query(models.ContestResult).all()
+    # Nomeados em concursos arquivados vêm do índice-resumo
+    resultados = {name: False for name in names}
+    for nome_norm in archive.nomeados(db, originais_por_norm):
+        for original in originais_por_norm[nome_norm]:
+            resultados[original] = True
+
+    if columnar.enabled():
+        status = columnar.get_engine(db).names_status(names)
+        return {name: resultados[name] or nomeado for name, nomeado in status.items()}
+
+    # Só interessam os nomeados/empossados: o filtro vai para o banco e
+    # evita carregar a tabela inteira (e um lazy load de extra por linha)
+    nomeados = [
+        nome for (nome,) in db.execute(
+            select(models.ContestResult.name)
+            .join(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+            .where(or_(
+                func.lower(models.ContestResultExtra.situacao).like("%nomead%"),
+                func.lower(models.ContestResultExtra.situacao).like("%empossad%"),
+            ))
+        ).yield_per(offload.LOTE)
+    ]
 
-    for r in todos_resultados:
-        nome_norm = normalizar_nome(r.name)
-        for original, normalizado in nomes_normalizados.items():
-            if nome_norm == normalizado:
-                if r.extra and r.extra.situacao:
-                    sit = r.extra.situacao.lower()
-                    if "nomead" in sit or "empossad" in sit:
-                        resultados[original] = True
+    marcados = offload.run(offload.marcar_nomeados, list(names), nomeados, rows=len(names) + len(nomeados))
+    for name, nomeado in zip(names, marcados):
+        if nomeado:
+            resultados[name] = True
 
     return resultados
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
+from backend.normalization import remover_acentos
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///./meubanco.db")
 
 engine = create_engine(
@@ -9,6 +15,23 @@ engine = create_engine(
     connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
 )
 
+if DB_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _registrar_funcoes_sqlite(dbapi_connection, connection_record):
+        # unaccent() vem de extensão no Postgres; no SQLite registramos um equivalente
+        dbapi_connection.create_function("unaccent", 1, remover_acentos, deterministic=True)
+
+# Log de queries lentas (opcional): SLOW_QUERY_MS=200 liga o hook
+if os.getenv("SLOW_QUERY_MS"):
+    from backend import slow_queries
+
+    slow_queries.instrument(
+        engine,
+        threshold_ms=float(os.getenv("SLOW_QUERY_MS")),
+        explain_sample=float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1")),
+        top=int(os.getenv("SLOW_QUERY_TOP", "50")),
+    )
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -21,6 +44,49 @@ def get_db():
         db.close()
 
 
+def _ddl_coluna(column, dialect) -> str:
+    """Definição completa da coluna para ADD COLUMN (NOT NULL, DEFAULT e REFERENCES inclusos)."""
+    if column.primary_key or column.unique:
+        raise RuntimeError(f"{column.table.name}.{column.name}: chave/unique exige migração manual")
+    if not column.nullable and column.server_default is None:
+        # ALTER TABLE não tem como preencher as linhas que já existem
+        raise RuntimeError(f"{column.table.name}.{column.name}: NOT NULL sem server_default exige migração manual")
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+        if fk.ondelete:
+            ddl += f" ON DELETE {fk.ondelete}"
+    return ddl
+
+
+def sync_schema(bind=None):
+    """
+    create_all não altera tabelas que já existem: adiciona as colunas e
+    índices declarados nos modelos que ainda faltam no banco.
+
+    Só cobre mudanças aditivas que o ALTER TABLE faz sem perder regras
+    (colunas anuláveis ou com server_default, com suas FKs, e índices);
+    o resto (NOT NULL sem default, unique, CHECK novo) falha com erro em vez
+    de criar uma coluna mais frouxa que o modelo.
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existentes = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existentes:
+                with bind.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_ddl_coluna(column, bind.dialect)}"))
+        for index in table.indexes:
+            try:
+                index.create(bind, checkfirst=True)
+            except IntegrityError:
+                # Índice único sobre dados que já têm duplicatas: o app sobe e o índice fica para depois
+                logger.warning("Índice único %s não criado: há linhas duplicadas em %s", index.name, table.name)
+
+
     
 
     
@@ -1,7 +1,8 @@
+import html
 import os
 import secrets
 import string
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from mailjet_rest import Client
 from dotenv import load_dotenv # Adicionado
 
@@ -155,11 +156,73 @@ class EmailService:
             print(f"Erro ao enviar e-mail: {str(e)}")
             return False
 
-    def is_token_expired(self, sent_at: datetime) -> bool:
+    def send_digest_email(self, to_email: str, user_name: str, items: list) -> bool:
+        """Envia o resumo das novidades dos nomes acompanhados"""
+        if not self.mailjet:
+            print("Erro: Serviço de e-mail não inicializado. Verifique as chaves de API.")
+            return False
+
+        try:
+            linhas = []
+            for item in items:
+                if item["kind"] == "situacao":
+                    descricao = f"agora está como <strong>{html.escape(item['situacao'] or 'sem situação')}</strong>"
+                else:
+                    descricao = f"aparece na posição <strong>{item['position']}</strong> ({html.escape(item['category'] or '')})"
+                linhas.append(f"<li>{html.escape(item['name'])} — {html.escape(item['contest_name'])}: {descricao}</li>")
+
+            html_content = f"""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <meta charset="utf-8">
+                <title>Novidades dos nomes que você acompanha</title>
+            </head>
+            <body style="font-family: Arial, sans-serif; color: #333;">
+                <h2>Olá, {user_name}!</h2>
+                <p>Novidades dos nomes que você acompanha:</p>
+                <ul>{''.join(linhas)}</ul>
+                <p><a href="{self.frontend_url}/meus-resultados">Ver no site</a></p>
+            </body>
+            </html>
+            """
+
+            data = {
+                'Messages': [
+                    {
+                        "From": {
+                            "Email": self.from_email,
+                            "Name": self.from_name
+                        },
+                        "To": [
+                            {
+                                "Email": to_email,
+                                "Name": user_name
+                            }
+                        ],
+                        "Subject": "Novidades dos nomes acompanhados - Classificação de Concursos",
+                        "HTMLPart": html_content,
+                        "CustomID": "NotificationDigest"
+                    }
+                ]
+            }
+
+            result = self.mailjet.send.create(data=data)
+            print(f"Resumo de notificações para {to_email}: status {result.status_code}")
+            return result.status_code == 200
+
+        except Exception as e:
+            print(f"Erro ao enviar resumo: {str(e)}")
+            return False
+
+    def is_token_expired(self, sent_at: datetime, hours: int = 24) -> bool:
         """Verifica se o token de confirmação expirou (24 horas)"""
         if not sent_at:
             return True
-        return datetime.utcnow() > sent_at + timedelta(hours=24)
+        if sent_at.tzinfo is not None:
+            # confirmation_sent_at é timezone-aware no Postgres
+            sent_at = sent_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return datetime.utcnow() > sent_at + timedelta(hours=hours)
 
 # Instância global
 email_service = EmailService()
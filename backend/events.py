@@ -0,0 +1,44 @@
+# backend/events.py
+"""
+Eventos disparados pelos caminhos de escrita do crud (sempre após o commit).
+
+Caches, índices em memória e demais derivados se inscrevem aqui em vez de
+serem chamados diretamente pelo crud. Falha em um ouvinte é logada e não
+interrompe a escrita.
+"""
+from collections import defaultdict
+from typing import Callable, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CREATED = "results_created"    # contest_id, category, results (dicts id/name/position/final_score), restored (volta do arquivo)
+RESULTS_DELETED = "results_deleted"    # contest_id, category
+EXTRA_UPDATED = "extra_updated"        # contest_id, category, extra, previous_situacao
+CONTEST_UPDATED = "contest_updated"    # contest_id (criação ou edição)
+RESULTS_REPLACED = "results_replaced"  # contest_id, category, results (lista final, dicts), added_ids
+USER_UPDATED = "user_updated"          # user_id (cadastro, confirmação de e-mail)
+
+_ouvintes: Dict[str, List[Callable]] = defaultdict(list)
+
+
+def subscribe(evento: str, fn: Callable = None):
+    """Registra um ouvinte. Pode ser usado como decorator."""
+    def registrar(f):
+        if f not in _ouvintes[evento]:
+            _ouvintes[evento].append(f)
+        return f
+    return registrar(fn) if fn is not None else registrar
+
+
+def unsubscribe(evento: str, fn: Callable) -> None:
+    if fn in _ouvintes[evento]:
+        _ouvintes[evento].remove(fn)
+
+
+def emit(evento: str, **dados) -> None:
+    for fn in list(_ouvintes[evento]):
+        try:
+            fn(**dados)
+        except Exception:
+            logger.exception("Ouvinte %s falhou no evento %s", getattr(fn, "__name__", fn), evento)
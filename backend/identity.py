@@ -0,0 +1,214 @@
+# backend/identity.py
+"""
+Grafo de identidade: liga o mesmo candidato entre listas de concursos.
+
+Cada nome normalizado vira uma `Person` e os resultados apontam para ela
+por `contest_results.person_id`. A ligação roda incrementalmente a cada
+upload (evento results_created) e pode ser refeita por completo:
+
+    python -m backend.identity [--rebuild] [--min-tokens 2] [--homonimo "nome"]
+
+Regras de desambiguação (IdentityRules):
+- nomes com menos de `min_tokens` palavras não são ligados (ambíguos demais);
+- o mesmo nome repetido na mesma lista (concurso + categoria) é tratado como
+  homônimo e nenhuma das ocorrências é ligada;
+- nomes em `homonimos` (normalizados) nunca são ligados automaticamente.
+O mesmo nome em categorias diferentes do mesmo concurso (Ampla e PPP, por
+exemplo) é a mesma pessoa.
+
+Limitação: há uma única Person por nome normalizado, então homônimos em
+concursos diferentes NÃO são desambiguados — duas pessoas distintas com o
+mesmo nome ficam ligadas à mesma Person. A listagem não traz nada além do
+nome que permita separá-las; nomes sabidamente comuns devem ir para
+`homonimos` (--homonimo), que os deixa sem ligação.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+import argparse
+import os
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from backend import models, events
+from backend.normalization import normalizar_nome, normalizar_nomes
+
+LOTE = 500
+
+
+class IdentityRules:
+    def __init__(self, min_tokens: Optional[int] = None, homonimos: Iterable[str] = ()):
+        self.min_tokens = min_tokens if min_tokens is not None else int(os.getenv("IDENTITY_MIN_TOKENS", "2"))
+        self.homonimos = set(normalizar_nomes(homonimos))
+
+    def pode_ligar(self, nome_norm: str) -> bool:
+        return len(nome_norm.split()) >= self.min_tokens and nome_norm not in self.homonimos
+
+
+def _em_lotes(itens: List, tamanho: int = LOTE):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+def link_results(
+    db: Session,
+    contest_id: Optional[int] = None,
+    result_ids: Optional[List[int]] = None,
+    rules: Optional[IdentityRules] = None,
+) -> Dict[str, int]:
+    """Liga a uma Person os resultados ainda sem person_id."""
+    rules = rules or IdentityRules()
+    query = db.query(
+        models.ContestResult.id,
+        models.ContestResult.contest_id,
+        models.ContestResult.category,
+        models.ContestResult.name,
+    ).filter(models.ContestResult.person_id.is_(None))
+    if contest_id is not None:
+        query = query.filter(models.ContestResult.contest_id == contest_id)
+    if result_ids is not None:
+        query = query.filter(models.ContestResult.id.in_(result_ids))
+    linhas = query.all()
+    if not linhas:
+        return {"linked": 0, "ambiguous": 0, "new_persons": 0}
+
+    normas = normalizar_nomes(l.name for l in linhas)
+    repeticoes = Counter((l.contest_id, l.category, n) for l, n in zip(linhas, normas))
+
+    por_nome = defaultdict(list)
+    grafias = defaultdict(Counter)
+    ambiguos = 0
+    for linha, norm in zip(linhas, normas):
+        if not rules.pode_ligar(norm) or repeticoes[(linha.contest_id, linha.category, norm)] > 1:
+            ambiguos += 1
+            continue
+        por_nome[norm].append(linha.id)
+        grafias[norm][" ".join(linha.name.split())] += 1
+
+    nomes = list(por_nome)
+    pessoas: Dict[str, int] = {}
+    for lote in _em_lotes(nomes):
+        pessoas.update(_pessoas_existentes(db, lote))
+
+    novos = 0
+    for lote in _em_lotes([norm for norm in nomes if norm not in pessoas], 5000):
+        criadas = _criar_pessoas(db, lote, grafias)
+        novos += len(criadas)
+        pessoas.update(criadas)
+        if len(criadas) < len(lote):
+            pessoas.update(_pessoas_existentes(db, [norm for norm in lote if norm not in criadas]))
+
+    ligacoes = [{"id": rid, "person_id": pessoas[norm]} for norm, ids in por_nome.items() for rid in ids]
+    for lote in _em_lotes(ligacoes, 5000):
+        db.execute(update(models.ContestResult), lote)
+    db.commit()
+    return {"linked": len(ligacoes), "ambiguous": ambiguos, "new_persons": novos}
+
+
+def _pessoas_existentes(db: Session, nomes: List[str]) -> Dict[str, int]:
+    return dict(
+        db.query(models.Person.nome_normalizado, models.Person.id).filter(models.Person.nome_normalizado.in_(nomes))
+    )
+
+
+def _criar_pessoas(db: Session, nomes: List[str], grafias: Dict[str, Counter]) -> Dict[str, int]:
+    """
+    Insere as Persons do lote. Se outro link_results criou alguma no meio
+    tempo (índice único), o lote volta ao savepoint e só as que ainda faltam
+    são inseridas; as do outro processo são relidas por quem chamou.
+    """
+    while nomes:
+        try:
+            with db.begin_nested():
+                inseridos = db.execute(
+                    insert(models.Person).returning(models.Person.id, models.Person.nome_normalizado),
+                    [{"nome_normalizado": norm, "name": grafias[norm].most_common(1)[0][0]} for norm in nomes],
+                ).all()
+            return {norm: pid for pid, norm in inseridos}
+        except IntegrityError:
+            existentes = _pessoas_existentes(db, nomes)
+            nomes = [norm for norm in nomes if norm not in existentes]
+    return {}
+
+
+def rebuild(db: Session, rules: Optional[IdentityRules] = None) -> Dict[str, int]:
+    """Refaz o grafo do zero (por exemplo, após mudar as regras)."""
+    db.query(models.ContestResult).update({models.ContestResult.person_id: None}, synchronize_session=False)
+    db.query(models.Person).delete(synchronize_session=False)
+    db.commit()
+    return link_results(db, rules=rules)
+
+
+@events.subscribe(events.RESULTS_CREATED)
+def _ao_criar_resultados(db: Session, results, **_):
+    link_results(db, result_ids=[r["id"] for r in results])
+
+
+@events.subscribe(events.RESULTS_REPLACED)
+def _ao_substituir_lista(db: Session, added_ids, **_):
+    if added_ids:
+        link_results(db, result_ids=added_ids)
+
+
+def get_person_results(db: Session, person_id: int) -> List[models.ContestResult]:
+    return (
+        db.query(models.ContestResult)
+        .options(joinedload(models.ContestResult.contest), joinedload(models.ContestResult.extra))
+        .filter(models.ContestResult.person_id == person_id)
+        .order_by(models.ContestResult.contest_id, models.ContestResult.position)
+        .all()
+    )
+
+
+def derive_outras_listas(db: Session, contest_result_id: int) -> Optional[dict]:
+    """Monta o equivalente a `outras_listas` a partir do grafo, sem digitação manual."""
+    resultado = db.query(models.ContestResult).filter(models.ContestResult.id == contest_result_id).first()
+    if not resultado:
+        return None
+    listas = []
+    if resultado.person_id is not None:
+        for r in get_person_results(db, resultado.person_id):
+            if r.id == resultado.id:
+                continue
+            listas.append({
+                "contest_result_id": r.id,
+                "contest_id": r.contest_id,
+                "contest_name": r.contest.name,
+                "category": r.category,
+                "position": r.position,
+                "situacao": r.extra.situacao if r.extra else None,
+            })
+    return {"contest_result_id": resultado.id, "person_id": resultado.person_id, "listas": listas}
+
+
+def find_person_by_name(db: Session, name: str) -> Optional[models.Person]:
+    return db.query(models.Person).filter(models.Person.nome_normalizado == normalizar_nome(name)).first()
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Liga resultados do mesmo candidato entre concursos")
+    parser.add_argument("--rebuild", action="store_true", help="apaga e refaz todas as ligações")
+    parser.add_argument("--contest-id", type=int)
+    parser.add_argument("--min-tokens", type=int)
+    parser.add_argument("--homonimo", action="append", default=[], help="nome que nunca deve ser ligado")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    rules = IdentityRules(min_tokens=args.min_tokens, homonimos=args.homonimo)
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(rebuild(db, rules))
+            sync_schema(engine)  # índices únicos que pessoas duplicadas antigas impediam
+        else:
+            print(link_results(db, contest_id=args.contest_id, rules=rules))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
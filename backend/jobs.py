@@ -0,0 +1,496 @@
+# backend/jobs.py
+"""
+Fila persistente de tarefas pesadas, guardada no próprio banco (tabela jobs).
+
+Uploads grandes, remoção de categorias, substituição de listas e
+recálculos entre concursos podem ser enfileirados em vez de rodar dentro
+da requisição: o endpoint devolve 202 com o id do job e o cliente acompanha
+por GET /api/jobs/{id}.
+
+- Um worker "pega" um job com um UPDATE condicional (só um vence), então
+  vários processos podem consumir a mesma fila.
+- Falhas inesperadas voltam para a fila com backoff exponencial até
+  max_attempts; erros de validação (HTTPException 4xx) falham de vez.
+- Jobs "running" cujo worker parou de dar sinal (JOB_LEASE segundos) são
+  retomados por outro worker. Enquanto o handler roda, uma thread renova o
+  lease a cada JOB_LEASE/3 segundos, então um job longo e sem progresso
+  não é executado duas vezes.
+- Cancelamento: job na fila é cancelado na hora; em execução, o handler
+  vê ctx.cancelled() entre etapas e para. Se o worker morreu depois do
+  pedido, o próximo claim encontra o lease vencido e marca o job cancelado.
+
+Workers:
+- JOB_WORKERS threads no próprio processo da API (padrão 1), iniciadas na
+  subida da API (e de novo em enqueue, se alguma morreu) — basta para
+  desenvolvimento e testes com SQLite;
+- processos dedicados: python -m backend.jobs worker --processes 4
+  (com eles, use JOB_WORKERS=0 na API: assim os dois lados usam o backend de
+  cache "sqlite" e as escritas dos workers invalidam o cache da API).
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from backend import models, metrics
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+LEASE = float(os.getenv("JOB_LEASE", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Passado aos handlers: progresso (que também renova o lease) e checagem de cancelamento."""
+
+    def __init__(self, db: Session, job_id: str, worker: str):
+        self.db = db
+        self.job_id = job_id
+        self.worker = worker
+
+    def progress(self, fracao: float, mensagem: Optional[str] = None) -> None:
+        try:
+            with _sessao() as db:
+                db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == self.job_id, models.Job.locked_by == self.worker)
+                    .values(progress=max(0.0, min(1.0, fracao)), message=mensagem, heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+        except Exception:
+            # Progresso é informativo: não derruba o job (ex.: SQLite ocupado)
+            logger.warning("Não foi possível gravar o progresso do job %s", self.job_id, exc_info=True)
+
+    def heartbeat(self) -> None:
+        """Renova o lease sem mexer no progresso."""
+        try:
+            with _sessao() as db:
+                db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == self.job_id, models.Job.locked_by == self.worker,
+                           models.Job.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+        except Exception:
+            logger.warning("Não foi possível renovar o lease do job %s", self.job_id, exc_info=True)
+
+    def cancelled(self) -> bool:
+        with _sessao() as db:
+            return bool(db.query(models.Job.cancel_requested).filter(models.Job.id == self.job_id).scalar())
+
+    def check_cancelled(self) -> None:
+        if self.cancelled():
+            raise JobCancelled()
+
+
+class _sessao:
+    """Sessão curta e independente da do handler (progresso não pode esperar o commit dele)."""
+
+    def __enter__(self) -> Session:
+        from backend.database import SessionLocal
+
+        self.db = SessionLocal()
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+        return False
+
+
+_handlers: Dict[str, Callable[[Session, dict, JobContext], Any]] = {}
+
+
+def handler(kind: str):
+    """Registra a função que executa jobs do tipo `kind` (decorator)."""
+    def registrar(fn):
+        _handlers[kind] = fn
+        return fn
+    return registrar
+
+
+# --- Fila ---
+
+def enqueue(db: Session, kind: str, payload: dict, created_by: Optional[int] = None,
+            max_attempts: Optional[int] = None, run_after: Optional[datetime] = None) -> models.Job:
+    if kind not in _handlers:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    job = models.Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        payload=payload,
+        status="queued",
+        progress=0.0,
+        attempts=0,
+        max_attempts=max_attempts or MAX_ATTEMPTS,
+        cancel_requested=False,
+        run_after=run_after or datetime.utcnow(),
+        created_by=created_by,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if WORKERS > 0:
+        start_inprocess_workers(WORKERS)
+    else:
+        _acordar.set()
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[models.Job]:
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+
+def list_jobs(db: Session, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[models.Job]:
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    return query.order_by(models.Job.created_at.desc()).limit(limit).all()
+
+
+def cancel_job(db: Session, job_id: str) -> Optional[models.Job]:
+    agora = datetime.utcnow()
+    # Na fila: cancela direto. Rodando: só sinaliza, o handler para na próxima etapa.
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "queued")
+        .values(status="cancelled", cancel_requested=True, finished_at=agora)
+    )
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "running")
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    db.expire_all()
+    return get_job(db, job_id)
+
+
+def claim(db: Session, worker: str) -> Optional[models.Job]:
+    """Reserva o próximo job disponível para `worker` (ou None)."""
+    agora = datetime.utcnow()
+    vencido = models.Job.heartbeat_at < agora - timedelta(seconds=LEASE)
+    # Cancelamento pedido e worker morto: ninguém mais vai ver o pedido, então encerra aqui
+    if db.execute(
+        update(models.Job)
+        .where(models.Job.status == "running", vencido, models.Job.cancel_requested.is_(True))
+        .values(status="cancelled", locked_by=worker, finished_at=agora, message="cancelado (worker parou)")
+    ).rowcount:
+        db.commit()
+    disponivel = or_(
+        and_(models.Job.status == "queued", models.Job.run_after <= agora),
+        and_(models.Job.status == "running", vencido),
+    )
+    candidatos = [
+        jid for (jid,) in db.query(models.Job.id).filter(disponivel, models.Job.cancel_requested.is_(False))
+        .order_by(models.Job.run_after, models.Job.created_at).limit(5)
+    ]
+    for job_id in candidatos:
+        # UPDATE condicional: se outro worker pegou antes, rowcount é 0
+        pegou = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, disponivel)
+            .values(status="running", locked_by=worker, heartbeat_at=agora,
+                    started_at=agora, attempts=models.Job.attempts + 1)
+        ).rowcount
+        db.commit()
+        if pegou:
+            return get_job(db, job_id)
+    return None
+
+
+@contextmanager
+def _mantendo_lease(ctx: JobContext):
+    """Renova o lease numa thread enquanto o bloco roda (o handler pode passar minutos sem chamar progress)."""
+    parar = threading.Event()
+
+    def bater():
+        while not parar.wait(LEASE / 3):
+            ctx.heartbeat()
+
+    t = threading.Thread(target=bater, name="job-heartbeat", daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        # Sem join: uma renovação presa num lock do SQLite não segura o desfecho do job,
+        # e depois dele o UPDATE (status == "running") não pega mais nada
+        parar.set()
+
+
+def _finalizar(db: Session, job_id: str, worker: str, **valores) -> None:
+    db.rollback()
+    valores.setdefault("finished_at", datetime.utcnow())
+    db.execute(update(models.Job).where(models.Job.id == job_id, models.Job.locked_by == worker).values(**valores))
+    db.commit()
+
+
+def run_job(db: Session, job: models.Job, worker: str) -> str:
+    """Executa um job já reservado e grava o desfecho; devolve o status final."""
+    job_id, kind, payload, tentativas, maximo = job.id, job.kind, job.payload, job.attempts, job.max_attempts
+    ctx = JobContext(db, job_id, worker)
+    inicio = time.perf_counter()
+    try:
+        fn = _handlers[kind]
+        ctx.check_cancelled()
+        with _mantendo_lease(ctx):
+            resultado = fn(db, payload, ctx)
+    except JobCancelled:
+        _finalizar(db, job_id, worker, status="cancelled", message="cancelado")
+        status = "cancelled"
+    except HTTPException as e:
+        # Erro de validação: repetir não adianta
+        retry = e.status_code >= 500 and tentativas < maximo
+        status = "queued" if retry else "failed"
+        _finalizar(db, job_id, worker, status=status, error=str(e.detail),
+                   **({"run_after": _backoff(tentativas), "finished_at": None} if retry else {}))
+    except Exception as e:
+        logger.exception("Job %s (%s) falhou na tentativa %s", job_id, kind, tentativas)
+        retry = tentativas < maximo
+        status = "queued" if retry else "failed"
+        _finalizar(db, job_id, worker, status=status, error=f"{type(e).__name__}: {e}",
+                   **({"run_after": _backoff(tentativas), "finished_at": None} if retry else {}))
+    else:
+        _finalizar(db, job_id, worker, status="succeeded", progress=1.0, result=resultado, error=None)
+        status = "succeeded"
+    chave = "retried" if status == "queued" else status
+    _contadores[chave] = _contadores.get(chave, 0) + 1
+    _tempos.append(time.perf_counter() - inicio)
+    del _tempos[:-1000]
+    return status
+
+
+def _backoff(tentativas: int) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=min(300, 2 ** tentativas))
+
+
+def run_pending(db: Session, worker: Optional[str] = None, max_jobs: Optional[int] = None) -> int:
+    """Executa jobs até a fila esvaziar (útil em scripts e testes). Devolve quantos rodou."""
+    worker = worker or _nome_worker("inline")
+    feitos = 0
+    while max_jobs is None or feitos < max_jobs:
+        job = claim(db, worker)
+        if job is None:
+            break
+        run_job(db, job, worker)
+        feitos += 1
+    return feitos
+
+
+# --- Workers ---
+
+_contadores: Dict[str, int] = {}
+_tempos: List[float] = []
+_acordar = threading.Event()
+_threads: List[threading.Thread] = []
+_threads_lock = threading.Lock()
+
+
+def _nome_worker(tipo: str) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{tipo}:{threading.get_ident()}"
+
+
+def worker_loop(parar: Optional[threading.Event] = None, tipo: str = "thread") -> None:
+    from backend.database import SessionLocal
+
+    nome = _nome_worker(tipo)
+    while parar is None or not parar.is_set():
+        db = SessionLocal()
+        try:
+            rodou = run_pending(db, nome, max_jobs=10)
+        except Exception:
+            logger.exception("Erro no worker %s", nome)
+            rodou = 0
+        finally:
+            db.close()
+        if not rodou:
+            _acordar.wait(POLL_INTERVAL)
+            _acordar.clear()
+
+
+def start_inprocess_workers(n: int = WORKERS) -> None:
+    with _threads_lock:
+        vivos = [t for t in _threads if t.is_alive()]
+        for _ in range(n - len(vivos)):
+            t = threading.Thread(target=worker_loop, name="job-worker", daemon=True)
+            t.start()
+            vivos.append(t)
+        _threads[:] = vivos
+    _acordar.set()
+
+
+def _inscrever_ouvintes() -> None:
+    # Ouvintes de eventos que gravam fora da memória (banco, arquivos) têm de
+    # existir também fora do processo da API, senão uploads em job não os disparam
+    from backend import cache, identity, snapshots, watchlist  # noqa: F401
+
+    # E as versões do cache precisam chegar à API
+    cache.usar_backend_compartilhado("jobs")
+
+
+def _processo_worker() -> None:
+    _inscrever_ouvintes()
+    logging.basicConfig(level=logging.INFO)
+    worker_loop(tipo="process")
+
+
+def _coletor():
+    for status, total in sorted(_contadores.items()):
+        yield ("jobs_finished", {"status": status}, total)
+    if _tempos:
+        yield ("jobs_last_duration_seconds", {}, round(_tempos[-1], 4))
+    yield ("jobs_inprocess_workers", {}, sum(t.is_alive() for t in _threads))
+
+
+metrics.register_collector(_coletor)
+
+
+# --- Handlers das operações pesadas ---
+
+@handler("upload_results")
+def _upload_results(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import crud, schemas
+
+    ctx.progress(0.1, "gravando resultados")
+    linhas = crud.create_contest_results(
+        db, schemas.ContestResultCreate(**payload["data"]),
+        idempotency_key=payload.get("idempotency_key"), allow_overlap=payload.get("allow_overlap", False),
+    )
+    return {
+        "created": 0 if db.info.get("upload_replayed") else len(linhas),
+        "replayed": bool(db.info.get("upload_replayed")),
+        "first_position": linhas[0].position if linhas else None,
+        "last_position": linhas[-1].position if linhas else None,
+    }
+
+
+@handler("delete_category")
+def _delete_category(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import crud
+
+    return {"deleted": crud.delete_results_by_category(db, payload["contest_id"], payload["category"])}
+
+
+@handler("replace_list")
+def _replace_list(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import list_replace
+
+    ctx.progress(0.1, "calculando diff")
+    return list_replace.replace_list(db, payload["contest_id"], payload["category"],
+                                     payload["names"], payload["final_scores"])
+
+
+@handler("identity_rebuild")
+def _identity_rebuild(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import identity
+
+    if payload.get("rebuild"):
+        ctx.progress(0.05, "apagando ligações")
+        return identity.rebuild(db)
+    return identity.link_results(db, contest_id=payload.get("contest_id"))
+
+
+@handler("projection_all")
+def _projection_all(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import projection
+
+    vagas = {int(k): v for k, v in payload["vagas"].items()}
+    saida = {}
+    for i, (contest_id, n) in enumerate(sorted(vagas.items())):
+        ctx.check_cancelled()
+        p = projection.get_projection(db, contest_id, n)
+        saida[str(contest_id)] = {"vagas": p["vagas"], "chamados": len(p["chamados"]), "talvez": p["talvez"]}
+        ctx.progress((i + 1) / len(vagas), f"concurso {contest_id}")
+    return saida
+
+
+@handler("notification_digest")
+def _notification_digest(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import watchlist
+
+    return watchlist.send_digests(db, max_users=payload.get("max_users"))
+
+
+@handler("archive_contest")
+def _archive_contest(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import archive
+
+    return archive.archive_contest(db, payload["contest_id"])
+
+
+@handler("restore_contest")
+def _restore_contest(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import archive
+
+    return archive.restore_contest(db, payload["contest_id"])
+
+
+@handler("token_sweep")
+def _token_sweep(db: Session, payload: dict, ctx: JobContext) -> dict:
+    from backend import confirmation_tokens
+
+    resumo = confirmation_tokens.sweep(db, batch=payload.get("batch", confirmation_tokens.SWEEP_BATCH))
+    if payload.get("every"):
+        # Varredura periódica: agenda a próxima antes de terminar
+        enqueue(db, "token_sweep", payload, run_after=datetime.utcnow() + timedelta(seconds=payload["every"]))
+    return resumo
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Fila de jobs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="consome a fila")
+    w.add_argument("--processes", type=int, default=1)
+    sub.add_parser("run-pending", help="executa o que estiver na fila e sai")
+    ls = sub.add_parser("list")
+    ls.add_argument("--status")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    if args.cmd == "worker":
+        if args.processes == 1:
+            _processo_worker()
+            return
+        processos = [multiprocessing.Process(target=_processo_worker, daemon=True) for _ in range(args.processes)]
+        for p in processos:
+            p.start()
+        for p in processos:
+            p.join()
+        return
+
+    db = SessionLocal()
+    try:
+        if args.cmd == "run-pending":
+            _inscrever_ouvintes()
+            print(f"{run_pending(db)} jobs executados")
+        else:
+            for job in list_jobs(db, status=args.status, limit=100):
+                print(f"{job.id} {job.kind:<18} {job.status:<10} {job.progress:>5.0%} tentativas={job.attempts} {job.error or ''}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
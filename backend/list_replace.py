@@ -0,0 +1,179 @@
+# backend/list_replace.py
+"""
+Substituição atômica de uma lista (concurso + categoria) já publicada.
+
+Em vez de apagar a categoria e subir tudo de novo (janela com a lista vazia,
+extras órfãos e reescrita de todas as linhas), a nova lista é montada numa
+área de staging, comparada com a lista atual pelo nome normalizado e só as
+diferenças são aplicadas, numa única transação curta:
+
+- removidos: saem da lista (junto com o extra, que não tem cascade);
+- movidos / nota alterada / grafia corrigida: UPDATE na própria linha, então
+  o extra (situação, contatos...) continua ligado ao candidato;
+- adicionados: INSERT.
+
+Homônimos na mesma lista são pareados pela ordem em que aparecem.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from backend import models, events, crud
+from backend.normalization import normalizar_nomes
+
+
+def _staging(names: List[str], final_scores: List[Optional[float]]) -> List[dict]:
+    """Nova lista já posicionada e normalizada (ainda fora do banco)."""
+    nomes = [n.strip() for n in names]
+    return [
+        {"name": nome, "norm": norm, "position": pos, "final_score": nota}
+        for pos, (nome, norm, nota) in enumerate(zip(nomes, normalizar_nomes(nomes), final_scores), start=1)
+    ]
+
+
+def _atual(db: Session, contest_id: int, category: str) -> List[dict]:
+    linhas = (
+        db.query(
+            models.ContestResult.id,
+            models.ContestResult.name,
+            models.ContestResult.position,
+            models.ContestResult.final_score,
+            models.ContestResultExtra.id,
+        )
+        .outerjoin(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+        .filter(models.ContestResult.contest_id == contest_id, models.ContestResult.category == category)
+        .order_by(models.ContestResult.position)
+        .all()
+    )
+    normas = normalizar_nomes(l[1] for l in linhas)
+    return [
+        {"id": rid, "name": nome, "norm": norm, "position": pos, "final_score": nota, "has_extra": extra_id is not None}
+        for (rid, nome, pos, nota, extra_id), norm in zip(linhas, normas)
+    ]
+
+
+def compute_diff(atual: List[dict], nova: List[dict]) -> dict:
+    """Pareia as duas listas por (nome normalizado, ocorrência) e classifica as mudanças."""
+    fila: Dict[str, List[dict]] = defaultdict(list)
+    for linha in atual:
+        fila[linha["norm"]].append(linha)
+
+    added, moved, score_changed, renamed, pares = [], [], [], [], []
+    consumidos = defaultdict(int)
+    for item in nova:
+        i = consumidos[item["norm"]]
+        candidatos = fila.get(item["norm"], [])
+        if i >= len(candidatos):
+            added.append({"name": item["name"], "position": item["position"], "final_score": item["final_score"]})
+            continue
+        consumidos[item["norm"]] += 1
+        antigo = candidatos[i]
+        pares.append((antigo, item))
+        if antigo["position"] != item["position"]:
+            moved.append({"id": antigo["id"], "name": item["name"],
+                          "old_position": antigo["position"], "new_position": item["position"]})
+        if antigo["final_score"] != item["final_score"]:
+            score_changed.append({"id": antigo["id"], "name": item["name"],
+                                  "old_score": antigo["final_score"], "new_score": item["final_score"]})
+        if antigo["name"] != item["name"]:
+            renamed.append({"id": antigo["id"], "old_name": antigo["name"], "new_name": item["name"]})
+
+    removed = [
+        {"id": l["id"], "name": l["name"], "position": l["position"],
+         "final_score": l["final_score"], "had_extra": l["has_extra"]}
+        for norm, linhas in fila.items()
+        for l in linhas[consumidos[norm]:]
+    ]
+    removed.sort(key=lambda r: r["position"])
+    alterados = {r["id"] for r in moved} | {r["id"] for r in score_changed} | {r["id"] for r in renamed}
+    return {
+        "added": added,
+        "removed": removed,
+        "moved": moved,
+        "score_changed": score_changed,
+        "renamed": renamed,
+        "unchanged": sum(1 for antigo, _ in pares if antigo["id"] not in alterados),
+        "_pares": pares,
+    }
+
+
+def _aplicar(db: Session, contest_id: int, category: str, diff: dict) -> List[int]:
+    removidos = [r["id"] for r in diff["removed"]]
+    if removidos:
+        db.execute(delete(models.ContestResultExtra).where(models.ContestResultExtra.contest_result_id.in_(removidos)))
+        db.execute(delete(models.ContestResult).where(models.ContestResult.id.in_(removidos)))
+
+    mudancas = [
+        {"id": antigo["id"], "position": item["position"], "final_score": item["final_score"], "name": item["name"]}
+        for antigo, item in diff["_pares"]
+        if (antigo["position"], antigo["final_score"], antigo["name"]) != (item["position"], item["final_score"], item["name"])
+    ]
+    if mudancas:
+        # Tira as linhas movidas do caminho antes, por causa do UNIQUE (contest_id, category, position)
+        db.execute(update(models.ContestResult), [{"id": m["id"], "position": -m["position"]} for m in mudancas])
+        db.execute(update(models.ContestResult), mudancas)
+
+    if not diff["added"]:
+        return []
+    db.execute(insert(models.ContestResult), [
+        {"contest_id": contest_id, "category": category, **item} for item in diff["added"]
+    ])
+    posicoes = [a["position"] for a in diff["added"]]
+    return [
+        rid for (rid,) in db.query(models.ContestResult.id).filter(
+            models.ContestResult.contest_id == contest_id,
+            models.ContestResult.category == category,
+            models.ContestResult.position.in_(posicoes),
+        )
+    ]
+
+
+def replace_list(
+    db: Session,
+    contest_id: int,
+    category: str,
+    names: List[str],
+    final_scores: List[Optional[float]],
+    dry_run: bool = False,
+) -> dict:
+    """Substitui a lista da categoria pela nova e devolve o diff (dry_run só calcula)."""
+    if len(names) != len(final_scores):
+        raise HTTPException(status_code=400, detail="Quantidade de nomes e notas não coincidem.")
+    crud.validar_categoria(category)
+    contest = db.query(models.Contest.id, models.Contest.archived_at).filter(models.Contest.id == contest_id).first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Concurso não encontrado")
+    if contest.archived_at is not None:
+        raise HTTPException(status_code=409, detail="Concurso arquivado (somente leitura); restaure-o para alterar.")
+
+    nova = _staging(names, final_scores)
+    diff = compute_diff(_atual(db, contest_id, category), nova)
+    pares = diff.pop("_pares")
+    mudou = any(diff[k] for k in ("added", "removed", "moved", "score_changed", "renamed"))
+    relatorio = {"contest_id": contest_id, "category": category, "applied": False, "total": len(nova), **diff}
+    if dry_run or not mudou:
+        return relatorio
+
+    try:
+        adicionados = _aplicar(db, contest_id, category, {**diff, "_pares": pares})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    relatorio["applied"] = True
+
+    final = [
+        {"id": rid, "name": nome, "position": pos, "final_score": nota}
+        for rid, nome, pos, nota in db.query(
+            models.ContestResult.id, models.ContestResult.name,
+            models.ContestResult.position, models.ContestResult.final_score,
+        ).filter(
+            models.ContestResult.contest_id == contest_id, models.ContestResult.category == category
+        ).order_by(models.ContestResult.position)
+    ]
+    events.emit(events.RESULTS_REPLACED, db=db, contest_id=contest_id, category=category,
+                results=final, added_ids=adicionados)
+    return relatorio
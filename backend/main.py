@@ -1,18 +1,19 @@
 # backend/main.py
 import os
 import secrets
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Query
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import Response
+from fastapi.responses import Response, PlainTextResponse, JSONResponse
 
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 from authlib.integrations.starlette_client import OAuth
 from dotenv import load_dotenv
@@ -21,7 +22,16 @@ load_dotenv()
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://classificacaofinal-frontend.onrender.com" )
 
-app = FastAPI(title="Classificação de Concursos — Auth API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs na fila, em backoff ou reagendados (token_sweep) não podem esperar um enqueue novo
+    if jobs.WORKERS > 0:
+        jobs.start_inprocess_workers(jobs.WORKERS)
+    yield
+
+
+app = FastAPI(title="Classificação de Concursos — Auth API", lifespan=lifespan)
 
 SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(32)
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
@@ -36,11 +46,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Snapshot-Version", "Retry-After", "Idempotent-Replayed"],
  )
 
-from backend.database import Base, engine, get_db
+from backend.database import Base, engine, get_db, sync_schema
 from backend.models import User
-from backend import schemas, crud, auth
+from backend import cache, schemas, crud, auth, score_stats, rank_index, projection, identity, metrics, slow_queries, list_replace, rate_limit, singleflight, snapshots, jobs, admin_stats, watchlist, columnar, archive
 from backend.routers import results
 from backend.auth import (
     hash_password,
@@ -62,6 +73,10 @@ from backend.schemas import (
 )
 
 Base.metadata.create_all(bind=engine)
+sync_schema(engine)
+
+metrics.instrument_engine(engine)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # app.include_router(results.router, prefix="/api") # Removido para evitar duplicidade de rotas
 
@@ -282,6 +297,10 @@ async def get_me(current_user: User = Depends(get_current_user)):
 async def root():
     return {"message": "API de Classificação de Concursos"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/auth/email-status/{email}")
 async def check_email_status(email: str, db: Session = Depends(get_db)):
     user = get_user_by_email(db, email)
@@ -294,14 +313,209 @@ async def check_email_status(email: str, db: Session = Depends(get_db)):
 def create_contest_endpoint(contest: schemas.ContestCreate, db: Session = Depends(get_db)):
     return crud.create_contest(db, contest)
 
+_CONTESTS = TypeAdapter(List[schemas.Contest])
+
+
 @app.get("/api/contests/", response_model=List[schemas.Contest])
-def list_contests_endpoint(db: Session = Depends(get_db)):
-    return crud.get_contests(db)
+def list_contests_endpoint(
+    response: Response,
+    banca: Optional[str] = Query(None),
+    cargo: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="trecho do nome do concurso (sem diferenciar acentos)"),
+    sort: str = Query("id", pattern="^(id|name|banca|cargo|created_at)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="sem limit, devolve todos (compatível com o front atual)"),
+    cursor: Optional[str] = Query(None, description="valor de X-Next-Cursor da página anterior"),
+    db: Session = Depends(get_db),
+):
+    chave = (cache.catalog_version(), banca, cargo, q, sort, order, limit, cursor)
+
+    def executar():
+        contests, proximo = crud.search_contests(db, banca, cargo, q, sort, order, limit, cursor)
+        # Cursor na primeira linha e o corpo depois: o cache só guarda bytes
+        return (proximo or "").encode("utf-8") + b"\n" + _CONTESTS.dump_json(
+            _CONTESTS.validate_python(contests, from_attributes=True)
+        )
+
+    proximo, _, corpo = cache.get_or_compute("contests", chave, executar).partition(b"\n")
+    proximo = proximo.decode("utf-8")
+    resposta = singleflight.json_response(corpo)
+    if proximo:
+        resposta.headers["X-Next-Cursor"] = proximo
+    return resposta
+
+@app.get("/api/contests/facets", response_model=schemas.ContestFacets)
+def contest_facets_endpoint(
+    banca: Optional[str] = Query(None),
+    cargo: Optional[str] = Query(None),
+    q: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    chave = (cache.catalog_version(), banca, cargo, q)
+    return cache.get_or_compute("facets", chave, lambda: crud.contest_facets(db, banca, cargo, q))
+
+@app.get("/api/contests/{contest_id}/stats", response_model=schemas.ScoreStats)
+def contest_score_stats_endpoint(
+    contest_id: int,
+    category: Optional[str] = Query(None),
+    bins: int = Query(20, ge=1, le=200),
+    cutoff_position: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Distribuição das notas finais (contagem, min/max/média, percentis, histograma)
+    e nota de corte na posição informada (exige category: cada lista tem a sua).
+    """
+    if cutoff_position is not None and not category:
+        raise HTTPException(status_code=400, detail="cutoff_position exige category")
+    return score_stats.get_score_stats(db, contest_id, category=category, bins=bins, cutoff_position=cutoff_position)
+
+@app.get("/api/rank-lookup", response_model=List[schemas.RankLookupItem])
+def rank_lookup_endpoint(
+    score: float = Query(...),
+    contest_id: Optional[List[int]] = Query(None),
+    category: Optional[str] = Query(None),
+    top: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Posição que a nota informada teria em cada categoria dos concursos
+    (todos, se nenhum contest_id for passado). Com `top`, indica se passaria
+    dentro das primeiras `top` posições.
+    """
+    return rank_index.rank_score(db, score, contest_ids=contest_id, category=category, top=top)
+
+@app.get("/api/contests/{contest_id}/projection", response_model=schemas.Projection)
+def contest_projection_endpoint(
+    contest_id: int,
+    vagas: int = Query(..., ge=1),
+    ppp: float = Query(projection.RESERVAS_PADRAO["PPP"], ge=0, le=1),
+    pcd: float = Query(projection.RESERVAS_PADRAO["PCD"], ge=0, le=1),
+    indigenas: float = Query(projection.RESERVAS_PADRAO["Indígenas"], ge=0, le=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Projeta quem seria convocado para `vagas` vagas, considerando vai_assumir,
+    situação na lista e nomeações em outros concursos.
+    """
+    try:
+        return projection.get_projection(
+            db, contest_id, vagas, reservas={"PPP": ppp, "PCD": pcd, "Indígenas": indigenas}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- Nomes acompanhados / notificações ---
+@app.get("/api/followed-names", response_model=List[schemas.FollowedName])
+def list_followed_names_endpoint(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return watchlist.list_followed(db, current_user.id)
+
+@app.post("/api/followed-names", response_model=schemas.FollowedName, status_code=status.HTTP_201_CREATED)
+def follow_name_endpoint(
+    data: schemas.FollowedNameCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return watchlist.follow(db, current_user.id, data.name, email_digest=data.email_digest)
+
+@app.delete("/api/followed-names/{followed_id}", status_code=status.HTTP_204_NO_CONTENT)
+def unfollow_name_endpoint(
+    followed_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not watchlist.unfollow(db, current_user.id, followed_id):
+        raise HTTPException(status_code=404, detail="Nome acompanhado não encontrado")
+    return
+
+@app.get("/api/notifications", response_model=List[schemas.Notification])
+def list_notifications_endpoint(
+    unread_only: bool = Query(True),
+    since_id: Optional[int] = Query(None, description="só notificações com id maior (polling incremental)"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return watchlist.get_notifications(db, current_user.id, unread_only=unread_only, since_id=since_id, limit=limit)
+
+@app.post("/api/notifications/read")
+def mark_notifications_read_endpoint(
+    data: schemas.NotificationsRead,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return {"marked": watchlist.mark_read(db, current_user.id, ids=data.ids, up_to_id=data.up_to_id)}
+
+# --- Fila de jobs ---
+def _job_aceito(job) -> JSONResponse:
+    corpo = schemas.JobOut.model_validate(job).model_dump(mode="json")
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=corpo, headers={"Location": f"/api/jobs/{job.id}"})
+
+@app.post("/api/jobs", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.JobOut)
+def create_job_endpoint(
+    data: schemas.JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    try:
+        return _job_aceito(jobs.enqueue(db, data.kind, data.payload, created_by=current_user.id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs", response_model=List[schemas.JobOut])
+def list_jobs_endpoint(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    kind: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    return jobs.list_jobs(db, status=status_filter, kind=kind, limit=limit)
+
+# O id é um uuid aleatório: quem o recebeu no 202 consegue acompanhar sem login
+@app.get("/api/jobs/{job_id}", response_model=schemas.JobOut)
+def get_job_endpoint(job_id: str, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel", response_model=schemas.JobOut)
+def cancel_job_endpoint(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    job = jobs.cancel_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
 
 # --- Endpoints Resultados ---
+_RESULTADOS = TypeAdapter(List[schemas.ContestResult])
+
+
+def _resultados_json(rows) -> bytes:
+    return _RESULTADOS.dump_json(_RESULTADOS.validate_python(rows, from_attributes=True))
+
 @app.post("/api/contest-results/", response_model=List[schemas.ContestResult])
-def create_results_endpoint(data: schemas.ContestResultCreate, db: Session = Depends(get_db)):
-    return crud.create_contest_results(db, data)
+def create_results_endpoint(
+    data: schemas.ContestResultCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    allow_overlap: bool = Query(False, description="acrescenta mesmo com nomes já presentes na categoria"),
+    background: bool = Query(False, description="enfileira e responde 202 com o job"),
+    db: Session = Depends(get_db),
+):
+    if background:
+        crud.validar_categoria(data.category)
+        return _job_aceito(jobs.enqueue(db, "upload_results", {
+            "data": data.model_dump(), "idempotency_key": idempotency_key, "allow_overlap": allow_overlap,
+        }))
+    resultados = crud.create_contest_results(db, data, idempotency_key=idempotency_key, allow_overlap=allow_overlap)
+    if db.info.pop("upload_replayed", False):
+        response.headers["Idempotent-Replayed"] = "true"
+    return resultados
 
 # ✅ SUBSTITUÍDO: Endpoint agora usa a função otimizada do CRUD
 @app.get("/api/contest-results/{contest_id}", response_model=List[schemas.ContestResult])
@@ -312,7 +526,32 @@ def list_results_endpoint(
     limit: int = Query(100, le=1000),
     category: Optional[str] = Query(None),
 ):
-    return crud.get_contest_results(db, contest_id=contest_id, skip=skip, limit=limit, category=category)
+    chave = (contest_id, cache.contest_version(contest_id), skip, limit, category)
+    return singleflight.json_response(singleflight.results_flight.do(chave, lambda: cache.get_or_compute(
+        "results", chave, lambda: _resultados_json(
+            crud.get_contest_results(db, contest_id=contest_id, skip=skip, limit=limit, category=category)
+        )
+    )))
+
+@app.get("/api/contests/{contest_id}/snapshot", response_model=schemas.ContestSnapshot)
+def contest_snapshot_endpoint(
+    contest_id: int,
+    request: Request,
+    category: Optional[str] = Query(None),
+    v: Optional[str] = Query(None, description="versão (ETag) publicada; com ela a resposta é imutável"),
+    db: Session = Depends(get_db),
+):
+    if category:
+        crud.validar_categoria(category)
+    resposta = snapshots.serve(
+        db, contest_id, category,
+        accept_encoding=request.headers.get("accept-encoding", ""),
+        if_none_match=request.headers.get("if-none-match"),
+        version=v,
+    )
+    if resposta is None:
+        raise HTTPException(status_code=404, detail="Concurso não encontrado")
+    return resposta
 
 @app.get("/api/contest-results-count/{contest_id}")
 def get_results_count_endpoint(contest_id: int, category: Optional[str] = Query(None), db: Session = Depends(get_db)):
@@ -341,22 +580,96 @@ def delete_contest_results_by_category_endpoint(
     contest_id: int, 
     category: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    background: bool = Query(False, description="enfileira e responde 202 com o job"),
 ):
+    if background:
+        return _job_aceito(jobs.enqueue(db, "delete_category", {"contest_id": contest_id, "category": category},
+                                        created_by=current_user.id))
     crud.delete_results_by_category(db, contest_id=contest_id, category=category)
     return
 
+@app.put("/api/contest-results/{contest_id}/{category}", response_model=schemas.ListDiff)
+def replace_contest_results_endpoint(
+    contest_id: int,
+    category: str,
+    data: schemas.ContestResultReplace,
+    dry_run: bool = Query(False, description="Só calcula o diff, sem aplicar"),
+    background: bool = Query(False, description="enfileira e responde 202 com o job (o diff sai no result)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    if background and not dry_run:
+        crud.validar_categoria(category)
+        return _job_aceito(jobs.enqueue(db, "replace_list", {
+            "contest_id": contest_id, "category": category, "names": data.names, "final_scores": data.final_scores,
+        }, created_by=current_user.id))
+    return list_replace.replace_list(db, contest_id, category, data.names, data.final_scores, dry_run=dry_run)
+
 # ✅ CORRIGIDO: Função agora está completa
 @app.get("/api/results-by-name/", response_model=List[schemas.ContestResult])
 def get_results_by_name_endpoint(
+    request: Request,
     name: str = Query(..., min_length=3), 
     db: Session = Depends(get_db)
 ):
     """
     Busca todos os resultados de um candidato pelo nome.
     """
+    rate_limit.check(request, "results-by-name")
     return crud.get_all_results_by_name(db, name=name)
 
+@app.get("/api/admin/stats", response_model=schemas.AdminStats)
+def admin_stats_endpoint(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Totais do painel: usuários por papel/confirmação, concursos por banca,
+    resultados por concurso/categoria e contagem de situações.
+    """
+    return admin_stats.get_stats(db)
+
+@app.get("/api/admin/columnar")
+def columnar_stats_endpoint(current_user: User = Depends(get_current_admin_user)):
+    """
+    Estado e memória ocupada pelo motor colunar (COLUMNAR_ENGINE=1).
+    """
+    return columnar.engine.stats()
+
+@app.get("/api/admin/slow-queries")
+def slow_queries_endpoint(
+    limit: int = Query(20, ge=1, le=500),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Fingerprints das queries mais lentas (ativo apenas com SLOW_QUERY_MS definido).
+    """
+    log = slow_queries.slow_log
+    if log is None:
+        return {"enabled": False, "threshold_ms": None, "queries": []}
+    return {"enabled": True, "threshold_ms": log.threshold * 1000, "queries": log.top_queries(limit)}
+
+@app.delete("/api/admin/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_slow_queries_endpoint(current_user: User = Depends(get_current_admin_user)):
+    if slow_queries.slow_log is not None:
+        slow_queries.slow_log.reset()
+    return
+
+@app.get("/api/persons/{person_id}/results", response_model=List[schemas.ContestResult])
+def person_results_endpoint(person_id: int, db: Session = Depends(get_db)):
+    """
+    Todas as listas em que a pessoa aparece (ligação feita por backend.identity).
+    """
+    return identity.get_person_results(db, person_id)
+
+@app.get("/api/contest-results/{contest_result_id}/outras-listas", response_model=schemas.OutrasListas)
+def outras_listas_endpoint(contest_result_id: int, db: Session = Depends(get_db)):
+    outras = identity.derive_outras_listas(db, contest_result_id)
+    if outras is None:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado")
+    return outras
+
 @app.put("/api/contests/{contest_id}", response_model=schemas.Contest)
 def update_contest_endpoint(
     contest_id: int,
@@ -369,14 +682,85 @@ def update_contest_endpoint(
         raise HTTPException(status_code=404, detail="Concurso não encontrado")
     return updated_contest
 
+@app.post("/api/contests/{contest_id}/archive")
+def archive_contest_endpoint(
+    contest_id: int,
+    background: bool = Query(False, description="enfileira e responde 202 com o job"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Move resultados e extras do concurso para o arquivo frio; as leituras
+    continuam iguais e as escritas passam a responder 409.
+    """
+    if background:
+        return _job_aceito(jobs.enqueue(db, "archive_contest", {"contest_id": contest_id}, created_by=current_user.id))
+    return archive.archive_contest(db, contest_id)
+
+@app.post("/api/contests/{contest_id}/restore")
+def restore_contest_endpoint(
+    contest_id: int,
+    background: bool = Query(False, description="enfileira e responde 202 com o job"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    if background:
+        return _job_aceito(jobs.enqueue(db, "restore_contest", {"contest_id": contest_id}, created_by=current_user.id))
+    return archive.restore_contest(db, contest_id)
+
+@app.get("/api/admin/archives")
+def list_archives_endpoint(db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    return archive.list_archives(db)
+
 @app.get("/api/contests/compare/{contest_id_1}/{contest_id_2}")
-def compare_contests_api_endpoint(contest_id_1: int, contest_id_2: int, db: Session = Depends(get_db)):
-    results = crud.compare_contests(db, contest_id_1, contest_id_2)
-    return {"matches": results, "count": len(results)}
+def compare_contests_api_endpoint(contest_id_1: int, contest_id_2: int, request: Request, db: Session = Depends(get_db)):
+    rate_limit.check(request, "compare")
+    chave = (contest_id_1, cache.contest_version(contest_id_1), contest_id_2, cache.contest_version(contest_id_2))
+
+    def executar():
+        with rate_limit.heavy_slot():
+            return crud.compare_contests_json(db, contest_id_1, contest_id_2)
+
+    return singleflight.json_response(
+        singleflight.compare_flight.do(chave, lambda: cache.get_or_compute("compare", chave, executar))
+    )
+
+@app.get("/api/contests/compare")
+def compare_many_contests_endpoint(
+    request: Request,
+    ids: List[int] = Query(..., description="2 a 10 concursos: ?ids=1&ids=2&ids=3"),
+    db: Session = Depends(get_db),
+):
+    """
+    Nomes presentes em todos os concursos pedidos, com as entradas de cada um.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not 2 <= len(ids) <= 10:
+        raise HTTPException(status_code=400, detail="Informe de 2 a 10 concursos distintos")
+    rate_limit.check(request, "compare")
+    chave = tuple((cid, cache.contest_version(cid)) for cid in ids)
+
+    def executar():
+        with rate_limit.heavy_slot():
+            results = columnar.compare_many(db, ids)
+        return singleflight.dumps({"matches": results, "count": len(results)})
+
+    return singleflight.json_response(
+        singleflight.compare_flight.do(chave, lambda: cache.get_or_compute("compare", chave, executar))
+    )
 
 @app.post("/api/results-by-names-batch")
-def results_by_names_batch_endpoint(payload: schemas.NamesBatchRequest, db: Session = Depends(get_db)):
-    return crud.get_results_by_names_batch(db, payload.names)
+def results_by_names_batch_endpoint(payload: schemas.NamesBatchRequest, request: Request, db: Session = Depends(get_db)):
+    rate_limit.check(request, "results-by-names-batch", items=len(payload.names))
+    chave = (cache.data_version(), tuple(payload.names))
+
+    def executar():
+        with rate_limit.heavy_slot():
+            return singleflight.dumps(crud.get_results_by_names_batch(db, payload.names))
+
+    return singleflight.json_response(
+        singleflight.names_batch_flight.do(chave, lambda: cache.get_or_compute("names-batch", chave, executar))
+    )
 
 
 
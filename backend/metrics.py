@@ -0,0 +1,257 @@
+# backend/metrics.py
+"""
+Métricas por requisição no formato texto do Prometheus (/metrics).
+
+- MetricsMiddleware (ASGI puro): latência por rota (template, não a URL),
+  status e requisições em andamento;
+- instrument_engine: conta queries e tempo de banco por requisição via
+  before/after_cursor_execute;
+- register_collector: outros módulos (caches, pool...) publicam gauges.
+
+Tudo em memória, com custo de alguns microssegundos por requisição.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import time
+
+from sqlalchemy import event
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+Amostra = Tuple[str, Dict[str, str], float]
+
+
+class QueryStats:
+    """Estatísticas de banco de uma requisição (ou de um bloco `count_queries`)."""
+    __slots__ = ("queries", "db_time", "scope", "statements")
+
+    def __init__(self, scope: Optional[dict] = None, guardar_sql: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.scope = scope
+        self.statements: Optional[List[str]] = [] if guardar_sql else None
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return ""
+        # Usa o template da rota para não explodir a cardinalidade
+        return getattr(self.scope.get("route"), "path", None) or "unmatched"
+
+
+_stats_atual: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _stats_atual.get()
+
+
+def current_route() -> Optional[str]:
+    stats = _stats_atual.get()
+    return stats.route if stats is not None and stats.scope is not None else None
+
+
+@contextmanager
+def count_queries(guardar_sql: bool = False):
+    """Conta as queries executadas dentro do bloco (útil em scripts e checagens)."""
+    stats = QueryStats(guardar_sql=guardar_sql)
+    token = _stats_atual.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats_atual.reset(token)
+
+
+class _Histograma:
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = Lock()
+        self.requisicoes: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.latencias: Dict[Tuple[str, str], _Histograma] = {}
+        self.queries_por_req: Dict[Tuple[str, str], _Histograma] = {}
+        self.queries_total: Dict[str, int] = defaultdict(int)
+        self.db_tempo_total: Dict[str, float] = defaultdict(float)
+        self.em_andamento = 0
+        self._coletores: List[Callable[[], Iterable[Amostra]]] = []
+
+    def observar_requisicao(self, metodo: str, rota: str, status: int, duracao: float, stats: QueryStats) -> None:
+        with self._lock:
+            self.requisicoes[(metodo, rota, str(status))] += 1
+            chave = (metodo, rota)
+            if chave not in self.latencias:
+                self.latencias[chave] = _Histograma(BUCKETS)
+                self.queries_por_req[chave] = _Histograma(QUERY_BUCKETS)
+            self.latencias[chave].observar(duracao)
+            self.queries_por_req[chave].observar(stats.queries)
+            self.queries_total[rota] += stats.queries
+            self.db_tempo_total[rota] += stats.db_time
+
+    def observar_query_avulsa(self, duracao: float) -> None:
+        with self._lock:
+            self.queries_total["outside_request"] += 1
+            self.db_tempo_total["outside_request"] += duracao
+
+    def register_collector(self, fn: Callable[[], Iterable[Amostra]]) -> None:
+        self._coletores.append(fn)
+
+    def render(self) -> str:
+        linhas: List[str] = []
+
+        def tipo(nome, t, ajuda):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {t}")
+
+        def amostra(nome, labels, valor):
+            if labels:
+                rotulos = ",".join(f'{k}="{_escapar(v)}"' for k, v in labels.items())
+                linhas.append(f"{nome}{{{rotulos}}} {valor}")
+            else:
+                linhas.append(f"{nome} {valor}")
+
+        def histograma(nome, dados):
+            for (metodo, rota), h in sorted(dados.items()):
+                acumulado = 0
+                for limite, c in zip(h.limites, h.contagens):
+                    acumulado += c
+                    amostra(f"{nome}_bucket", {"method": metodo, "route": rota, "le": str(limite)}, acumulado)
+                amostra(f"{nome}_bucket", {"method": metodo, "route": rota, "le": "+Inf"}, h.total)
+                amostra(f"{nome}_sum", {"method": metodo, "route": rota}, round(h.soma, 6))
+                amostra(f"{nome}_count", {"method": metodo, "route": rota}, h.total)
+
+        with self._lock:
+            tipo("http_requests_total", "counter", "Requisições HTTP por rota e status.")
+            for (metodo, rota, status), n in sorted(self.requisicoes.items()):
+                amostra("http_requests_total", {"method": metodo, "route": rota, "status": status}, n)
+            tipo("http_requests_in_flight", "gauge", "Requisições em andamento.")
+            amostra("http_requests_in_flight", {}, self.em_andamento)
+            tipo("http_request_duration_seconds", "histogram", "Latência por rota.")
+            histograma("http_request_duration_seconds", self.latencias)
+            tipo("db_queries_per_request", "histogram", "Queries SQL por requisição.")
+            histograma("db_queries_per_request", self.queries_por_req)
+            tipo("db_queries_total", "counter", "Queries SQL por rota.")
+            for rota, n in sorted(self.queries_total.items()):
+                amostra("db_queries_total", {"route": rota}, n)
+            tipo("db_query_seconds_total", "counter", "Tempo gasto no banco por rota.")
+            for rota, t in sorted(self.db_tempo_total.items()):
+                amostra("db_query_seconds_total", {"route": rota}, round(t, 6))
+
+        vistos = set()
+        for coletor in self._coletores:
+            try:
+                for nome, labels, valor in coletor():
+                    if nome not in vistos:
+                        tipo(nome, "gauge", nome.replace("_", " "))
+                        vistos.add(nome)
+                    amostra(nome, labels, valor)
+            except Exception:
+                continue
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+register_collector = registry.register_collector
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats(scope)
+        token = _stats_atual.set(stats)
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        registry.em_andamento += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.em_andamento -= 1
+            _stats_atual.reset(token)
+            registry.observar_requisicao(
+                scope["method"], stats.route, status_holder[0], time.perf_counter() - inicio, stats
+            )
+
+
+def instrument_engine(engine) -> None:
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        pilha = conn.info.get("_metrics_inicio")
+        if not pilha:
+            return
+        duracao = time.perf_counter() - pilha.pop()
+        stats = _stats_atual.get()
+        if stats is None:
+            registry.observar_query_avulsa(duracao)
+            return
+        stats.queries += 1
+        stats.db_time += duracao
+        if stats.statements is not None:
+            stats.statements.append(statement)
+
+    def _pool():
+        pool = engine.pool
+        for nome in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, nome, None)
+            if callable(fn):
+                yield ("db_pool_connections", {"state": nome}, fn())
+
+    register_collector(_pool)
+
+
+def _caches():
+    from backend import cache, normalization, rank_index
+
+    for nome, valor in cache.derived_cache.stats().items():
+        yield ("cache_derived", {"stat": nome}, valor)
+    backend = cache.get_backend()
+    for nome, valor in backend.stats().items():
+        yield ("cache_backend", {"backend": backend.name, "stat": nome}, valor)
+    info = normalization.cache_info()
+    yield ("cache_normalization", {"stat": "hits"}, info.hits)
+    yield ("cache_normalization", {"stat": "misses"}, info.misses)
+    yield ("cache_normalization", {"stat": "size"}, info.currsize)
+    for nome, valor in rank_index.rank_index.stats().items():
+        yield ("rank_index", {"stat": nome}, valor)
+
+
+register_collector(_caches)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Date, Float, Boolean, CheckConstraint, Index, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Date, Float, Boolean, CheckConstraint, Index, JSON, LargeBinary
 from sqlalchemy.sql import func
 from backend.database import Base
 from datetime import datetime
@@ -18,12 +18,28 @@ class User(Base):
     
     # Novos campos para confirmação de e-mail
     email_confirmed = Column(Boolean, default=False, nullable=False)
-    confirmation_token = Column(String, nullable=True)
+    confirmation_token = Column(String, nullable=True, index=True)  # legado: tokens novos ficam em confirmation_tokens
     confirmation_sent_at = Column(DateTime(timezone=True), nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Varredura de contas não confirmadas abandonadas
+        Index("idx_users_confirmed_created", "email_confirmed", "created_at"),
+    )
+
+
+class ConfirmationToken(Base):
+    """Token de confirmação de e-mail; só o hash é guardado (backend.confirmation_tokens)."""
+    __tablename__ = "confirmation_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)   # sha256 hex
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Contest(Base):
     __tablename__ = "contests"
 
@@ -34,9 +50,36 @@ class Contest(Base):
     edital_url = Column(Text, nullable=False)   # Link do Edital
     cargo = Column(String, nullable=False)      # Analista, Técnico, Professor...
     created_at = Column(DateTime, default=datetime.utcnow)
+    archived_at = Column(DateTime, nullable=True)  # preenchido por backend.archive (lista só leitura)
 
     results = relationship("ContestResult", back_populates="contest", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Filtros do catálogo + paginação por chave (coluna, id)
+        Index("idx_contests_banca_id", "banca", "id"),
+        Index("idx_contests_cargo_id", "cargo", "id"),
+        Index("idx_contests_name_id", "name", "id"),
+        Index("idx_contests_created_id", "created_at", "id"),
+    )
+
+class Person(Base):
+    __tablename__ = "persons"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome_normalizado = Column(String, nullable=False)
+    name = Column(String, nullable=False)       # Grafia mais comum do nome
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    results = relationship("ContestResult", back_populates="person")
+
+    __table_args__ = (
+        # Índice único (e não UniqueConstraint) para que sync_schema o crie em bancos existentes.
+        # Uma Person por nome: homônimos entre concursos não são separados (ver backend.identity)
+        Index("uq_persons_nome_normalizado", "nome_normalizado", unique=True),
+    )
+
+CATEGORIAS = ("Ampla", "PPP", "PCD", "Indígenas")  # as mesmas de ck_results_category
+
 class ContestResult(Base):
     __tablename__ = "contest_results"
 
@@ -46,10 +89,12 @@ class ContestResult(Base):
     position = Column(Integer, nullable=False)  # 1, 2, 3... (por categoria)
     name = Column(String, nullable=False)       # Nome do candidato
     final_score = Column(Float)                 # Nota Final (use ponto: 9.58)
+    person_id = Column(Integer, ForeignKey("persons.id"), nullable=True, index=True)  # preenchido por backend.identity
     created_at = Column(DateTime, default=datetime.utcnow)
 
     contest = relationship("Contest", back_populates="results")
     extra = relationship("ContestResultExtra", back_populates="result", uselist=False)
+    person = relationship("Person", back_populates="results")
 
     __table_args__ = (
         CheckConstraint("category in ('Ampla','PPP','PCD','Indígenas')", name="ck_results_category"),
@@ -75,12 +120,134 @@ class ContestResultExtra(Base):
     # ✅ GARANTA QUE ESTA LINHA EXISTA E CORRESPONDA AO 'back_populates' ACIMA
     result = relationship("ContestResult", back_populates="extra")
 
+    __table_args__ = (
+        Index("idx_results_extra_result", "contest_result_id"),
+    )
+
 
+class ResultUpload(Base):
+    """Impressão digital de cada upload de lista (idempotência / reenvios)."""
+    __tablename__ = "result_uploads"
 
+    id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey("contests.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False)     # sha256 da sequência (nome normalizado, nota)
+    idempotency_key = Column(String, nullable=True, unique=True)
+    row_count = Column(Integer, nullable=False)
+    first_position = Column(Integer, nullable=False)
+    last_position = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        UniqueConstraint("contest_id", "category", "content_hash", name="uq_uploads_contest_cat_hash"),
+    )
 
 
+class Job(Base):
+    """Fila persistente de tarefas pesadas (backend.jobs)."""
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)            # uuid4 hex: o id também serve de link de acompanhamento
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued | running | succeeded | failed | cancelled
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("idx_jobs_status_run_after", "status", "run_after"),
+    )
 
 
+class FollowedName(Base):
+    """Nome acompanhado por um usuário (backend.watchlist)."""
+    __tablename__ = "followed_names"
 
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)                 # como o usuário digitou
+    nome_normalizado = Column(String, nullable=False, index=True)
+    email_digest = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "nome_normalizado", name="uq_followed_user_nome"),
+    )
+
+
+class Notification(Base):
+    """Novidade para um nome acompanhado: entrou numa lista ou mudou de situação."""
+    __tablename__ = "notifications"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    followed_name_id = Column(Integer, ForeignKey("followed_names.id", ondelete="SET NULL"), nullable=True)
+    kind = Column(String, nullable=False)                 # new_result | situacao
+    contest_id = Column(Integer, ForeignKey("contests.id", ondelete="CASCADE"), nullable=False)
+    contest_result_id = Column(Integer, ForeignKey("contest_results.id", ondelete="SET NULL"), nullable=True)
+    category = Column(String, nullable=True)
+    position = Column(Integer, nullable=True)
+    name = Column(String, nullable=False)
+    final_score = Column(Float, nullable=True)
+    situacao = Column(String, nullable=True)
+    previous_situacao = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    read_at = Column(DateTime, nullable=True)
+    emailed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # "Tem novidade para mim?" = um range scan neste índice
+        Index("idx_notifications_user_read_id", "user_id", "read_at", "id"),
+        Index("idx_notifications_emailed", "emailed_at"),
+    )
+
+
+
+
+
+
+
+
+
+
+
+
+class ContestArchive(Base):
+    """Resultados + extras de um concurso arquivado, num blob comprimido (backend.archive)."""
+    __tablename__ = "contest_archives"
+
+    contest_id = Column(Integer, ForeignKey("contests.id", ondelete="CASCADE"), primary_key=True)
+    payload = Column(LargeBinary, nullable=False)       # JSON comprimido com zlib
+    content_hash = Column(String(64), nullable=False)   # sha256 do JSON; entra na chave do cache de leitura
+    row_count = Column(Integer, nullable=False)
+    extra_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedName(Base):
+    """Índice-resumo dos nomes de um concurso arquivado (busca por nome sem abrir o blob)."""
+    __tablename__ = "archived_names"
+
+    id = Column(Integer, primary_key=True)
+    contest_id = Column(Integer, ForeignKey("contests.id", ondelete="CASCADE"), nullable=False)
+    nome_normalizado = Column(String, nullable=False)
+    nomeado = Column(Boolean, default=False, nullable=False)  # nomeado/empossado em alguma linha
+
+    __table_args__ = (
+        UniqueConstraint("contest_id", "nome_normalizado", name="uq_archived_names_contest_nome"),
+        Index("idx_archived_names_nome", "nome_normalizado", "contest_id"),
+    )
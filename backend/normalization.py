@@ -0,0 +1,110 @@
+# backend/normalization.py
+"""
+Normalização única de nomes de candidatos.
+
+Todas as buscas e comparações por nome (crud, routers, compare) devem usar
+este módulo, para que o mesmo candidato case igual em qualquer endpoint:
+minúsculas, sem acentos, ligaduras expandidas (æ -> ae, ß -> ss) e espaços
+internos colapsados.
+"""
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+CACHE_SIZE = int(os.getenv("NORMALIZACAO_CACHE_SIZE", "65536"))
+
+# Letras que não se decompõem com NFKD mas que precisam virar ASCII
+_SUBSTITUICOES = {
+    "æ": "ae",
+    "œ": "oe",
+    "ß": "ss",
+    "ø": "o",
+    "ł": "l",
+    "đ": "d",
+    "ð": "d",
+    "þ": "th",
+    "ı": "i",
+}
+
+
+def _remover_marcas(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def remover_acentos(texto):
+    """Equivalente ao unaccent() do Postgres (registrado como função no SQLite)."""
+    if texto is None:
+        return None
+    return _remover_marcas(texto)
+
+
+def _construir_tabela() -> Dict[int, str]:
+    """Tabela pré-calculada para Latin-1 e Latin Extended-A/B (cobre nomes em pt-BR)."""
+    tabela: Dict[int, str] = {}
+    for cp in range(0x80, 0x250):
+        char = chr(cp)
+        minusculo = char.lower()
+        if minusculo in _SUBSTITUICOES:
+            tabela[cp] = _SUBSTITUICOES[minusculo]
+            continue
+        base = _remover_marcas(minusculo).lower()
+        if base != char:
+            tabela[cp] = base
+    # Marcas combinantes soltas (texto já em NFD)
+    for cp in range(0x300, 0x370):
+        tabela[cp] = ""
+    return tabela
+
+
+_TABELA = _construir_tabela()
+
+# Letras que lower(unaccent()) do banco não leva ao mesmo ASCII que normalizar_nome
+# (ex.: "Æ" fica "æ", não "ae"): nomes com elas não podem ser descartados por LIKE.
+# As maiúsculas vêm dos caracteres cujo lower() é uma delas, não de upper():
+# "ı".upper() é "I" e "ß".upper() é "SS", e um LIKE '%I%' deixaria passar quase
+# todo nome. Nenhuma letra ASCII entra (o banco já as reduz igual).
+LETRAS_ESPECIAIS = frozenset(_SUBSTITUICOES) | frozenset(
+    c for c in map(chr, range(0x80, 0x2000)) if c.lower() in _SUBSTITUICOES
+)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalizar(nome: str) -> str:
+    if nome.isascii():
+        return " ".join(nome.lower().split())
+    nome = nome.translate(_TABELA)
+    if not nome.isascii():
+        # Fora da tabela (outros alfabetos, símbolos compatíveis): caminho lento
+        nome = "".join(_SUBSTITUICOES.get(c, c) for c in _remover_marcas(nome.lower()))
+    return " ".join(nome.lower().split())
+
+
+def normalizar_nome(nome: str) -> str:
+    if not nome:
+        return ""
+    return _normalizar(nome)
+
+
+def normalizar_nomes(nomes: Iterable[str]) -> List[str]:
+    """Versão em lote, para listas inteiras (upload, compare, batch de nomes)."""
+    vistos: Dict[str, str] = {}
+    saida = []
+    for nome in nomes:
+        if not nome:
+            saida.append("")
+            continue
+        norm = vistos.get(nome)
+        if norm is None:
+            norm = vistos[nome] = _normalizar(nome)
+        saida.append(norm)
+    return saida
+
+
+def cache_info():
+    return _normalizar.cache_info()
+
+
+def limpar_cache() -> None:
+    _normalizar.cache_clear()
@@ -0,0 +1,189 @@
+# backend/offload.py
+"""
+Pool de processos para o casamento de nomes pesado em CPU.
+
+O compare, o batch de nomes e a busca por nome + categoria gastam quase todo
+o tempo em Python puro (normalização dos nomes + montagem de dicts); sob o
+GIL isso trava as demais requisições do worker. Acima de OFFLOAD_MIN_ROWS
+linhas esse trabalho vai para um ProcessPoolExecutor com OFFLOAD_WORKERS
+processos (spawn: não herdam threads nem conexões do app); abaixo disso roda
+inline, onde serializar as linhas custaria mais do que o ganho.
+
+As funções que rodam no pool recebem e devolvem só tuplas/listas simples:
+quem chama lê as linhas do banco em lotes (yield_per), já como tuplas, sem
+montar objetos do ORM. O compare de dois concursos vai além: o processo do
+pool faz a própria leitura (sessão dele) e devolve o corpo JSON pronto, então
+a thread da requisição não busca, não desserializa e não monta nada — só
+recebe os bytes. Ela espera o resultado sem segurar o GIL. No máximo
+2 × OFFLOAD_WORKERS tarefas ficam em voo; se o pool quebrar (processo
+morto), a tarefa roda inline e um pool novo sobe na próxima.
+
+OFFLOAD_WORKERS=0 desliga o pool. Benchmark (latência dos outros endpoints
+durante compares grandes, com e sem o pool):
+    python -m backend.benchmarks.bench_offload
+"""
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, select
+
+from backend import metrics, models
+from backend.normalization import normalizar_nomes
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("OFFLOAD_WORKERS", str(min(2, os.cpu_count() or 1))))
+MIN_ROWS = int(os.getenv("OFFLOAD_MIN_ROWS", "20000"))
+LOTE = 5000  # linhas por fetch do banco (yield_per)
+SITUACAO_PADRAO = "Aguardando Convocação"
+
+# (id, name, category, position, situacao)
+LinhaCompare = Tuple[int, str, str, int, Optional[str]]
+
+
+# --- Trabalho (roda no pool ou inline; só tipos simples) ---
+
+def comparar(linhas_1: Sequence[LinhaCompare], linhas_2: Sequence[LinhaCompare]) -> List[dict]:
+    """Nomes presentes nos dois concursos, no formato de crud.compare_contests."""
+    mapas: Tuple[Dict[str, list], Dict[str, list]] = (defaultdict(list), defaultdict(list))
+    grafias: Dict[str, Counter] = defaultdict(Counter)
+    for mapa, linhas in zip(mapas, (linhas_1, linhas_2)):
+        for (rid, nome, categoria, posicao, situacao), nome_norm in zip(linhas, normalizar_nomes(l[1] for l in linhas)):
+            mapa[nome_norm].append({
+                "name": nome,
+                "category": categoria,
+                "position": posicao,
+                "contest_result_id": rid,
+                "situacao": situacao or SITUACAO_PADRAO,
+            })
+            grafias[nome_norm][nome] += 1
+    map_1, map_2 = mapas
+    return [
+        {"name": grafias[n].most_common(1)[0][0], "norm": n, "contest_1": map_1[n], "contest_2": map_2[n]}
+        for n in sorted(map_1.keys() & map_2.keys())
+    ]
+
+
+def consulta_compare(contest_id: int) -> Select:
+    """(id, name, category, position, situacao) das linhas do concurso."""
+    return (
+        select(
+            models.ContestResult.id, models.ContestResult.name, models.ContestResult.category,
+            models.ContestResult.position, models.ContestResultExtra.situacao,
+        )
+        .outerjoin(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+        .where(models.ContestResult.contest_id == contest_id)
+    )
+
+
+def comparar_do_banco(contest_id_1: int, contest_id_2: int) -> Optional[bytes]:
+    """Lê os dois concursos com uma sessão própria e devolve o JSON do compare ({"matches", "count"}).
+
+    None se algum não tem linhas no banco (arquivado): quem chama resolve pelo caminho normal.
+    """
+    from backend import singleflight
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        listas = [[tuple(r) for r in db.execute(consulta_compare(cid)).yield_per(LOTE)]
+                  for cid in (contest_id_1, contest_id_2)]
+    finally:
+        db.close()
+    if not all(listas):
+        return None
+    resultado = comparar(*listas)
+    return singleflight.dumps({"matches": resultado, "count": len(resultado)})
+
+
+def marcar_nomeados(nomes: Sequence[str], nomeados: Sequence[str]) -> List[bool]:
+    """Para cada nome pedido: está (normalizado) entre os nomes nomeados/empossados?"""
+    alvo = set(normalizar_nomes(nomeados))
+    return [n in alvo for n in normalizar_nomes(nomes)]
+
+
+def ids_com_nome(nome_norm: str, linhas: Sequence[Tuple[int, str]]) -> List[int]:
+    """Ids das linhas (id, name) cujo nome normalizado é nome_norm."""
+    return [rid for (rid, _), n in zip(linhas, normalizar_nomes(l[1] for l in linhas)) if n == nome_norm]
+
+
+# --- Pool ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+_em_voo = BoundedSemaphore(max(1, 2 * WORKERS))
+_contadores: Counter = Counter()
+_contadores_lock = Lock()
+_ultima_duracao: Optional[float] = None
+
+
+def _contar(chave: str) -> None:
+    with _contadores_lock:
+        _contadores[chave] += 1
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _descartar(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def enabled() -> bool:
+    return WORKERS > 0
+
+
+def run(fn: Callable, *args, rows: int):
+    """fn(*args) no pool se `rows` passa de MIN_ROWS; senão inline (mesmo resultado)."""
+    global _ultima_duracao
+    if not enabled() or rows < MIN_ROWS:
+        _contar("inline")
+        return fn(*args)
+    inicio = time.perf_counter()
+    with _em_voo:
+        pool = _obter_pool()
+        try:
+            resultado = pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            logger.warning("Pool de offload quebrado; %s roda inline", getattr(fn, "__name__", fn))
+            _descartar(pool)
+            _contar("fallback")
+            return fn(*args)
+    _contar("offloaded")
+    _ultima_duracao = time.perf_counter() - inicio
+    return resultado
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _coletor():
+    for modo, total in sorted(_contadores.items()):
+        yield ("offload_tasks", {"mode": modo}, total)
+    yield ("offload_workers", {}, WORKERS if _pool is not None else 0)
+    if _ultima_duracao is not None:
+        yield ("offload_last_duration_seconds", {}, round(_ultima_duracao, 4))
+
+
+metrics.register_collector(_coletor)
@@ -0,0 +1,187 @@
+# backend/projection.py
+"""
+Projeção de convocações de um concurso.
+
+Dadas N vagas, simula quem de fato seria chamado em Ampla/PPP/PCD/Indígenas,
+pulando quem respondeu que não vai assumir, quem já saiu da lista
+(desistência, exclusão...) e quem já foi nomeado/empossado em outro concurso.
+Vagas reservadas não preenchidas revertem para a ampla concorrência.
+
+Uso em lote:
+    python -m backend.projection --default-vagas 10
+    python -m backend.projection --vagas 1=30 --vagas 7=120
+"""
+from typing import Dict, List, Optional
+import argparse
+import json
+import math
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from backend import models, cache
+from backend.normalization import normalizar_nomes
+
+CATEGORIAS = ("Ampla", "PPP", "PCD", "Indígenas")
+# Percentuais padrão de reserva (Lei 12.990/2014 e Decreto 9.508/2018)
+RESERVAS_PADRAO = {"PPP": 0.20, "PCD": 0.05, "Indígenas": 0.0}
+# Situações em que o candidato já não ocupa vaga nesta lista
+SITUACOES_FORA = ("desist", "exclu", "sem efeito", "exonerad")
+
+
+def distribuir_vagas(vagas: int, reservas: Dict[str, float]) -> Dict[str, int]:
+    por_categoria = {}
+    for categoria, percentual in reservas.items():
+        por_categoria[categoria] = int(math.floor(vagas * percentual + 0.5)) if percentual else 0
+    reservadas = sum(por_categoria.values())
+    if reservadas > vagas:
+        raise ValueError("Percentuais de reserva excedem o total de vagas.")
+    por_categoria["Ampla"] = vagas - reservadas
+    return por_categoria
+
+
+def _carregar(db: Session, contest_id: int):
+    linhas = (
+        db.query(
+            models.ContestResult.id,
+            models.ContestResult.name,
+            models.ContestResult.category,
+            models.ContestResult.position,
+            models.ContestResult.final_score,
+            models.ContestResultExtra.situacao,
+            models.ContestResultExtra.vai_assumir,
+        )
+        .outerjoin(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+        .filter(models.ContestResult.contest_id == contest_id)
+        .order_by(models.ContestResult.category, models.ContestResult.position)
+        .all()
+    )
+    nomeados_fora = (
+        db.query(models.ContestResult.name)
+        .join(models.ContestResultExtra, models.ContestResultExtra.contest_result_id == models.ContestResult.id)
+        .filter(
+            models.ContestResult.contest_id != contest_id,
+            or_(
+                func.lower(models.ContestResultExtra.situacao).like("%nomead%"),
+                func.lower(models.ContestResultExtra.situacao).like("%empossad%"),
+            ),
+        )
+        .all()
+    )
+    return linhas, set(normalizar_nomes(n for (n,) in nomeados_fora))
+
+
+def compute_projection(db: Session, contest_id: int, vagas: int, reservas: Optional[Dict[str, float]] = None) -> dict:
+    reservas = {**RESERVAS_PADRAO, **(reservas or {})}
+    vagas_por_categoria = distribuir_vagas(vagas, reservas)
+    linhas, nomeados_fora = _carregar(db, contest_id)
+
+    n = len(linhas)
+    ids = np.fromiter((l[0] for l in linhas), dtype=np.int64, count=n)
+    nomes_norm = normalizar_nomes(l[1] for l in linhas)
+    codigo_nome = np.unique(np.asarray(nomes_norm, dtype=object), return_inverse=True)[1].reshape(-1)
+    categoria = np.asarray([l[2] for l in linhas], dtype=object)
+    situacao = [(l[5] or "").lower() for l in linhas]
+    vai_assumir = np.asarray([(l[6] or "").upper() for l in linhas], dtype=object)
+
+    nao_vai = (vai_assumir == "NÃO") | (vai_assumir == "NAO")
+    fora_da_lista = np.fromiter((any(s in sit for s in SITUACOES_FORA) for sit in situacao), dtype=bool, count=n)
+    nomeado_em_outro = np.fromiter((nome in nomeados_fora for nome in nomes_norm), dtype=bool, count=n)
+    elegivel = ~(nao_vai | fora_da_lista | nomeado_em_outro)
+
+    chamado = np.zeros(n, dtype=bool)
+
+    def chamar(cat: str, quantidade: int) -> int:
+        if quantidade <= 0:
+            return 0
+        ja_chamados = np.unique(codigo_nome[chamado])
+        candidatos = np.flatnonzero((categoria == cat) & elegivel & ~chamado & ~np.isin(codigo_nome, ja_chamados))
+        escolhidos = candidatos[:quantidade]
+        chamado[escolhidos] = True
+        return int(escolhidos.size)
+
+    preenchidas = {cat: 0 for cat in CATEGORIAS}
+    preenchidas["Ampla"] = chamar("Ampla", vagas_por_categoria.get("Ampla", 0))
+    for cat in CATEGORIAS[1:]:
+        preenchidas[cat] = chamar(cat, vagas_por_categoria.get(cat, 0))
+    # Vagas reservadas sem candidatos revertem para a ampla concorrência
+    sobra = sum(vagas_por_categoria.get(cat, 0) - preenchidas[cat] for cat in CATEGORIAS[1:])
+    revertidas = chamar("Ampla", sobra)
+    preenchidas["Ampla"] += revertidas
+
+    resumo = {}
+    for cat in CATEGORIAS:
+        chamados_cat = chamado & (categoria == cat)
+        ultimo = np.flatnonzero(chamados_cat)
+        resumo[cat] = {
+            "vagas": vagas_por_categoria.get(cat, 0),
+            "chamados": int(chamados_cat.sum()),
+            "ultima_posicao": int(linhas[ultimo[-1]][3]) if ultimo.size else None,
+        }
+
+    chamados = [
+        {
+            "contest_result_id": int(ids[i]),
+            "name": linhas[i][1],
+            "category": linhas[i][2],
+            "position": linhas[i][3],
+            "final_score": linhas[i][4],
+            "situacao": linhas[i][5],
+            "vai_assumir": linhas[i][6],
+        }
+        for i in np.flatnonzero(chamado)
+    ]
+    return {
+        "contest_id": contest_id,
+        "version": cache.contest_version(contest_id),
+        "vagas": vagas,
+        "vagas_revertidas": revertidas,
+        "categorias": resumo,
+        "ignorados": {
+            "nao_vai_assumir": int(nao_vai.sum()),
+            "fora_da_lista": int(fora_da_lista.sum()),
+            "nomeado_em_outro": int(nomeado_em_outro.sum()),
+        },
+        "talvez": int((vai_assumir[chamado] == "TALVEZ").sum()),
+        "chamados": chamados,
+    }
+
+
+def get_projection(db: Session, contest_id: int, vagas: int, reservas: Optional[Dict[str, float]] = None) -> dict:
+    # nomeado_em_outro depende das situações dos outros concursos: a versão
+    # do concurso sozinha não muda quando elas mudam
+    chave = (cache.data_version(), vagas, tuple(sorted((reservas or {}).items())))
+    return cache.cached_for_contest(
+        "projection", contest_id, chave, lambda: compute_projection(db, contest_id, vagas, reservas)
+    )
+
+
+def project_all(db: Session, vagas_por_concurso: Dict[int, int], reservas: Optional[Dict[str, float]] = None) -> List[dict]:
+    """Reexecuta a projeção de vários concursos (job em lote)."""
+    return [get_projection(db, contest_id, vagas, reservas) for contest_id, vagas in sorted(vagas_por_concurso.items())]
+
+
+def main():
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Projeção de convocações em lote")
+    parser.add_argument("--vagas", action="append", default=[], metavar="CONCURSO=N")
+    parser.add_argument("--default-vagas", type=int, help="vagas para todos os concursos sem --vagas")
+    args = parser.parse_args()
+
+    vagas = {int(k): int(v) for k, v in (item.split("=", 1) for item in args.vagas)}
+    db = SessionLocal()
+    try:
+        if args.default_vagas is not None:
+            for (contest_id,) in db.query(models.Contest.id).all():
+                vagas.setdefault(contest_id, args.default_vagas)
+        for projecao in project_all(db, vagas):
+            projecao = {k: v for k, v in projecao.items() if k != "chamados"}
+            print(json.dumps(projecao, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# backend/rank_index.py
+"""
+Índice em memória de notas por (concurso, categoria) para responder
+"em que posição a nota X ficaria no concurso Y".
+
+Cada lista vira um array NumPy ordenado; a consulta é uma busca binária
+(searchsorted) por lista. O índice é carregado na primeira consulta e
+atualizado incrementalmente pelos eventos de escrita do crud.
+
+_lock guarda só as trocas rápidas do dicionário; a carga (query longa) roda
+sob _carga_lock. Um evento que chega durante a carga não pode ser aplicado
+nem descartado (não se sabe se a query já viu aquelas linhas): ele sobe
+_geracao e a carga, ao terminar, é refeita.
+
+Escritas de outros processos (workers, fila de jobs, bulk_import) chegam pela
+cache.data_version(), como no motor colunar: se ela andou além do que os
+eventos deste processo explicam, a próxima consulta recarrega.
+"""
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+# cache antes daqui: os ouvintes dele (que sobem a data_version) rodam antes dos deste módulo
+from backend import cache, models, events
+
+Chave = Tuple[int, str]
+
+
+class RankIndex:
+    def __init__(self):
+        self._notas: Dict[Chave, np.ndarray] = {}
+        self._carregado = False
+        self._geracao = 0
+        self._versao: Optional[int] = None  # cache.data_version() refletida em _notas
+        self._lock = Lock()
+        self._carga_lock = Lock()
+
+    def _em_dia(self) -> bool:
+        return self._carregado and self._versao == cache.data_version()
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._em_dia():
+            return
+        with self._carga_lock:
+            while True:
+                with self._lock:
+                    geracao = self._geracao
+                if self._em_dia():
+                    return
+                versao = cache.data_version()
+                notas = self._carregar(db)
+                with self._lock:
+                    if self._geracao == geracao:
+                        self._notas = notas
+                        self._carregado = True
+                        self._versao = versao
+                        return
+
+    def acompanhar_versao(self) -> None:
+        """Depois de um evento deste processo: a versão andou só por ele? Senão, recarrega depois."""
+        versao = cache.data_version()
+        with self._lock:
+            if self._versao is not None and versao == self._versao + 1:
+                self._versao = versao
+
+    def _carregar(self, db: Session) -> Dict[Chave, np.ndarray]:
+        linhas = (
+            db.query(
+                models.ContestResult.contest_id,
+                models.ContestResult.category,
+                models.ContestResult.final_score,
+            )
+            .filter(models.ContestResult.final_score.isnot(None))
+            .order_by(models.ContestResult.contest_id, models.ContestResult.category)
+            .all()
+        )
+        agrupado: Dict[Chave, List[float]] = {}
+        for contest_id, category, score in linhas:
+            agrupado.setdefault((contest_id, category), []).append(score)
+        return {k: np.sort(np.asarray(v, dtype=np.float64)) for k, v in agrupado.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._notas = {}
+            self._carregado = False
+            self._geracao += 1
+
+    def add_scores(self, contest_id: int, category: str, scores: Iterable[Optional[float]]) -> None:
+        novas = np.asarray([s for s in scores if s is not None], dtype=np.float64)
+        with self._lock:
+            self._geracao += 1
+            if not self._carregado or novas.size == 0:
+                return
+            atual = self._notas.get((contest_id, category))
+            if atual is None:
+                self._notas[(contest_id, category)] = np.sort(novas)
+            else:
+                novas.sort()
+                self._notas[(contest_id, category)] = np.insert(atual, np.searchsorted(atual, novas), novas)
+
+    def drop(self, contest_id: int, category: Optional[str] = None) -> None:
+        with self._lock:
+            self._geracao += 1
+            for chave in [k for k in self._notas if k[0] == contest_id and (category is None or k[1] == category)]:
+                del self._notas[chave]
+
+    def rank(
+        self,
+        score: float,
+        contest_ids: Optional[Iterable[int]] = None,
+        category: Optional[str] = None,
+        top: Optional[int] = None,
+    ) -> List[dict]:
+        filtro = set(contest_ids) if contest_ids else None
+        saida = []
+        # Os arrays nunca são alterados no lugar (add_scores cria outro): basta copiar os itens
+        with self._lock:
+            listas = sorted(self._notas.items())
+        for (contest_id, cat), notas in listas:
+            if filtro is not None and contest_id not in filtro:
+                continue
+            if category and cat != category:
+                continue
+            total = int(notas.size)
+            # Empates ficam à frente da nota consultada (posição mais conservadora)
+            acima = total - int(np.searchsorted(notas, score, side="left"))
+            posicao = acima + 1
+            item = {
+                "contest_id": contest_id,
+                "category": cat,
+                "position": posicao,
+                "total": total,
+                "lowest_score": float(notas[0]),
+                "highest_score": float(notas[-1]),
+                "within_list": posicao <= total,
+                "cutoff_score": None,
+                "clears": None,
+            }
+            if top:
+                item["cutoff_score"] = float(notas[total - top]) if top <= total else float(notas[0])
+                item["clears"] = posicao <= top
+            saida.append(item)
+        return saida
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            notas = list(self._notas.values())
+        return {
+            "lists": len(notas),
+            "scores": int(sum(a.size for a in notas)),
+            "bytes": int(sum(a.nbytes for a in notas)),
+        }
+
+
+rank_index = RankIndex()
+
+
+@events.subscribe(events.RESULTS_CREATED)
+def _ao_criar_resultados(contest_id: int, category: str, results, **_):
+    rank_index.add_scores(contest_id, category, (r["final_score"] for r in results))
+    rank_index.acompanhar_versao()
+
+
+@events.subscribe(events.RESULTS_DELETED)
+def _ao_remover_resultados(contest_id: int, category: str, **_):
+    rank_index.drop(contest_id, category)
+    rank_index.acompanhar_versao()
+
+
+@events.subscribe(events.RESULTS_REPLACED)
+def _ao_substituir_lista(contest_id: int, category: str, results, **_):
+    rank_index.drop(contest_id, category)
+    rank_index.add_scores(contest_id, category, (r["final_score"] for r in results))
+    rank_index.acompanhar_versao()
+
+
+@events.subscribe(events.EXTRA_UPDATED)
+@events.subscribe(events.CONTEST_UPDATED)
+def _ao_alterar_outros(**_):
+    # Não mudam notas, mas sobem a data_version
+    rank_index.acompanhar_versao()
+
+
+def rank_score(
+    db: Session,
+    score: float,
+    contest_ids: Optional[List[int]] = None,
+    category: Optional[str] = None,
+    top: Optional[int] = None,
+) -> List[dict]:
+    rank_index.ensure_loaded(db)
+    itens = rank_index.rank(score, contest_ids=contest_ids, category=category, top=top)
+    if itens:
+        ids = {i["contest_id"] for i in itens}
+        nomes = dict(
+            db.query(models.Contest.id, models.Contest.name).filter(models.Contest.id.in_(ids)).all()
+        )
+        for item in itens:
+            item["contest_name"] = nomes.get(item["contest_id"])
+    return itens
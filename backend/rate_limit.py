@@ -0,0 +1,190 @@
+# backend/rate_limit.py
+"""
+Controle de admissão para os endpoints caros e públicos (busca por nome,
+batch de nomes, compare).
+
+- Token bucket por cliente (usuário do token JWT, ou IP quando anônimo): cada
+  rota tem um custo base e um custo por item (ex.: por nome do batch), então
+  uma requisição grande gasta mais do balde que uma pequena.
+- Teto global de execuções simultâneas das rotas pesadas, com fila limitada:
+  quem passa do teto espera até HEAVY_QUEUE_TIMEOUT segundos por uma vaga.
+- Estourou o balde ou a fila: 429 com Retry-After.
+
+O estado dos baldes fica num BucketStore; o padrão é em memória (por
+processo). Para vários workers, troque por um store compartilhado com
+set_store().
+"""
+import math
+import os
+import time
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from backend import metrics
+from backend.auth import decode_token
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE = float(os.getenv("RATE_LIMIT_RATE", "5"))        # fichas repostas por segundo
+BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))     # tamanho do balde
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"  # usar X-Forwarded-For (atrás do proxy do Render)
+HEAVY_MAX_CONCURRENT = int(os.getenv("HEAVY_MAX_CONCURRENT", "4"))
+HEAVY_MAX_QUEUE = int(os.getenv("HEAVY_MAX_QUEUE", "16"))
+HEAVY_QUEUE_TIMEOUT = float(os.getenv("HEAVY_QUEUE_TIMEOUT", "5"))
+
+# rota -> (custo base, custo por item)
+CUSTOS: Dict[str, Tuple[float, float]] = {
+    "results-by-name": (1, 0),
+    "results-by-names-batch": (1, 0.2),
+    "compare": (5, 0),
+}
+
+
+class BucketStore:
+    """Interface do armazenamento dos baldes."""
+
+    def consume(self, key: str, cost: float, rate: float, burst: float) -> float:
+        """Gasta `cost` fichas do balde `key`; devolve 0 se liberou ou os segundos até ter saldo."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    def __init__(self, max_keys: int = 100_000):
+        self._baldes: Dict[str, Tuple[float, float]] = {}  # key -> (fichas, instante)
+        self._max_keys = max_keys
+        self._lock = Lock()
+
+    def consume(self, key: str, cost: float, rate: float, burst: float) -> float:
+        agora = time.monotonic()
+        with self._lock:
+            fichas, antes = self._baldes.get(key, (burst, agora))
+            fichas = min(burst, fichas + (agora - antes) * rate)
+            if cost > burst:
+                # Requisição maior que o balde inteiro nunca passaria: exige o balde cheio
+                cost = burst
+            if fichas < cost:
+                self._baldes[key] = (fichas, agora)
+                return (cost - fichas) / rate
+            self._baldes[key] = (fichas - cost, agora)
+            if len(self._baldes) > self._max_keys:
+                self._limpar(agora, rate, burst)
+            return 0.0
+
+    def _limpar(self, agora: float, rate: float, burst: float) -> None:
+        # Baldes que já teriam enchido de novo equivalem a não ter registro
+        cheios = [k for k, (f, t) in self._baldes.items() if f + (agora - t) * rate >= burst]
+        for k in cheios:
+            del self._baldes[k]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._baldes.clear()
+
+
+_store: BucketStore = MemoryBucketStore()
+_vagas = BoundedSemaphore(HEAVY_MAX_CONCURRENT)
+_fila_lock = Lock()
+_contadores = {"allowed": 0, "rejected_rate": 0, "rejected_queue": 0, "queued": 0, "waiting": 0, "running": 0}
+
+
+def set_store(store: BucketStore) -> None:
+    global _store
+    _store = store
+
+
+def get_store() -> BucketStore:
+    return _store
+
+
+def _contar(nome: str, delta: int = 1) -> None:
+    with _fila_lock:
+        _contadores[nome] += delta
+
+
+def client_key(request: Request) -> str:
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.lower().startswith("bearer "):
+        payload = decode_token(auth_header[7:].strip())
+        sub = payload.get("sub") if payload else None
+        if isinstance(sub, dict):
+            sub = sub.get("sub")
+        if sub:
+            return f"user:{sub}"
+    if TRUST_PROXY:
+        encaminhado = request.headers.get("x-forwarded-for")
+        if encaminhado:
+            return f"ip:{encaminhado.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'desconhecido'}"
+
+
+def _recusar(retry_after: float, detalhe: str):
+    raise HTTPException(
+        status_code=429,
+        detail=detalhe,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def check(request: Request, route: str, items: int = 0) -> None:
+    """Cobra o custo da rota do balde do cliente; 429 se não houver saldo."""
+    if not ENABLED:
+        return
+    base, por_item = CUSTOS[route]
+    espera = _store.consume(client_key(request), base + por_item * items, RATE, BURST)
+    if espera > 0:
+        _contar("rejected_rate")
+        _recusar(espera, "Muitas requisições. Tente novamente em instantes.")
+    _contar("allowed")
+
+
+class heavy_slot:
+    """Reserva uma das HEAVY_MAX_CONCURRENT vagas globais, esperando na fila se preciso."""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = HEAVY_QUEUE_TIMEOUT if timeout is None else timeout
+        self._ocupou = False
+
+    def __enter__(self):
+        if not ENABLED:
+            return self
+        if not _vagas.acquire(blocking=False):
+            with _fila_lock:
+                if _contadores["waiting"] >= HEAVY_MAX_QUEUE:
+                    _contadores["rejected_queue"] += 1
+                    _recusar(self.timeout, "Servidor ocupado. Tente novamente em instantes.")
+                _contadores["waiting"] += 1
+                _contadores["queued"] += 1
+            try:
+                ok = _vagas.acquire(timeout=self.timeout)
+            finally:
+                _contar("waiting", -1)
+            if not ok:
+                _contar("rejected_queue")
+                _recusar(self.timeout, "Servidor ocupado. Tente novamente em instantes.")
+        self._ocupou = True
+        _contar("running")
+        return self
+
+    def __exit__(self, *exc):
+        if self._ocupou:
+            _contar("running", -1)
+            _vagas.release()
+            self._ocupou = False
+        return False
+
+
+def stats() -> Dict[str, int]:
+    with _fila_lock:
+        return dict(_contadores)
+
+
+def _coletor():
+    for nome, valor in stats().items():
+        yield ("rate_limit", {"stat": nome}, valor)
+
+
+metrics.register_collector(_coletor)
@@ -54,11 +54,18 @@ class ContestCreate(ContestBase):
 class Contest(ContestBase):
     id: int
     created_at: datetime
+    archived_at: Optional[datetime] = None  # arquivado = listas só leitura
 
     class Config:
         from_attributes = True
 
 
+class ContestFacets(BaseModel):
+    total: int
+    banca: Dict[str, int]
+    cargo: Dict[str, int]
+
+
 # --- Contest Result Schemas ---
 
 # 1. Definições Base
@@ -96,6 +103,11 @@ class ContestResultCreate(BaseModel):
     final_scores: List[float]
 
 
+class ContestResultReplace(BaseModel):
+    names: List[str]
+    final_scores: List[float]
+
+
 class ContestResultExtraCreate(ContestResultExtraBase):
     contest_result_id: int
 
@@ -129,19 +141,248 @@ class NamesBatchRequest(BaseModel):
     names: List[str]
 
 
+# --- Estatísticas de notas ---
 
+class HistogramBucket(BaseModel):
+    start: float
+    end: float
+    count: int
 
 
+class ScoreStats(BaseModel):
+    contest_id: int
+    category: Optional[str] = None
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    histogram: List[HistogramBucket] = []
+    cutoff_position: Optional[int] = None
+    cutoff_score: Optional[float] = None
+
+class RankLookupItem(BaseModel):
+    contest_id: int
+    contest_name: Optional[str] = None
+    category: str
+    position: int
+    total: int
+    lowest_score: float
+    highest_score: float
+    within_list: bool
+    cutoff_score: Optional[float] = None
+    clears: Optional[bool] = None
 
 
+# --- Projeção de convocações ---
 
+class ProjectionCalled(BaseModel):
+    contest_result_id: int
+    name: str
+    category: str
+    position: int
+    final_score: Optional[float] = None
+    situacao: Optional[str] = None
+    vai_assumir: Optional[str] = None
 
 
+class ProjectionCategory(BaseModel):
+    vagas: int
+    chamados: int
+    ultima_posicao: Optional[int] = None
+
+
+class Projection(BaseModel):
+    contest_id: int
+    version: int
+    vagas: int
+    vagas_revertidas: int
+    categorias: Dict[str, ProjectionCategory]
+    ignorados: Dict[str, int]
+    talvez: int
+    chamados: List[ProjectionCalled]
 
 
+# --- Identidade de candidatos ---
 
+class OutraLista(BaseModel):
+    contest_result_id: int
+    contest_id: int
+    contest_name: str
+    category: str
+    position: int
+    situacao: Optional[str] = None
 
 
+class OutrasListas(BaseModel):
+    contest_result_id: int
+    person_id: Optional[int] = None
+    listas: List[OutraLista]
 
 
+# --- Substituição de lista ---
+
+class DiffAdded(BaseModel):
+    name: str
+    position: int
+    final_score: Optional[float] = None
+
+
+class DiffRemoved(BaseModel):
+    id: int
+    name: str
+    position: int
+    final_score: Optional[float] = None
+    had_extra: bool
+
+
+class DiffMoved(BaseModel):
+    id: int
+    name: str
+    old_position: int
+    new_position: int
+
+
+class DiffScoreChanged(BaseModel):
+    id: int
+    name: str
+    old_score: Optional[float] = None
+    new_score: Optional[float] = None
+
+
+class DiffRenamed(BaseModel):
+    id: int
+    old_name: str
+    new_name: str
+
+
+class ListDiff(BaseModel):
+    contest_id: int
+    category: str
+    applied: bool
+    total: int
+    unchanged: int
+    added: List[DiffAdded]
+    removed: List[DiffRemoved]
+    moved: List[DiffMoved]
+    score_changed: List[DiffScoreChanged]
+    renamed: List[DiffRenamed]
+
+
+# --- Snapshots publicados ---
+
+class ContestResultSnapshot(ContestResultBase):
+    id: int
+    created_at: datetime
+    extra: Optional[ContestResultExtra] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ContestSnapshot(BaseModel):
+    contest: Contest
+    category: Optional[str] = None
+    generated_at: datetime
+    count: int
+    results: List[ContestResultSnapshot]
+
+
+# --- Fila de jobs ---
+
+class JobCreate(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = {}
+
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# --- Painel do administrador ---
+
+class UserRoleCount(BaseModel):
+    role: str
+    confirmed: int
+    unconfirmed: int
+    total: int
+
+
+class BancaCount(BaseModel):
+    banca: Optional[str] = None
+    count: int
+
+
+class CategoryCount(BaseModel):
+    contest_id: int
+    category: Optional[str] = None
+    count: int
+
+
+class SituacaoCount(BaseModel):
+    situacao: str
+    count: int
+
+
+class AdminStats(BaseModel):
+    users_total: int
+    users_by_role: List[UserRoleCount]
+    contests_total: int
+    contests_by_banca: List[BancaCount]
+    results_total: int
+    results_by_category: List[CategoryCount]
+    situacoes: List[SituacaoCount]
+
+
+# --- Nomes acompanhados ---
+
+class FollowedNameCreate(BaseModel):
+    name: str
+    email_digest: bool = False
+
+
+class FollowedName(BaseModel):
+    id: int
+    name: str
+    nome_normalizado: str
+    email_digest: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class Notification(BaseModel):
+    id: int
+    kind: str
+    contest_id: int
+    contest_name: str
+    contest_result_id: Optional[int] = None
+    category: Optional[str] = None
+    position: Optional[int] = None
+    name: str
+    final_score: Optional[float] = None
+    situacao: Optional[str] = None
+    previous_situacao: Optional[str] = None
+    created_at: datetime
+    read_at: Optional[datetime] = None
+
 
+class NotificationsRead(BaseModel):
+    ids: Optional[List[int]] = None
+    up_to_id: Optional[int] = None
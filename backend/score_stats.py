@@ -0,0 +1,90 @@
+# backend/score_stats.py
+"""
+Estatísticas de distribuição das notas (final_score) por concurso/categoria.
+
+Busca só a coluna de notas e calcula tudo vetorizado com NumPy; o resultado
+fica no cache versionado por concurso (backend.cache).
+"""
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend import models, cache, archive
+
+PERCENTIS = (10, 25, 50, 75, 90)
+
+
+def _notas(db: Session, contest_id: int, category: Optional[str]) -> np.ndarray:
+    query = db.query(models.ContestResult.final_score).filter(
+        models.ContestResult.contest_id == contest_id,
+        models.ContestResult.final_score.isnot(None),
+    )
+    if category:
+        query = query.filter(models.ContestResult.category == category)
+    notas = np.fromiter((row[0] for row in query), dtype=np.float64)
+    if not len(notas) and archive.is_archived(db, contest_id):
+        notas = np.array(archive.scores(db, contest_id, category), dtype=np.float64)
+    return notas
+
+
+def _arred(valor) -> float:
+    return round(float(valor), 4)
+
+
+def compute_score_stats(
+    db: Session,
+    contest_id: int,
+    category: Optional[str] = None,
+    bins: int = 20,
+    cutoff_position: Optional[int] = None,
+) -> dict:
+    notas = _notas(db, contest_id, category)
+    stats = {
+        "contest_id": contest_id,
+        "category": category,
+        "count": int(notas.size),
+        "min": None,
+        "max": None,
+        "mean": None,
+        "percentiles": {},
+        "histogram": [],
+        "cutoff_position": cutoff_position,
+        "cutoff_score": None,
+    }
+    if notas.size == 0:
+        return stats
+
+    stats["min"] = _arred(notas.min())
+    stats["max"] = _arred(notas.max())
+    stats["mean"] = _arred(notas.mean())
+    valores = np.percentile(notas, PERCENTIS)
+    stats["percentiles"] = {f"p{p}": _arred(v) for p, v in zip(PERCENTIS, valores)}
+
+    contagens, bordas = np.histogram(notas, bins=bins)
+    stats["histogram"] = [
+        {"start": _arred(bordas[i]), "end": _arred(bordas[i + 1]), "count": int(c)}
+        for i, c in enumerate(contagens)
+    ]
+
+    # Nota de corte = N-ésima maior nota da lista (sem categoria, as listas
+    # estariam misturadas e a posição não corresponderia a nenhuma delas)
+    if category and cutoff_position and cutoff_position <= notas.size:
+        k = notas.size - cutoff_position
+        stats["cutoff_score"] = _arred(np.partition(notas, k)[k])
+    return stats
+
+
+def get_score_stats(
+    db: Session,
+    contest_id: int,
+    category: Optional[str] = None,
+    bins: int = 20,
+    cutoff_position: Optional[int] = None,
+) -> dict:
+    return cache.cached_for_contest(
+        "score_stats",
+        contest_id,
+        (category, bins, cutoff_position),
+        lambda: compute_score_stats(db, contest_id, category, bins, cutoff_position),
+    )
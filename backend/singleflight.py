@@ -0,0 +1,170 @@
+# backend/singleflight.py
+"""
+Coalescência de chamadas idênticas em andamento ("single flight").
+
+Quando um concurso grande sai, centenas de pessoas abrem o mesmo compare e
+as mesmas primeiras páginas ao mesmo tempo. Aqui a primeira requisição de
+uma chave executa a consulta; as que chegam enquanto ela ainda roda esperam
+e recebem o mesmo resultado — no caso dos endpoints, já serializado em
+JSON, então a serialização também acontece uma vez só.
+
+Nada fica guardado depois que a execução termina (isso é papel do cache):
+as chaves incluem a versão dos dados, então quem chega depois de uma
+escrita abre uma execução nova. Um 429 do líder não é repassado: quem
+estava esperando tenta de novo, por conta própria.
+"""
+import asyncio
+import json
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from fastapi import HTTPException, Response
+
+from backend import metrics
+
+
+def _do_chamador(erro: BaseException) -> bool:
+    """Erros que valem só para quem executou (429 do rate_limit/heavy_slot): não são repassados."""
+    return isinstance(erro, HTTPException) and erro.status_code == 429
+
+
+class _Chamada:
+    __slots__ = ("pronto", "valor", "erro")
+
+    def __init__(self):
+        self.pronto = Event()
+        self.valor = None
+        self.erro = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._chamadas: Dict[Hashable, _Chamada] = {}
+        self._futuros: Dict[Hashable, asyncio.Future] = {}
+        self._lock = Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Executa fn uma vez por chave em andamento (endpoints def, que rodam no threadpool)."""
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                chamada = self._chamadas.get(key)
+                lider = chamada is None
+                if lider:
+                    chamada = self._chamadas[key] = _Chamada()
+                    self.executions += 1
+
+            if not lider:
+                chamada.pronto.wait()
+                if chamada.erro is not None and _do_chamador(chamada.erro):
+                    continue  # a recusa foi do líder; este chamador tenta por conta própria
+                with self._lock:
+                    self.coalesced += 1
+                if chamada.erro is not None:
+                    raise chamada.erro
+                return chamada.valor
+
+            try:
+                chamada.valor = fn()
+            except BaseException as e:
+                chamada.erro = e
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._chamadas[key]
+                chamada.pronto.set()
+            return chamada.valor
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Mesma regra de do() para endpoints async (um único event loop)."""
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                futuro = self._futuros.get(key)
+                lider = futuro is None
+                if lider:
+                    futuro = self._futuros[key] = asyncio.get_running_loop().create_future()
+                    self.executions += 1
+
+            if not lider:
+                try:
+                    # shield: o cancelamento de um seguidor não cancela a execução compartilhada
+                    await asyncio.shield(futuro)
+                except asyncio.CancelledError:
+                    if futuro.cancelled() and not asyncio.current_task().cancelling():
+                        continue  # o líder foi cancelado, não este chamador: tenta por conta própria
+                    raise
+                except BaseException as e:
+                    if _do_chamador(e):
+                        continue
+                    with self._lock:
+                        self.coalesced += 1
+                    raise
+                with self._lock:
+                    self.coalesced += 1
+                return futuro.result()
+
+            try:
+                valor = await fn()
+            except BaseException as e:
+                with self._lock:
+                    self.errors += 1
+                    del self._futuros[key]
+                if isinstance(e, asyncio.CancelledError):
+                    futuro.cancel()
+                else:
+                    futuro.set_exception(e)
+                    futuro.exception()  # evita o aviso de exceção não lida quando ninguém esperava
+                raise
+            with self._lock:
+                del self._futuros[key]
+            futuro.set_result(valor)
+            return valor
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._chamadas) + len(self._futuros)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": self.in_flight(),
+        }
+
+
+compare_flight = SingleFlight("compare_contests")
+results_flight = SingleFlight("contest_results")
+names_batch_flight = SingleFlight("names_batch")
+
+FLIGHTS: List[SingleFlight] = [compare_flight, results_flight, names_batch_flight]
+
+
+def dumps(dados: Any) -> bytes:
+    """Mesmo formato do JSONResponse do FastAPI."""
+    return json.dumps(dados, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(corpo: bytes) -> Response:
+    # Cada requisição ganha sua própria Response; só os bytes são compartilhados
+    return Response(content=corpo, media_type="application/json")
+
+
+def _coletor():
+    for flight in FLIGHTS:
+        for nome, valor in flight.stats().items():
+            yield ("singleflight", {"flight": flight.name, "stat": nome}, valor)
+
+
+metrics.register_collector(_coletor)
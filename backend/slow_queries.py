@@ -0,0 +1,165 @@
+# backend/slow_queries.py
+"""
+Log de queries lentas (opcional), com captura de plano de execução.
+
+Ativado por SLOW_QUERY_MS (limite em milissegundos). Cada query acima do
+limite é logada com parâmetros, fingerprint (SQL sem literais) e rota de
+origem; uma amostra (SLOW_QUERY_EXPLAIN_SAMPLE, 0 a 1) recebe EXPLAIN /
+EXPLAIN QUERY PLAN. As piores fingerprints ficam agregadas em memória para
+o endpoint de admin.
+"""
+from threading import Lock
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_FINGERPRINTS = 1000
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """SQL normalizado: sem literais, listas IN colapsadas e espaços únicos."""
+    sql = _RE_STRING.sub("?", statement)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_POSTCOMPILE.sub("(?+)", sql)
+    sql = _RE_LISTA.sub("(?+)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, explain_sample: float = 0.1, top: int = 50):
+        self.threshold = threshold_ms / 1000.0
+        self.explain_sample = explain_sample
+        self.top = top
+        self._agregado: Dict[str, dict] = {}
+        self._lock = Lock()
+
+    def registrar(self, conn, cursor, statement: str, parameters, duracao: float, executemany: bool) -> None:
+        fp = fingerprint(statement)
+        fp_id = hashlib.md5(fp.encode("utf-8")).hexdigest()[:12]
+        rota = metrics.current_route()
+        parametros = _resumir_parametros(parameters)
+        logger.warning(
+            "Query lenta %.1f ms [%s] rota=%s sql=%s params=%s",
+            duracao * 1000, fp_id, rota, _RE_ESPACOS.sub(" ", statement)[:500], parametros,
+        )
+
+        plano = None
+        if not executemany and random.random() < self.explain_sample:
+            plano = self._explain(conn, statement, parameters)
+
+        with self._lock:
+            item = self._agregado.get(fp_id)
+            if item is None:
+                if len(self._agregado) >= MAX_FINGERPRINTS:
+                    menor = min(self._agregado, key=lambda k: self._agregado[k]["total_ms"])
+                    del self._agregado[menor]
+                item = self._agregado[fp_id] = {
+                    "id": fp_id, "fingerprint": fp, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": {}, "last_params": None, "plan": None, "last_seen": None,
+                }
+            ms = duracao * 1000
+            item["count"] += 1
+            item["total_ms"] += ms
+            item["max_ms"] = max(item["max_ms"], ms)
+            if rota:
+                item["routes"][rota] = item["routes"].get(rota, 0) + 1
+            item["last_params"] = parametros
+            item["last_seen"] = datetime.now(timezone.utc).isoformat()
+            if plano is not None:
+                item["plan"] = plano
+
+    def _explain(self, conn, statement: str, parameters) -> Optional[List[str]]:
+        if not statement.lstrip().lower().startswith(("select", "with")):
+            return None
+        sqlite = conn.dialect.name == "sqlite"
+        prefixo = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+        try:
+            # Cursor DBAPI novo na mesma conexão: não passa pelos eventos do engine.
+            # Fora do SQLite o EXPLAIN roda num SAVEPOINT: no Postgres um erro aqui
+            # abortaria a transação da própria requisição.
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                if not sqlite:
+                    cursor.execute("SAVEPOINT slow_query_explain")
+                try:
+                    cursor.execute(prefixo + statement, parameters or ())
+                    plano = [" | ".join(str(c) for c in linha) for linha in cursor.fetchall()]
+                except Exception:
+                    if not sqlite:
+                        cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                    raise
+                if not sqlite:
+                    cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+                return plano
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.debug("EXPLAIN falhou: %s", e)
+            return None
+
+    def top_queries(self, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            itens = [dict(i, routes=dict(i["routes"])) for i in self._agregado.values()]
+        for item in itens:
+            item["mean_ms"] = round(item["total_ms"] / item["count"], 3)
+            item["total_ms"] = round(item["total_ms"], 3)
+            item["max_ms"] = round(item["max_ms"], 3)
+        itens.sort(key=lambda i: i["total_ms"], reverse=True)
+        return itens[: limit or self.top]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._agregado.clear()
+
+
+def _resumir_parametros(parameters, limite: int = 20):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: repr(v)[:100] for k, v in list(parameters.items())[:limite]}
+    if isinstance(parameters, (list, tuple)):
+        return [repr(v)[:100] for v in list(parameters)[:limite]]
+    return repr(parameters)[:200]
+
+
+slow_log: Optional[SlowQueryLog] = None
+
+
+def instrument(engine, threshold_ms: float, explain_sample: float = 0.1, top: int = 50) -> SlowQueryLog:
+    global slow_log
+    slow_log = SlowQueryLog(threshold_ms, explain_sample, top)
+    log = slow_log
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_slow_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        pilha = conn.info.get("_slow_inicio")
+        if not pilha:
+            return
+        duracao = time.perf_counter() - pilha.pop()
+        if duracao >= log.threshold:
+            try:
+                log.registrar(conn, cursor, statement, parameters, duracao, executemany)
+            except Exception:
+                logger.exception("Falha ao registrar query lenta")
+
+    return log
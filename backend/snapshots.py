@@ -0,0 +1,339 @@
+# backend/snapshots.py
+"""
+Snapshots pré-renderizados e pré-comprimidos das listas publicadas.
+
+Para cada concurso é gerado um arquivo por categoria (mais um com a lista
+inteira) com o JSON já serializado e comprimido em gzip e brotli (o pacote
+brotli está no requirements; sem ele, só gzip). O nome do arquivo leva o hash do conteúdo, que
+também é o ETag; o manifest.json do concurso aponta para a versão atual.
+
+Qualquer escrita no concurso apaga o manifest na hora (as leituras caem na
+consulta ao vivo) e agenda a regeneração numa thread de fundo, com um
+pequeno atraso para juntar rajadas de escritas (ex.: vários extras). Essa
+regeneração usa níveis de compressão médios (SNAPSHOT_GZIP_LEVEL,
+SNAPSHOT_BROTLI_QUALITY), baratos o bastante para rodar a cada extra; a
+geração em lote pela linha de comando usa os máximos (gzip 9, brotli 11).
+
+Pré-gerar tudo:
+    python -m backend.snapshots [--contest ID ...]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy.orm import Session, joinedload
+
+from backend import models, schemas, events, metrics, archive
+from backend.normalization import remover_acentos
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SNAPSHOTS_ENABLED", "1") == "1"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "classificacao-snapshots")
+DELAY = float(os.getenv("SNAPSHOT_DELAY", "2"))       # segundos para juntar escritas em rajada
+MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", "30"))    # cache da URL sem versão
+IMMUTABLE_MAX_AGE = 31536000                           # URL com ?v=<etag>
+TODAS = "_all"
+GZIP_LEVEL = int(os.getenv("SNAPSHOT_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("SNAPSHOT_BROTLI_QUALITY", "5"))
+
+
+def _slug(category: Optional[str]) -> str:
+    return remover_acentos(category) if category else TODAS
+
+
+def _dir_concurso(contest_id: int) -> str:
+    return os.path.join(SNAPSHOT_DIR, str(contest_id))
+
+
+def _escrever_atomico(caminho: str, dados: bytes) -> None:
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dados)
+    os.replace(tmp, caminho)
+
+
+# --- Renderização ---
+
+def _snapshot(db: Session, contest_id: int, category: Optional[str] = None) -> Optional[schemas.ContestSnapshot]:
+    contest = db.query(models.Contest).filter(models.Contest.id == contest_id).first()
+    if not contest:
+        return None
+    query = (
+        db.query(models.ContestResult)
+        .options(joinedload(models.ContestResult.extra))
+        .filter(models.ContestResult.contest_id == contest_id)
+    )
+    if category:
+        query = query.filter(models.ContestResult.category == category)
+    linhas = query.order_by(models.ContestResult.category, models.ContestResult.position).all()
+    if not linhas and contest.archived_at is not None:
+        linhas = sorted(archive.get_results(db, contest_id, category=category), key=lambda l: (l.category, l.position))
+    return schemas.ContestSnapshot(
+        contest=schemas.Contest.model_validate(contest),
+        category=category,
+        generated_at=datetime.utcnow(),
+        count=len(linhas),
+        results=[schemas.ContestResultSnapshot.model_validate(l) for l in linhas],
+    )
+
+
+def render(db: Session, contest_id: int, category: Optional[str] = None) -> Optional[bytes]:
+    """JSON da lista (uma categoria ou todas); None se o concurso não existe."""
+    snapshot = _snapshot(db, contest_id, category)
+    return snapshot.model_dump_json().encode("utf-8") if snapshot else None
+
+
+def _comprimir(corpo: bytes, maximo: bool = False) -> Dict[str, bytes]:
+    saida = {"gzip": gzip.compress(corpo, compresslevel=9 if maximo else GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        saida["br"] = brotli.compress(corpo, quality=11 if maximo else BROTLI_QUALITY)
+    return saida
+
+
+def publish(
+    db: Session,
+    contest_id: int,
+    obsoleto: Callable[[], bool] = lambda: False,
+    maximo: bool = False,
+) -> Optional[dict]:
+    """Gera os arquivos de todas as categorias do concurso e troca o manifest.
+
+    `obsoleto` é checado antes de trocar o manifest: se houve escrita durante a
+    geração, o manifest não é publicado (a próxima geração já está agendada).
+    `maximo` usa a compressão máxima (geração em lote, fora do caminho das escritas).
+    """
+    categorias = [c for (c,) in db.query(models.ContestResult.category).filter(
+        models.ContestResult.contest_id == contest_id
+    ).distinct()] or archive.categories(db, contest_id)
+    pasta = _dir_concurso(contest_id)
+    os.makedirs(pasta, exist_ok=True)
+
+    manifest = {"contest_id": contest_id, "published_at": datetime.utcnow().isoformat(), "categories": {}}
+    for category in [None] + sorted(categorias):
+        snapshot = _snapshot(db, contest_id, category)
+        if snapshot is None:
+            return None
+        corpo = snapshot.model_dump_json().encode("utf-8")
+        # generated_at muda a cada render; a versão depende só dos dados
+        etag = hashlib.sha256(snapshot.model_dump_json(exclude={"generated_at"}).encode("utf-8")).hexdigest()[:16]
+        arquivos = {}
+        for encoding, dados in _comprimir(corpo, maximo).items():
+            nome = f"{_slug(category)}.{etag}.json.{'gz' if encoding == 'gzip' else encoding}"
+            caminho = os.path.join(pasta, nome)
+            if not os.path.exists(caminho):
+                _escrever_atomico(caminho, dados)
+            arquivos[encoding] = nome
+        manifest["categories"][_slug(category)] = {"etag": etag, "size": len(corpo), "files": arquivos}
+
+    if obsoleto():
+        return None
+    _escrever_atomico(os.path.join(pasta, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+    _limpar_antigos(pasta, manifest)
+    return manifest
+
+
+def _limpar_antigos(pasta: str, manifest: dict) -> None:
+    atuais = {n for c in manifest["categories"].values() for n in c["files"].values()}
+    agora = time.time()
+    for nome in os.listdir(pasta):
+        if nome == "manifest.json" or nome in atuais or nome.endswith(".tmp"):
+            continue
+        caminho = os.path.join(pasta, nome)
+        # Dá tempo para downloads em andamento da versão anterior terminarem
+        try:
+            if agora - os.path.getmtime(caminho) > 300:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def invalidate(contest_id: int) -> None:
+    try:
+        os.remove(os.path.join(_dir_concurso(contest_id), "manifest.json"))
+    except FileNotFoundError:
+        pass
+
+
+def load_manifest(contest_id: int) -> Optional[dict]:
+    try:
+        with open(os.path.join(_dir_concurso(contest_id), "manifest.json"), "rb") as f:
+            return json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# --- Publicação em segundo plano ---
+
+class Publisher:
+    def __init__(self, delay: float = DELAY):
+        self.delay = delay
+        self.published = 0
+        self.failed = 0
+        self._pendentes: Dict[int, float] = {}
+        self._geracoes: Dict[int, int] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, contest_id: int) -> None:
+        with self._cond:
+            self._pendentes.setdefault(contest_id, time.monotonic() + self.delay)
+            self._geracoes[contest_id] = self._geracoes.get(contest_id, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="snapshot-publisher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _proximo(self) -> Tuple[int, int]:
+        with self._cond:
+            while True:
+                if self._pendentes:
+                    contest_id, quando = min(self._pendentes.items(), key=lambda kv: kv[1])
+                    espera = quando - time.monotonic()
+                    if espera <= 0:
+                        del self._pendentes[contest_id]
+                        return contest_id, self._geracoes[contest_id]
+                    self._cond.wait(espera)
+                else:
+                    self._cond.wait()
+
+    def _loop(self) -> None:
+        from backend.database import SessionLocal
+
+        while True:
+            contest_id, geracao = self._proximo()
+            db = SessionLocal()
+            try:
+                publish(db, contest_id, obsoleto=lambda: self._geracoes.get(contest_id) != geracao)
+                self.published += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Falha ao publicar snapshot do concurso %s", contest_id)
+            finally:
+                db.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            pendentes = len(self._pendentes)
+        return {"published": self.published, "failed": self.failed, "pending": pendentes}
+
+
+publisher = Publisher()
+
+
+def _coletor():
+    for nome, valor in publisher.stats().items():
+        yield ("snapshots", {"stat": nome}, valor)
+
+
+metrics.register_collector(_coletor)
+
+
+def _ao_alterar(contest_id: int, **_):
+    if contest_id is None:
+        return
+    invalidate(contest_id)
+    publisher.schedule(contest_id)
+
+
+if ENABLED:
+    for _evento in (events.RESULTS_CREATED, events.RESULTS_DELETED, events.RESULTS_REPLACED,
+                    events.EXTRA_UPDATED, events.CONTEST_UPDATED):
+        events.subscribe(_evento, _ao_alterar)
+
+
+# --- Leitura ---
+
+def _encoding_aceito(accept_encoding: str, disponiveis: Iterable[str]) -> Optional[str]:
+    aceitos = {p.split(";")[0].strip().lower() for p in (accept_encoding or "").split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in disponiveis and encoding in aceitos:
+            return encoding
+    return None
+
+
+def serve(
+    db: Session,
+    contest_id: int,
+    category: Optional[str] = None,
+    accept_encoding: str = "",
+    if_none_match: Optional[str] = None,
+    version: Optional[str] = None,
+) -> Optional[Response]:
+    """Resposta do snapshot publicado ou, na falta dele, da consulta ao vivo (None = concurso inexistente).
+
+    A republicação só é agendada quando falta o manifest (ou um arquivo dele):
+    um manifest sem a categoria quer dizer que o concurso não tem essa lista,
+    e a consulta ao vivo devolve a lista vazia sem regerar nada.
+    """
+    manifest = load_manifest(contest_id) if ENABLED else None
+    entrada = manifest["categories"].get(_slug(category)) if manifest else None
+    if entrada:
+        etag = f'"{entrada["etag"]}"'
+        cache_control = (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable" if version == entrada["etag"]
+            else f"public, max-age={MAX_AGE}"
+        )
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding",
+                   "X-Snapshot-Version": entrada["etag"]}
+        if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        encoding = _encoding_aceito(accept_encoding, entrada["files"])
+        caminho = os.path.join(_dir_concurso(contest_id), entrada["files"][encoding or "gzip"])
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+        except FileNotFoundError:
+            dados = None
+        if dados is not None:
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            else:
+                # Cliente sem gzip (raro): descomprime aqui
+                dados = gzip.decompress(dados)
+            return Response(content=dados, media_type="application/json", headers=headers)
+
+    corpo = render(db, contest_id, category)
+    if corpo is None:
+        return None
+    if ENABLED and (manifest is None or entrada):
+        publisher.schedule(contest_id)
+    return Response(content=corpo, media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+
+def main():
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Gera os snapshots comprimidos das listas")
+    parser.add_argument("--contest", type=int, action="append", help="só estes concursos (padrão: todos)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        ids = args.contest or [cid for (cid,) in db.query(models.Contest.id).order_by(models.Contest.id)]
+        for contest_id in ids:
+            manifest = publish(db, contest_id, maximo=True)
+            if manifest:
+                tamanhos = {c: e["size"] for c, e in manifest["categories"].items()}
+                print(f"concurso {contest_id}: {tamanhos}")
+        print(f"snapshots em {SNAPSHOT_DIR}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
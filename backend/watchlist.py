@@ -0,0 +1,286 @@
+# backend/watchlist.py
+"""
+Nomes acompanhados e notificações.
+
+O usuário segue um ou mais nomes (guardados já normalizados). As escritas
+que interessam a quem segue um nome chegam pelos eventos do crud:
+- lista nova (results_created) ou nomes novos numa substituição de lista
+  (results_replaced): o nome apareceu numa lista;
+- extra_updated com mudança de situação.
+
+Os nomes do evento são normalizados em lote e cruzados com followed_names
+por IN no índice de nome_normalizado; cada casamento vira uma linha em
+notifications. "Tem novidade para mim?" passa a ser uma leitura só, no
+índice (user_id, read_at, id), em vez de repetir a busca por nome.
+
+Quem marcou email_digest recebe um resumo por e-mail com o que ainda não foi
+enviado:
+    python -m backend.watchlist digest
+(ou o job "notification_digest", para agendar pela fila).
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from backend import models, events
+from backend.normalization import normalizar_nome, normalizar_nomes
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+MAX_FOLLOWS = 20
+DIGEST_MAX_ITENS = 50     # por e-mail; o resto vai no próximo resumo
+
+
+def _em_lotes(itens: List, tamanho: int = LOTE):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+# --- Nomes seguidos ---
+
+def list_followed(db: Session, user_id: int) -> List[models.FollowedName]:
+    return (
+        db.query(models.FollowedName)
+        .filter(models.FollowedName.user_id == user_id)
+        .order_by(models.FollowedName.id)
+        .all()
+    )
+
+
+def follow(db: Session, user_id: int, name: str, email_digest: bool = False) -> models.FollowedName:
+    nome_norm = normalizar_nome(name)
+    if not nome_norm:
+        raise HTTPException(status_code=400, detail="Nome inválido")
+    existente = db.query(models.FollowedName).filter(
+        models.FollowedName.user_id == user_id, models.FollowedName.nome_normalizado == nome_norm
+    ).first()
+    if existente:
+        existente.email_digest = email_digest
+        db.commit()
+        db.refresh(existente)
+        return existente
+    if db.query(models.FollowedName).filter(models.FollowedName.user_id == user_id).count() >= MAX_FOLLOWS:
+        raise HTTPException(status_code=400, detail=f"Limite de {MAX_FOLLOWS} nomes acompanhados")
+    seguido = models.FollowedName(
+        user_id=user_id, name=name.strip(), nome_normalizado=nome_norm, email_digest=email_digest
+    )
+    db.add(seguido)
+    db.commit()
+    db.refresh(seguido)
+    return seguido
+
+
+def unfollow(db: Session, user_id: int, followed_id: int) -> bool:
+    apagados = db.query(models.FollowedName).filter(
+        models.FollowedName.id == followed_id, models.FollowedName.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return apagados > 0
+
+
+# --- Casamento dos eventos com os nomes seguidos ---
+
+def _seguidores(db: Session, nomes_norm: Iterable[str]) -> Dict[str, List[Tuple[int, int]]]:
+    """nome normalizado -> [(user_id, followed_name_id)] para os nomes que alguém segue."""
+    distintos = sorted(set(n for n in nomes_norm if n))
+    saida: Dict[str, List[Tuple[int, int]]] = {}
+    for lote in _em_lotes(distintos):
+        linhas = db.query(
+            models.FollowedName.nome_normalizado, models.FollowedName.user_id, models.FollowedName.id
+        ).filter(models.FollowedName.nome_normalizado.in_(lote))
+        for nome_norm, user_id, followed_id in linhas:
+            saida.setdefault(nome_norm, []).append((user_id, followed_id))
+    return saida
+
+
+def _gravar(db: Session, notificacoes: List[dict]) -> int:
+    if not notificacoes:
+        return 0
+    agora = datetime.utcnow()
+    for n in notificacoes:
+        n.setdefault("created_at", agora)
+    db.execute(insert(models.Notification), notificacoes)
+    db.commit()
+    return len(notificacoes)
+
+
+def notify_new_results(db: Session, contest_id: int, category: str, results: List[dict]) -> int:
+    """Uma notificação por (seguidor, resultado) dos nomes que entraram na lista."""
+    if not results:
+        return 0
+    nomes_norm = normalizar_nomes(r["name"] for r in results)
+    seguidores = _seguidores(db, nomes_norm)
+    if not seguidores:
+        return 0
+    notificacoes = [
+        {
+            "user_id": user_id,
+            "followed_name_id": followed_id,
+            "kind": "new_result",
+            "contest_id": contest_id,
+            "contest_result_id": r["id"],
+            "category": category,
+            "position": r["position"],
+            "name": r["name"],
+            "final_score": r["final_score"],
+        }
+        for r, nome_norm in zip(results, nomes_norm)
+        for user_id, followed_id in seguidores.get(nome_norm, ())
+    ]
+    return _gravar(db, notificacoes)
+
+
+def notify_situacao(db: Session, contest_id: int, category: str, extra, previous_situacao: Optional[str]) -> int:
+    if (previous_situacao or None) == (extra.situacao or None):
+        return 0
+    resultado = db.query(
+        models.ContestResult.name, models.ContestResult.position, models.ContestResult.final_score
+    ).filter(models.ContestResult.id == extra.contest_result_id).first()
+    if not resultado:
+        return 0
+    nome, posicao, nota = resultado
+    nome_norm = normalizar_nome(nome)
+    notificacoes = [
+        {
+            "user_id": user_id,
+            "followed_name_id": followed_id,
+            "kind": "situacao",
+            "contest_id": contest_id,
+            "contest_result_id": extra.contest_result_id,
+            "category": category,
+            "position": posicao,
+            "name": nome,
+            "final_score": nota,
+            "situacao": extra.situacao,
+            "previous_situacao": previous_situacao,
+        }
+        for user_id, followed_id in _seguidores(db, [nome_norm]).get(nome_norm, ())
+    ]
+    return _gravar(db, notificacoes)
+
+
+@events.subscribe(events.RESULTS_CREATED)
+def _ao_criar_resultados(db: Session, contest_id: int, category: str, results, restored: bool = False, **_):
+    if restored:  # volta do arquivo: as linhas não são novidade
+        return
+    notify_new_results(db, contest_id, category, results)
+
+
+@events.subscribe(events.RESULTS_REPLACED)
+def _ao_substituir_lista(db: Session, contest_id: int, category: str, results, added_ids, **_):
+    novos = set(added_ids)
+    notify_new_results(db, contest_id, category, [r for r in results if r["id"] in novos])
+
+
+@events.subscribe(events.EXTRA_UPDATED)
+def _ao_atualizar_extra(db: Session, contest_id: int, category: str, extra, previous_situacao=None, **_):
+    notify_situacao(db, contest_id, category, extra, previous_situacao)
+
+
+# --- Leitura ---
+
+def get_notifications(
+    db: Session,
+    user_id: int,
+    unread_only: bool = True,
+    since_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[dict]:
+    query = (
+        db.query(models.Notification, models.Contest.name)
+        .join(models.Contest, models.Contest.id == models.Notification.contest_id)
+        .filter(models.Notification.user_id == user_id)
+    )
+    if unread_only:
+        query = query.filter(models.Notification.read_at.is_(None))
+    if since_id is not None:
+        query = query.filter(models.Notification.id > since_id)
+    linhas = query.order_by(models.Notification.id.desc()).limit(limit).all()
+    return [
+        {**{c.name: getattr(n, c.name) for c in models.Notification.__table__.columns}, "contest_name": contest_name}
+        for n, contest_name in linhas
+    ]
+
+
+def mark_read(db: Session, user_id: int, ids: Optional[List[int]] = None, up_to_id: Optional[int] = None) -> int:
+    """Marca como lidas as notificações `ids`, ou todas até `up_to_id` (ou todas, sem nenhum dos dois)."""
+    stmt = update(models.Notification).where(
+        models.Notification.user_id == user_id, models.Notification.read_at.is_(None)
+    )
+    if ids is not None:
+        stmt = stmt.where(models.Notification.id.in_(ids))
+    if up_to_id is not None:
+        stmt = stmt.where(models.Notification.id <= up_to_id)
+    marcadas = db.execute(stmt.values(read_at=datetime.utcnow())).rowcount
+    db.commit()
+    return marcadas
+
+
+# --- Resumo por e-mail ---
+
+def send_digests(db: Session, max_users: Optional[int] = None) -> Dict[str, int]:
+    """Envia um e-mail por usuário com as notificações ainda não enviadas dos nomes com email_digest."""
+    from backend.email_service import email_service
+
+    linhas = (
+        db.query(models.Notification, models.User.email, models.User.username, models.Contest.name)
+        .join(models.FollowedName, models.FollowedName.id == models.Notification.followed_name_id)
+        .join(models.User, models.User.id == models.Notification.user_id)
+        .join(models.Contest, models.Contest.id == models.Notification.contest_id)
+        .filter(models.Notification.emailed_at.is_(None), models.FollowedName.email_digest.is_(True))
+        .order_by(models.Notification.user_id, models.Notification.id)
+        .all()
+    )
+    por_usuario: Dict[int, dict] = {}
+    for n, email, username, contest_name in linhas:
+        destino = por_usuario.setdefault(n.user_id, {"email": email, "nome": username, "itens": []})
+        if len(destino["itens"]) < DIGEST_MAX_ITENS:
+            destino["itens"].append({
+                "id": n.id, "kind": n.kind, "contest_name": contest_name, "category": n.category,
+                "position": n.position, "name": n.name, "situacao": n.situacao,
+            })
+
+    resumo = {"users": 0, "sent": 0, "failed": 0, "notifications": 0}
+    for user_id, destino in list(por_usuario.items())[:max_users]:
+        resumo["users"] += 1
+        if not email_service.send_digest_email(destino["email"], destino["nome"] or "Usuário", destino["itens"]):
+            resumo["failed"] += 1
+            logger.warning("Falha ao enviar resumo de notificações para o usuário %s", user_id)
+            continue
+        ids = [i["id"] for i in destino["itens"]]
+        db.execute(
+            update(models.Notification).where(models.Notification.id.in_(ids)).values(emailed_at=datetime.utcnow())
+        )
+        db.commit()
+        resumo["sent"] += 1
+        resumo["notifications"] += len(ids)
+    return resumo
+
+
+def main():
+    from backend.database import Base, SessionLocal, engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Nomes acompanhados e notificações")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("digest", help="envia os resumos por e-mail pendentes")
+    d.add_argument("--max-users", type=int)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.cmd == "digest":
+            print(send_digests(db, max_users=args.max_users))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()